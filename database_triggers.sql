@@ -17,6 +17,7 @@ CREATE TABLE IF NOT EXISTS sync_queue (
     retry_count INT DEFAULT 0,
     error_message TEXT,
     INDEX idx_status_created (status, created_at),
+    INDEX idx_status_processed (status, processed_at),
     INDEX idx_table_record (table_name, record_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
@@ -31,7 +32,7 @@ CREATE TABLE IF NOT EXISTS sync_log (
     status VARCHAR(20),
     error_message TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_sync_hash (sync_hash),
+    INDEX idx_hash_status_time (sync_hash, status, created_at, direction), -- 覆盖循环同步检测查询
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
@@ -2,11 +2,25 @@
 
 import os
 import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any
 
 from feishu_bitable_db import DB, Table, Field, FieldType, SearchCmd
 from feishu_bitable_db.db.db import DBImpl
+from feishu_bitable_db.db.async_db import DBPool, create_pool
+
+
+# ID 前缀取进程启动时间，进程内再加递增序号，同一秒内生成的 ID 也不会重复
+_ID_EPOCH = f"{time.time_ns():x}"
+_id_counter = itertools.count()
+
+
+def next_id(prefix: str) -> str:
+    """生成唯一 ID"""
+    return f"{prefix}_{_ID_EPOCH}_{next(_id_counter):x}"
 
 
 class UserManager:
@@ -39,14 +53,25 @@ class UserManager:
         )
         self.db.save_table(self.db_name, table)
     
-    def create_user(self, user_data: Dict[str, Any]) -> str:
-        """创建用户"""
+    def build_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """补全用户的系统字段"""
         # 生成用户ID
-        user_data["用户ID"] = f"USER_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        user_data["用户ID"] = next_id("USER")
         user_data["注册时间"] = datetime.now().isoformat()
         user_data["状态"] = "活跃"
+        return user_data
+    
+    def create_user(self, user_data: Dict[str, Any]) -> str:
+        """创建用户"""
+        return self.db.create(self.db_name, self.table_name, self.build_user(user_data))
+    
+    async def create_users_async(self, pool: DBPool, users: List[Dict[str, Any]]) -> List[str]:
+        """通过连接池并发创建多个用户"""
+        async def create_one(user_data: Dict[str, Any]) -> str:
+            async with pool.acquire() as adb:
+                return await adb.create(self.db_name, self.table_name, self.build_user(user_data))
         
-        return self.db.create(self.db_name, self.table_name, user_data)
+        return list(await asyncio.gather(*(create_one(user) for user in users)))
     
     def get_user_by_username(self, username: str) -> Dict[str, Any]:
         """根据用户名获取用户"""
@@ -57,12 +82,11 @@ class UserManager:
     
     def get_users_by_age_range(self, min_age: int, max_age: int) -> List[Dict[str, Any]]:
         """获取年龄范围内的用户"""
-        # 注意：飞书多维表格的过滤条件有限制，这里使用 >= 操作符
-        users = self.db.read(self.db_name, self.table_name, [
-            SearchCmd(key="年龄", operator=">=", val=min_age)
+        # 上下界都下推到飞书过滤条件中，由服务端完成筛选
+        return self.db.read(self.db_name, self.table_name, [
+            SearchCmd(key="年龄", operator=">=", val=min_age),
+            SearchCmd(key="年龄", operator="<=", val=max_age),
         ])
-        # 在内存中进一步过滤
-        return [u for u in users if u.get("年龄", 0) <= max_age]
     
     def update_last_login(self, user_id: str):
         """更新最后登录时间"""
@@ -115,12 +139,21 @@ class ProductManager:
     
     def add_product(self, product: Dict[str, Any]) -> str:
         """添加产品"""
-        product["产品编号"] = f"PROD_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        product["产品编号"] = next_id("PROD")
         product["上架时间"] = datetime.now().isoformat()
         product["状态"] = "在售"
         
         return self.db.create(self.db_name, self.table_name, product)
     
+    def add_products(self, products: List[Dict[str, Any]]) -> List[str]:
+        """批量添加产品"""
+        for product in products:
+            product["产品编号"] = next_id("PROD")
+            product["上架时间"] = datetime.now().isoformat()
+            product["状态"] = "在售"
+        
+        return self.db.batch_create(self.db_name, self.table_name, products)
+    
     def update_stock(self, product_id: str, stock: int):
         """更新库存"""
         self.db.update(self.db_name, self.table_name, product_id, {
@@ -135,12 +168,13 @@ class ProductManager:
     
     def get_low_stock_products(self, threshold: int = 10) -> List[Dict[str, Any]]:
         """获取低库存产品"""
-        # 获取所有产品，然后在内存中过滤
-        all_products = self.db.read(self.db_name, self.table_name, [])
-        return [p for p in all_products if p.get("库存", 0) < threshold]
+        # 库存条件下推到飞书过滤条件中，避免拉取整张表；逐页读取，内存中只保留一页
+        return list(self.db.iter_read(self.db_name, self.table_name, [
+            SearchCmd(key="库存", operator="<", val=threshold)
+        ]))
 
 
-def main():
+async def main():
     """主函数"""
     # 初始化
     app_id = os.getenv("FEISHU_APP_ID")
@@ -161,28 +195,33 @@ def main():
     print("\n=== 用户管理示例 ===")
     user_manager = UserManager(db, db_name)
     
-    # 创建用户
+    # 并发创建用户
     print("创建用户...")
-    user1_id = user_manager.create_user({
-        "用户名": "alice",
-        "密码哈希": "hash123",
-        "邮箱": "alice@example.com",
-        "手机号": "13800138000",
-        "年龄": 25,
-        "性别": "女",
-        "兴趣爱好": "阅读,音乐,运动",
-    })
+    pool = await create_pool(app_id, app_secret, min_size=1, max_size=4)
+    try:
+        user1_id, user2_id = await user_manager.create_users_async(pool, [
+            {
+                "用户名": "alice",
+                "密码哈希": "hash123",
+                "邮箱": "alice@example.com",
+                "手机号": "13800138000",
+                "年龄": 25,
+                "性别": "女",
+                "兴趣爱好": "阅读,音乐,运动",
+            },
+            {
+                "用户名": "bob",
+                "密码哈希": "hash456",
+                "邮箱": "bob@example.com",
+                "手机号": "13900139000",
+                "年龄": 30,
+                "性别": "男",
+                "兴趣爱好": "游戏,电影",
+            },
+        ])
+    finally:
+        pool.close()
     print(f"创建用户 alice, ID: {user1_id}")
-    
-    user2_id = user_manager.create_user({
-        "用户名": "bob",
-        "密码哈希": "hash456",
-        "邮箱": "bob@example.com",
-        "手机号": "13900139000",
-        "年龄": 30,
-        "性别": "男",
-        "兴趣爱好": "游戏,电影",
-    })
     print(f"创建用户 bob, ID: {user2_id}")
     
     # 查询用户
@@ -234,23 +273,24 @@ def main():
         }
     ]
     
-    product_ids = []
-    for product in products:
-        pid = product_manager.add_product(product)
-        product_ids.append(pid)
+    product_ids = product_manager.add_products(products)
+    for product, pid in zip(products, product_ids):
         print(f"  添加产品: {product['产品名称']} (ID: {pid})")
     
-    # 查询分类产品
-    print("\n查询电子产品...")
-    electronics = product_manager.get_products_by_category("电子产品")
-    for product in electronics:
-        print(f"  {product.get('产品名称')} - ¥{product.get('价格')}")
-    
-    # 查询低库存产品
-    print("\n查询库存低于10的产品...")
-    low_stock = product_manager.get_low_stock_products(10)
-    for product in low_stock:
-        print(f"  {product.get('产品名称')} - 库存: {product.get('库存')}")
+    # 两个查询互不依赖，并发发起
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        electronics_future = executor.submit(product_manager.get_products_by_category, "电子产品")
+        low_stock_future = executor.submit(product_manager.get_low_stock_products, 10)
+        
+        # 查询分类产品
+        print("\n查询电子产品...")
+        for product in electronics_future.result():
+            print(f"  {product.get('产品名称')} - ¥{product.get('价格')}")
+        
+        # 查询低库存产品
+        print("\n查询库存低于10的产品...")
+        for product in low_stock_future.result():
+            print(f"  {product.get('产品名称')} - 库存: {product.get('库存')}")
     
     # 更新库存
     if product_ids and len(product_ids) > 1:
@@ -262,4 +302,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -57,10 +57,9 @@ def main():
         {"用户名": "王五", "年龄": 28, "邮箱": "wangwu@example.com", "会员类型": "普通会员"},
     ]
     
-    record_ids = []
-    for user in users:
-        record_id = db.create(db_name, table_name, user)
-        record_ids.append(record_id)
+    # 一次请求批量写入所有记录
+    record_ids = db.batch_create(db_name, table_name, users)
+    for user, record_id in zip(users, record_ids):
         print(f"  插入记录: {user['用户名']} (ID: {record_id})")
     
     # 查询所有记录
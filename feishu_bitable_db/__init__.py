@@ -6,11 +6,12 @@
 
 __version__ = "0.1.0"
 
-from .db.db import DB
+from .db.db import DB, DBImpl
 from .db.types import Database, Table, Field, SearchCmd, FieldType
 
 __all__ = [
     "DB",
+    "DBImpl",
     "Database",
     "Table", 
     "Field",
@@ -1,6 +1,6 @@
 """飞书客户端模块"""
 
-from .bitable import Bitable
+from .bitable import Bitable, BitableImpl
 from .drive import DriveExt
 
-__all__ = ["Bitable", "DriveExt"]
\ No newline at end of file
+__all__ = ["Bitable", "BitableImpl", "DriveExt"]
\ No newline at end of file
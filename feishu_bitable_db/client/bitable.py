@@ -1,7 +1,11 @@
 """飞书多维表格客户端实现"""
 
 from typing import Optional, Tuple
-from abc import ABC, abstractmethod
+
+try:
+    from typing import Protocol
+except ImportError:  # Python 3.7
+    from typing_extensions import Protocol
 
 import lark_oapi as lark
 from lark_oapi.api.drive.v1 import *
@@ -12,10 +16,9 @@ from .drive import DriveExt
 TYPE = "bitable"
 
 
-class Bitable(ABC):
+class Bitable(Protocol):
     """飞书多维表格接口"""
     
-    @abstractmethod
     def create_app(self, name: str, folder_token: str) -> str:
         """
         创建多维表格应用
@@ -32,7 +35,6 @@ class Bitable(ABC):
         """
         pass
     
-    @abstractmethod
     def query_by_name(self, name: str, folder_token: str) -> Tuple[str, bool]:
         """
         根据名称查询多维表格
@@ -47,7 +49,7 @@ class Bitable(ABC):
         pass
 
 
-class BitableImpl(Bitable):
+class BitableImpl:
     """飞书多维表格实现"""
     
     def __init__(self, client: lark.Client):
@@ -78,6 +80,7 @@ class BitableImpl(Bitable):
         if not response.success():
             raise Exception(f"创建多维表格失败: {response.msg}")
         
+        self.drives.invalidate(folder_token)
         return response.data.token
     
     def query_by_name(self, name: str, folder_token: str) -> Tuple[str, bool]:
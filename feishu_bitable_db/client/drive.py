@@ -6,10 +6,21 @@ from abc import ABC, abstractmethod
 import lark_oapi as lark
 from lark_oapi.api.drive.v1 import *
 
+from ..internal.cache import TTLCache
+
+
+# 文件列表缓存的过期时间（秒）
+DRIVE_FILES_TTL = 30
+
+# 列出文件时每页的文件数
+PAGE_SIZE = 200
+
 
 class DriveFile:
     """云文档文件信息"""
     
+    __slots__ = ("name", "parent_token", "token", "type", "url")
+    
     def __init__(self, data: Dict[str, Any]):
         self.name = data.get("name", "")
         self.parent_token = data.get("parent_token", "")
@@ -39,11 +50,16 @@ class DriveExt:
             client: 飞书客户端
         """
         self.client = client
+        
+        # 文件夹 token -> 文件列表
+        self._files_cache = TTLCache(ttl=DRIVE_FILES_TTL)
     
     def get_drive_files(self, folder_token: str) -> List[Dict[str, Any]]:
         """
         获取文件夹中的文件列表
         
+        会拉取全部分页，结果缓存 DRIVE_FILES_TTL 秒。
+        
         Args:
             folder_token: 文件夹 token
             
@@ -53,22 +69,32 @@ class DriveExt:
         Raises:
             Exception: 获取失败时抛出
         """
-        # 创建请求
-        request = ListFileRequest.builder() \
-            .folder_token(folder_token) \
-            .build()
-        
-        # 发起请求
-        response = self.client.drive.v1.file.list(request)
+        cached = self._files_cache.get(folder_token)
+        if cached is not None:
+            return [dict(file) for file in cached]
         
-        # 处理响应
-        if not response.success():
-            raise Exception(f"获取文件列表失败: {response.msg}")
-        
-        # 返回文件列表
         files = []
-        if response.data and response.data.files:
-            for file in response.data.files:
+        page_token = None
+        while True:
+            # 创建请求
+            builder = ListFileRequest.builder() \
+                .folder_token(folder_token) \
+                .page_size(PAGE_SIZE)
+            if page_token:
+                builder = builder.page_token(page_token)
+            request = builder.build()
+            
+            # 发起请求
+            response = self.client.drive.v1.file.list(request)
+            
+            # 处理响应
+            if not response.success():
+                raise Exception(f"获取文件列表失败: {response.msg}")
+            
+            if not response.data:
+                break
+            
+            for file in response.data.files or []:
                 files.append({
                     "name": file.name,
                     "parent_token": file.parent_token,
@@ -76,5 +102,14 @@ class DriveExt:
                     "type": file.type,
                     "url": file.url if hasattr(file, 'url') else ""
                 })
+            
+            if not response.data.has_more or not response.data.next_page_token:
+                break
+            page_token = response.data.next_page_token
         
-        return files
\ No newline at end of file
+        self._files_cache.set(folder_token, [dict(file) for file in files])
+        return files
+    
+    def invalidate(self, folder_token: str) -> None:
+        """使文件夹的文件列表缓存失效"""
+        self._files_cache.pop(folder_token)
\ No newline at end of file
@@ -1,13 +1,17 @@
 """数据库抽象层模块"""
 
 from .db import DB
+from .async_db import AsyncDBImpl, DBPool, create_pool
 from .field import FieldManager
 from .record import RecordManager
-from .types import Database, Table, Field, SearchCmd, FieldType
+from .types import Database, Table, Field, SearchCmd, FieldType, Row
 from .conv import get_str, get_int
 
 __all__ = [
     "DB",
+    "AsyncDBImpl",
+    "DBPool",
+    "create_pool",
     "FieldManager",
     "RecordManager",
     "Database",
@@ -15,6 +19,7 @@ __all__ = [
     "Field",
     "SearchCmd",
     "FieldType",
+    "Row",
     "get_str",
     "get_int",
 ]
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""异步数据库模块"""
+
+from typing import List, Dict, Any, Optional, Callable, AsyncIterator, Union
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import logging
+
+from .db import DBImpl
+from .types import Table, SearchCmd, Row
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDBImpl:
+    """
+    异步数据库实现
+    
+    飞书 SDK 只提供阻塞式 HTTP 调用，这里把每次调用放到线程池中执行，
+    使多个协程的网络 I/O 可以重叠。
+    """
+    
+    def __init__(self, db: DBImpl, executor: Optional[ThreadPoolExecutor] = None):
+        """
+        初始化
+        
+        Args:
+            db: 同步数据库实例
+            executor: 执行阻塞调用的线程池，为空时使用事件循环默认线程池
+        """
+        self.db = db
+        self._executor = executor
+    
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    async def save_database(self, name: str) -> str:
+        """创建数据库（如果不存在）"""
+        return await self._run(self.db.save_database, name)
+    
+    async def save_table(self, database: str, table: Table) -> str:
+        """创建或更新表"""
+        return await self._run(self.db.save_table, database, table)
+    
+    async def list_tables(self, database: str) -> List[str]:
+        """列出数据库中的所有表"""
+        return await self._run(self.db.list_tables, database)
+    
+    async def drop_table(self, database: str, table: str) -> None:
+        """删除表"""
+        await self._run(self.db.drop_table, database, table)
+    
+    async def create(self, database: str, table: str, record: Dict[str, Any]) -> str:
+        """创建记录"""
+        return await self._run(self.db.create, database, table, record)
+    
+    async def batch_create(self, database: str, table: str,
+                           records: List[Dict[str, Any]]) -> List[str]:
+        """批量创建记录"""
+        return await self._run(self.db.batch_create, database, table, records)
+    
+    async def read(self, database: str, table: str, search_cmds: List[SearchCmd],
+                   use_cache: bool = True) -> List[Dict[str, Any]]:
+        """查询记录"""
+        return await self._run(self.db.read, database, table, search_cmds, use_cache)
+    
+    async def read_columnar(self, database: str, table: str, search_cmds: List[SearchCmd],
+                            use_cache: bool = True) -> Dict[str, List[Any]]:
+        """按列查询记录"""
+        return await self._run(self.db.read_columnar, database, table, search_cmds, use_cache)
+    
+    async def read_rows(self, database: str, table: str, search_cmds: List[SearchCmd],
+                        use_cache: bool = True) -> List[Union[Row, Dict[str, Any]]]:
+        """查询记录，返回以属性访问字段的记录对象"""
+        return await self._run(self.db.read_rows, database, table, search_cmds, use_cache)
+    
+    async def update(self, database: str, table: str, record_id: str,
+                     record: Dict[str, Any]) -> None:
+        """更新记录"""
+        await self._run(self.db.update, database, table, record_id, record)
+    
+    async def batch_update(self, database: str, table: str,
+                           records: Dict[str, Dict[str, Any]]) -> None:
+        """批量更新记录"""
+        await self._run(self.db.batch_update, database, table, records)
+    
+    async def delete(self, database: str, table: str, record_id: str) -> None:
+        """删除记录"""
+        await self._run(self.db.delete, database, table, record_id)
+    
+    async def batch_delete(self, database: str, table: str, record_ids: List[str]) -> None:
+        """批量删除记录"""
+        await self._run(self.db.batch_delete, database, table, record_ids)
+
+
+class DBPool:
+    """数据库连接池，每个连接同一时间只被一个协程使用"""
+    
+    def __init__(self, app_id: str, app_secret: str, min_size: int = 1, max_size: int = 10):
+        """
+        初始化
+        
+        Args:
+            app_id: 飞书应用 ID
+            app_secret: 飞书应用密钥
+            min_size: 预先建立的连接数
+            max_size: 最大连接数，同时也是并发调用的上限
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"连接池大小无效: min_size={min_size}, max_size={max_size}")
+        
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.min_size = min_size
+        self.max_size = max_size
+        
+        self._executor = ThreadPoolExecutor(max_workers=max_size)
+        # Python 3.10 之前 Semaphore 创建时绑定当前事件循环，在事件循环中首次使用时再创建
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._idle: List[DBImpl] = []
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取限制并发连接数的信号量"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
+        return self._semaphore
+    
+    async def _open(self) -> DBImpl:
+        """建立新连接"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, DBImpl, self.app_id, self.app_secret)
+    
+    async def initialize(self) -> None:
+        """预先建立 min_size 个连接"""
+        self._get_semaphore()
+        dbs = await asyncio.gather(*(self._open() for _ in range(self.min_size)))
+        self._idle.extend(dbs)
+        logger.debug(f"连接池初始化完成: size={len(self._idle)}")
+    
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AsyncDBImpl]:
+        """获取连接"""
+        async with self._get_semaphore():
+            db = self._idle.pop() if self._idle else await self._open()
+            try:
+                yield AsyncDBImpl(db, self._executor)
+            finally:
+                self._idle.append(db)
+    
+    def close(self) -> None:
+        """关闭连接池"""
+        self._idle.clear()
+        self._executor.shutdown(wait=True)
+
+
+async def create_pool(app_id: str, app_secret: str,
+                      min_size: int = 1, max_size: int = 10) -> DBPool:
+    """
+    创建数据库连接池
+    
+    Args:
+        app_id: 飞书应用 ID
+        app_secret: 飞书应用密钥
+        min_size: 预先建立的连接数
+        max_size: 最大连接数
+    
+    Returns:
+        已初始化的连接池
+    """
+    pool = DBPool(app_id, app_secret, min_size, max_size)
+    await pool.initialize()
+    return pool
\ No newline at end of file
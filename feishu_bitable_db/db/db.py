@@ -1,79 +1,125 @@
 """数据库主模块"""
 
-from typing import List, Dict, Any, Optional, Tuple
-from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Type, Union
 import logging
+import threading
+
+try:
+    from typing import Protocol
+except ImportError:  # Python 3.7
+    from typing_extensions import Protocol
 
 import lark_oapi as lark
 from lark_oapi.api.bitable.v1 import *
 from lark_oapi.api.drive.v1 import *
 
-from .types import Database, Table, Field, SearchCmd, FieldType, ID, NAME
-from .field import FieldManagerImpl
+from .types import (
+    Database, Table, Field, SearchCmd, FieldType, FIELD_TYPE_CODE, ID, NAME, Row, make_row_class,
+)
+from .field import FieldManagerImpl, FIELD_CACHE_TTL
 from .record import RecordManager
 from ..client import Bitable, BitableImpl
+from ..internal.cache import TTLCache
+from ..internal.http import enable_keep_alive
 
 
 logger = logging.getLogger(__name__)
 
+# 表列表缓存的过期时间（秒）
+TABLE_CACHE_TTL = 60
+
+# 数据库不存在的查询结果缓存时间（秒）
+MISSING_DB_TTL = 5
+
+# ID 字段的类型编码
+STRING_TYPE = FIELD_TYPE_CODE[FieldType.STRING]
+
 
-class DB(ABC):
+class DB(Protocol):
     """数据库接口"""
     
-    @abstractmethod
     def save_database(self, name: str) -> str:
         """创建数据库（如果不存在）"""
         pass
     
-    @abstractmethod
     def save_table(self, database: str, table: Table) -> str:
         """创建或更新表"""
         pass
     
-    @abstractmethod
     def list_tables(self, database: str) -> List[str]:
         """列出数据库中的所有表"""
         pass
     
-    @abstractmethod
     def drop_table(self, database: str, table: str) -> None:
         """删除表"""
         pass
     
-    @abstractmethod
     def create(self, database: str, table: str, record: Dict[str, Any]) -> str:
         """创建记录"""
         pass
     
-    @abstractmethod
-    def read(self, database: str, table: str, search_cmds: List[SearchCmd]) -> List[Dict[str, Any]]:
+    def batch_create(self, database: str, table: str, records: List[Dict[str, Any]]) -> List[str]:
+        """批量创建记录"""
+        pass
+    
+    def read(self, database: str, table: str, search_cmds: List[SearchCmd],
+             use_cache: bool = True) -> List[Dict[str, Any]]:
         """查询记录"""
         pass
     
-    @abstractmethod
+    def iter_read(self, database: str, table: str,
+                  search_cmds: List[SearchCmd]) -> Iterator[Dict[str, Any]]:
+        """逐条查询记录"""
+        pass
+    
+    def read_columnar(self, database: str, table: str, search_cmds: List[SearchCmd],
+                      use_cache: bool = True) -> Dict[str, List[Any]]:
+        """按列查询记录"""
+        pass
+    
+    def read_rows(self, database: str, table: str, search_cmds: List[SearchCmd],
+                  use_cache: bool = True) -> List[Union[Row, Dict[str, Any]]]:
+        """查询记录，返回以属性访问字段的记录对象"""
+        pass
+    
     def update(self, database: str, table: str, record_id: str, record: Dict[str, Any]) -> None:
         """更新记录"""
         pass
     
-    @abstractmethod
+    def batch_update(self, database: str, table: str, records: Dict[str, Dict[str, Any]]) -> None:
+        """批量更新记录"""
+        pass
+    
     def delete(self, database: str, table: str, record_id: str) -> None:
         """删除记录"""
         pass
+    
+    def batch_delete(self, database: str, table: str, record_ids: List[str]) -> None:
+        """批量删除记录"""
+        pass
 
 
-class DBImpl(DB):
+class DBImpl:
     """数据库实现"""
     
-    def __init__(self, app_id: str, app_secret: str):
+    def __init__(self, app_id: str, app_secret: str, cache_ttl: float = FIELD_CACHE_TTL,
+                 shared_cache: Optional[Any] = None, keep_alive: bool = False):
         """
         初始化数据库
         
         Args:
             app_id: 飞书应用 ID
             app_secret: 飞书应用密钥
+            cache_ttl: 字段列表缓存的过期时间（秒）
+            shared_cache: 多个进程共享的字段缓存，见 FieldManagerImpl
+            keep_alive: 是否让飞书 SDK 复用 HTTP 连接；会替换 SDK 在整个进程内的
+                传输层，见 enable_keep_alive，默认不启用
         """
         logger.debug(f"初始化飞书客户端: app_id={app_id}")
         
+        if keep_alive:
+            enable_keep_alive()
+        
         # 创建客户端
         self.client = lark.Client.builder() \
             .app_id(app_id) \
@@ -84,12 +130,27 @@ class DBImpl(DB):
         
         # 初始化各个管理器
         self.bitable = BitableImpl(self.client)
-        self.field_manager = FieldManagerImpl(self.client)
+        self.field_manager = FieldManagerImpl(self.client, cache_ttl, shared_cache)
         self.record_manager = RecordManager(self.client, self.field_manager)
         
         # 缓存
         self._cache: Dict[str, str] = {}
         
+        # 保护 _cache，并避免多个线程同时创建同名数据库
+        self._cache_lock = threading.RLock()
+        
+        # 查询不到的数据库名，短时间内不再重复查询
+        self._missing_dbs = TTLCache(ttl=MISSING_DB_TTL)
+        
+        # 数据库 token -> (表名 -> 表 ID, 表 ID -> 表名)
+        self._table_cache = TTLCache(ttl=TABLE_CACHE_TTL)
+        
+        # (数据库 token, 表 ID) -> 最近一次 save_table 写入的字段定义
+        self._schema_cache = TTLCache(ttl=TABLE_CACHE_TTL)
+        
+        # (数据库 token, 表 ID) -> save_table 时生成的记录类
+        self._row_classes: Dict[Tuple[str, str], Type[Row]] = {}
+        
         # 获取根文件夹 token 和用户 ID
         self._init_root_meta()
     
@@ -106,15 +167,17 @@ class DBImpl(DB):
     
     def save_database(self, name: str) -> str:
         """创建数据库（如果不存在）"""
-        # 尝试从缓存获取
-        did = self._get_did(name)
-        if did:
+        with self._cache_lock:
+            # 尝试从缓存获取
+            did = self._get_did(name)
+            if did:
+                return did
+            
+            # 创建新数据库
+            did = self.bitable.create_app(name, self.root_token)
+            self._cache[f"db-{name}"] = did
+            self._missing_dbs.pop(name)
             return did
-        
-        # 创建新数据库
-        did = self.bitable.create_app(name, self.root_token)
-        self._cache[f"db-{name}"] = did
-        return did
     
     def save_table(self, database: str, table: Table) -> str:
         """创建或更新表"""
@@ -122,12 +185,25 @@ class DBImpl(DB):
         did = self.save_database(database)
         
         # 获取现有表
-        tables = self._list_tables_with_id(database)
+        tables = self._list_tables_with_id(did)
         table_id = tables.get(table.name)
         
         # 如果表不存在，创建表
         if not table_id:
             table_id = self._create_table(did, table.name)
+            self._remember_table(did, table.name, table_id)
+        
+        # 生成记录类，供 read_rows 使用
+        row_class = make_row_class(table)
+        if row_class is not None:
+            self._row_classes[(did, table_id)] = row_class
+        else:
+            self._row_classes.pop((did, table_id), None)
+        
+        # 字段定义与上次保存的一致时，不再拉取字段列表
+        wanted = {field.name: FIELD_TYPE_CODE[field.type] for field in table.fields}
+        if self._schema_cache.get((did, table_id)) == wanted:
+            return table_id
         
         # 获取现有字段
         fields = self.field_manager.list_fields(did, table_id)
@@ -138,47 +214,47 @@ class DBImpl(DB):
             self.field_manager.update_field(did, table_id, {
                 "field_id": fields[0]["field_id"],
                 "field_name": ID,
-                "type": int(FieldType.STRING),
+                "type": STRING_TYPE,
             })
             del old_field_map[fields[0]["field_name"]]
         
         # 移除 ID 字段，因为已经处理过
         old_field_map.pop(ID, None)
         
-        # 更新或创建字段
-        for field in table.fields:
-            old_field = old_field_map.get(field.name)
+        # 字段定义一致时无需任何修改
+        existing = {name: field["type"] for name, field in old_field_map.items()}
+        if wanted == existing:
+            self._schema_cache.set((did, table_id), wanted)
+            return table_id
+        
+        # 只处理有差异的字段
+        to_create = []
+        to_update = []
+        for name, field_type in wanted.items():
+            old_field = old_field_map.pop(name, None)
             
-            if old_field:
-                # 字段存在，检查是否需要更新
-                if field.name == old_field["field_name"] and int(field.type) == old_field["type"]:
-                    # 字段相同，无需更新
-                    old_field_map.pop(field.name)
-                    continue
-                
-                # 更新字段
-                self.field_manager.update_field(did, table_id, {
+            if old_field is None:
+                to_create.append({"field_name": name, "type": field_type})
+            elif old_field["type"] != field_type:
+                to_update.append({
                     "field_id": old_field["field_id"],
-                    "field_name": field.name,
-                    "type": int(field.type),
-                })
-                old_field_map.pop(field.name)
-            else:
-                # 创建新字段
-                self.field_manager.create_field(did, table_id, {
-                    "field_name": field.name,
-                    "type": int(field.type),
+                    "field_name": name,
+                    "type": field_type,
                 })
         
-        # 删除不再需要的字段
-        for field in old_field_map.values():
-            self.field_manager.delete_field(did, table_id, field["field_id"])
+        # 剩下的是不再需要的字段
+        to_delete = [field["field_id"] for field in old_field_map.values()]
         
+        self.field_manager.batch_create_fields(did, table_id, to_create)
+        self.field_manager.batch_update_fields(did, table_id, to_update)
+        self.field_manager.batch_delete_fields(did, table_id, to_delete)
+        
+        self._schema_cache.set((did, table_id), wanted)
         return table_id
     
     def list_tables(self, database: str) -> List[str]:
         """列出数据库中的所有表"""
-        tables = self._list_tables_with_id(database)
+        tables = self._list_tables_with_id(self.save_database(database))
         return list(tables.keys())
     
     def drop_table(self, database: str, table: str) -> None:
@@ -189,7 +265,7 @@ class DBImpl(DB):
             raise ValueError(f"数据库 [{database}] 不存在")
         
         # 获取表 ID
-        tid = self._get_tid(database, table)
+        tid = self._get_tid(did, table)
         if not tid:
             raise ValueError(f"表 [{database}.{table}] 不存在")
         
@@ -205,28 +281,86 @@ class DBImpl(DB):
             logger.error(f"删除表失败: database={did}, table={tid}, error={response.msg}")
             raise Exception(f"删除表失败: {response.msg}")
         
-        logger.debug(f"删除表成功: {response}")
+        logger.debug("删除表成功: %s", response)
+        self._table_cache.pop(did)
+        self._schema_cache.pop((did, tid))
+        self._row_classes.pop((did, tid), None)
     
     def create(self, database: str, table: str, record: Dict[str, Any]) -> str:
         """创建记录"""
-        return self.record_manager.create(database, table, record)
+        did, tid = self._resolve(database, table)
+        return self.record_manager.create(did, tid, record)
+    
+    def batch_create(self, database: str, table: str, records: List[Dict[str, Any]]) -> List[str]:
+        """批量创建记录"""
+        did, tid = self._resolve(database, table)
+        return self.record_manager.batch_create(did, tid, records)
     
-    def read(self, database: str, table: str, search_cmds: List[SearchCmd]) -> List[Dict[str, Any]]:
+    def read(self, database: str, table: str, search_cmds: List[SearchCmd],
+             use_cache: bool = True) -> List[Dict[str, Any]]:
         """查询记录"""
-        return self.record_manager.read(database, table, search_cmds)
+        did, tid = self._resolve(database, table)
+        return self.record_manager.read(did, tid, search_cmds, use_cache)
+    
+    def iter_read(self, database: str, table: str,
+                  search_cmds: List[SearchCmd]) -> Iterator[Dict[str, Any]]:
+        """逐条查询记录"""
+        did, tid = self._resolve(database, table)
+        return self.record_manager.iter_read(did, tid, search_cmds)
+    
+    def read_columnar(self, database: str, table: str, search_cmds: List[SearchCmd],
+                      use_cache: bool = True) -> Dict[str, List[Any]]:
+        """按列查询记录"""
+        did, tid = self._resolve(database, table)
+        return self.record_manager.read_columnar(did, tid, search_cmds, use_cache)
+    
+    def read_rows(self, database: str, table: str, search_cmds: List[SearchCmd],
+                  use_cache: bool = True) -> List[Union[Row, Dict[str, Any]]]:
+        """
+        查询记录，返回以属性访问字段的记录对象
+        
+        记录类在 save_table 时按字段生成；当前实例未保存过该表，
+        或字段名不能作为属性名时，返回与 read 相同的字典。
+        """
+        did, tid = self._resolve(database, table)
+        records = self.record_manager.read(did, tid, search_cmds, use_cache)
+        
+        row_class = self._row_classes.get((did, tid))
+        if row_class is None:
+            return records
+        return [row_class(record) for record in records]
     
     def update(self, database: str, table: str, record_id: str, record: Dict[str, Any]) -> None:
         """更新记录"""
-        self.record_manager.update(database, table, record_id, record)
+        did, tid = self._resolve(database, table)
+        self.record_manager.update(did, tid, record_id, record)
+    
+    def batch_update(self, database: str, table: str, records: Dict[str, Dict[str, Any]]) -> None:
+        """批量更新记录"""
+        did, tid = self._resolve(database, table)
+        self.record_manager.batch_update(did, tid, records)
     
     def delete(self, database: str, table: str, record_id: str) -> None:
         """删除记录"""
-        self.record_manager.delete(database, table, record_id)
+        did, tid = self._resolve(database, table)
+        self.record_manager.delete(did, tid, record_id)
+    
+    def batch_delete(self, database: str, table: str, record_ids: List[str]) -> None:
+        """批量删除记录"""
+        did, tid = self._resolve(database, table)
+        self.record_manager.batch_delete(did, tid, record_ids)
     
-    def _list_tables_with_id(self, database: str) -> Dict[str, str]:
+    def _resolve(self, database: str, table: str) -> Tuple[str, str]:
+        """将数据库名、表名解析为 token 和表 ID，已是 token/ID 时原样返回"""
+        did = self._get_did(database) or database
+        tid = self._get_tid(did, table) or table
+        return did, tid
+    
+    def _list_tables_with_id(self, did: str) -> Dict[str, str]:
         """获取表名到表 ID 的映射"""
-        # 确保数据库存在
-        did = self.save_database(database)
+        cached = self._table_cache.get(did)
+        if cached is not None:
+            return cached[0]
         
         # 创建请求
         request = ListAppTableRequest.builder() \
@@ -237,10 +371,10 @@ class DBImpl(DB):
         response = self.client.bitable.v1.app_table.list(request)
         
         if not response.success():
-            logger.error(f"列出表失败: database={database}, app_token={did}, error={response.msg}")
+            logger.error(f"列出表失败: app_token={did}, error={response.msg}")
             return {}
         
-        logger.debug(f"列出表成功: {response}")
+        logger.debug("列出表成功: %s", response)
         
         # 返回表名到 ID 的映射
         result = {}
@@ -248,8 +382,20 @@ class DBImpl(DB):
             for item in response.data.items:
                 result[item.name] = item.table_id
         
+        self._table_cache.set(did, (result, {tid: name for name, tid in result.items()}))
         return result
     
+    def _remember_table(self, did: str, name: str, tid: str) -> None:
+        """将新建的表写入表列表缓存，避免重新列出"""
+        cached = self._table_cache.get(did)
+        if cached is None:
+            return
+        
+        tables, names = cached
+        tables = {**tables, name: tid}
+        names = {**names, tid: name}
+        self._table_cache.set(did, (tables, names))
+    
     def _create_table(self, app_token: str, name: str) -> str:
         """创建表"""
         # 创建请求
@@ -269,7 +415,7 @@ class DBImpl(DB):
             logger.error(f"创建表失败: app_token={app_token}, error={response.msg}")
             raise Exception(f"创建表失败: {response.msg}")
         
-        logger.debug(f"创建表成功: {response}")
+        logger.debug("创建表成功: %s", response)
         return response.data.table_id
     
     def _get_did(self, database: str) -> Optional[str]:
@@ -280,29 +426,30 @@ class DBImpl(DB):
         
         # 从缓存获取
         cache_key = f"db-{database}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        did = self._cache.get(cache_key)
+        if did:
+            return did
         
-        # 从飞书查询
+        # 最近查询过且不存在
+        if self._missing_dbs.get(database):
+            return None
+        
+        # 从飞书查询，查询需要列出文件夹，开销较大
         did, found = self.bitable.query_by_name(database, self.root_token)
         if found:
-            self._cache[cache_key] = did
+            with self._cache_lock:
+                self._cache[cache_key] = did
             return did
         
+        self._missing_dbs.set(database, True)
         return None
     
-    def _get_tid(self, database: str, table: str) -> Optional[str]:
+    def _get_tid(self, did: str, table: str) -> Optional[str]:
         """获取表 ID"""
-        # 从缓存获取
-        cache_key = f"table-{database}-{table}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-        
-        # 获取所有表
-        tables = self._list_tables_with_id(database)
-        
-        # 更新缓存
-        for name, tid in tables.items():
-            self._cache[f"table-{database}-{name}"] = tid
-        
-        return tables.get(table)
\ No newline at end of file
+        return self._list_tables_with_id(did).get(table)
+    
+    def _get_table_name(self, did: str, tid: str) -> Optional[str]:
+        """根据表 ID 获取表名"""
+        self._list_tables_with_id(did)
+        cached = self._table_cache.get(did)
+        return cached[1].get(tid) if cached else None
\ No newline at end of file
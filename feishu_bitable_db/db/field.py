@@ -1,17 +1,26 @@
 """字段管理模块"""
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import json
 import logging
 
 import lark_oapi as lark
 from lark_oapi.api.bitable.v1 import *
 
 from .types import FieldType
+from ..internal.cache import TTLCache
 
 
 logger = logging.getLogger(__name__)
 
+# 批量字段操作的并发数
+BATCH_WORKERS = 8
+
+# 字段列表缓存的默认过期时间（秒）
+FIELD_CACHE_TTL = 300
+
 
 class FieldManager(ABC):
     """字段管理接口"""
@@ -35,16 +44,78 @@ class FieldManager(ABC):
     def delete_field(self, app_token: str, table_id: str, field_id: str) -> None:
         """删除字段"""
         pass
+    
+    @abstractmethod
+    def batch_create_fields(self, app_token: str, table_id: str,
+                            fields: List[Dict[str, Any]]) -> List[str]:
+        """批量创建字段"""
+        pass
+    
+    @abstractmethod
+    def batch_update_fields(self, app_token: str, table_id: str,
+                            fields: List[Dict[str, Any]]) -> None:
+        """批量更新字段"""
+        pass
+    
+    @abstractmethod
+    def batch_delete_fields(self, app_token: str, table_id: str, field_ids: List[str]) -> None:
+        """批量删除字段"""
+        pass
 
 
 class FieldManagerImpl(FieldManager):
     """字段管理实现"""
     
-    def __init__(self, client: lark.Client):
+    def __init__(self, client: lark.Client, cache_ttl: float = FIELD_CACHE_TTL,
+                 shared_cache: Optional[Any] = None):
+        """
+        初始化
+        
+        Args:
+            client: 飞书客户端
+            cache_ttl: 字段列表缓存的过期时间（秒）
+            shared_cache: 多个进程共享的字段缓存（如 Redis），需提供
+                get(key) / set(key, value, ttl) / pop(key)，值为 JSON 字符串
+        """
         self.client = client
+        self._shared_cache = shared_cache
+        
+        # (应用 token, 表 ID) -> (字段列表, 字段名到字段 ID 的映射)，通过本实例修改字段时失效
+        self._field_cache = TTLCache(ttl=cache_ttl, maxsize=256)
     
     def list_fields(self, app_token: str, table_id: str) -> List[Dict[str, Any]]:
         """列出表的所有字段"""
+        fields, _ = self._cached_fields(app_token, table_id)
+        return [dict(field) for field in fields]
+    
+    def field_name_id_map(self, app_token: str, table_id: str) -> Dict[str, str]:
+        """获取字段名到字段 ID 的映射"""
+        _, name_id_map = self._cached_fields(app_token, table_id)
+        return dict(name_id_map)
+    
+    def has_field(self, app_token: str, table_id: str, field_name: str) -> bool:
+        """判断表中是否存在指定名称的字段"""
+        _, name_id_map = self._cached_fields(app_token, table_id)
+        return field_name in name_id_map
+    
+    def _cached_fields(self, app_token: str,
+                       table_id: str) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """获取字段列表及字段名映射（缓存中的原始对象，调用方不得修改）"""
+        cached = self._field_cache.get((app_token, table_id))
+        if cached is not None:
+            return cached
+        
+        fields = self._load_shared(app_token, table_id)
+        if fields is None:
+            fields = self._fetch_fields(app_token, table_id)
+            self._store_shared(app_token, table_id, fields)
+        
+        entry = (fields, {field["field_name"]: field["field_id"] for field in fields})
+        self._field_cache.set((app_token, table_id), entry)
+        return entry
+    
+    def _fetch_fields(self, app_token: str, table_id: str) -> List[Dict[str, Any]]:
+        """向飞书查询字段列表"""
         # 创建请求
         request = ListAppTableFieldRequest.builder() \
             .app_token(app_token) \
@@ -59,7 +130,7 @@ class FieldManagerImpl(FieldManager):
             logger.error(f"列出字段失败: app_token={app_token}, table_id={table_id}, error={response.msg}")
             raise Exception(f"列出字段失败: {response.msg}")
         
-        logger.debug(f"列出字段成功: {response}")
+        logger.debug("列出字段成功: %s", response)
         
         # 返回字段列表
         fields = []
@@ -69,6 +140,35 @@ class FieldManagerImpl(FieldManager):
         
         return fields
     
+    def _load_shared(self, app_token: str, table_id: str) -> Optional[List[Dict[str, Any]]]:
+        """从共享缓存读取字段列表，未命中时返回 None"""
+        if self._shared_cache is None or self._field_cache.ttl <= 0:
+            return None
+        
+        payload = self._shared_cache.get(f"{app_token}:{table_id}")
+        if not payload:
+            return None
+        
+        fields = json.loads(payload)
+        for field in fields:
+            if field.get("property") is not None:
+                field["property"] = AppTableFieldProperty(field["property"])
+        return fields
+    
+    def _store_shared(self, app_token: str, table_id: str, fields: List[Dict[str, Any]]) -> None:
+        """写入共享缓存"""
+        if self._shared_cache is None or self._field_cache.ttl <= 0:
+            return
+        
+        self._shared_cache.set(f"{app_token}:{table_id}", lark.JSON.marshal(fields),
+                               self._field_cache.ttl)
+    
+    def _invalidate(self, app_token: str, table_id: str) -> None:
+        """字段变更后清除本地和共享缓存"""
+        self._field_cache.pop((app_token, table_id))
+        if self._shared_cache is not None:
+            self._shared_cache.pop(f"{app_token}:{table_id}")
+    
     def create_field(self, app_token: str, table_id: str, field: Dict[str, Any]) -> str:
         """创建字段"""
         # 构建字段对象
@@ -89,7 +189,8 @@ class FieldManagerImpl(FieldManager):
             logger.error(f"创建字段失败: app_token={app_token}, error={response.msg}")
             raise Exception(f"创建字段失败: {response.msg}")
         
-        logger.debug(f"创建字段成功: {response}")
+        logger.debug("创建字段成功: %s", response)
+        self._invalidate(app_token, table_id)
         
         return response.data.field.field_id
     
@@ -119,7 +220,8 @@ class FieldManagerImpl(FieldManager):
                         f"field_id={field_id}, error={response.msg}")
             raise Exception(f"更新字段失败: {response.msg}")
         
-        logger.debug(f"更新字段成功: {response}")
+        logger.debug("更新字段成功: %s", response)
+        self._invalidate(app_token, table_id)
     
     def delete_field(self, app_token: str, table_id: str, field_id: str) -> None:
         """删除字段"""
@@ -138,7 +240,42 @@ class FieldManagerImpl(FieldManager):
             logger.error(f"删除字段失败: app_token={app_token}, field_id={field_id}, error={response.msg}")
             raise Exception(f"删除字段失败: {response.msg}")
         
-        logger.debug(f"删除字段成功: {response}")
+        logger.debug("删除字段成功: %s", response)
+        self._invalidate(app_token, table_id)
+    
+    def batch_create_fields(self, app_token: str, table_id: str,
+                            fields: List[Dict[str, Any]]) -> List[str]:
+        """
+        批量创建字段，返回字段 ID 列表
+        
+        飞书按创建时间排列字段，且同一张表的并发写入可能冲突，因此按声明顺序逐个创建。
+        """
+        return [self.create_field(app_token, table_id, field) for field in fields]
+    
+    def batch_update_fields(self, app_token: str, table_id: str,
+                            fields: List[Dict[str, Any]]) -> None:
+        """批量更新字段，逐个更新"""
+        for field in fields:
+            self.update_field(app_token, table_id, field)
+    
+    def batch_delete_fields(self, app_token: str, table_id: str, field_ids: List[str]) -> None:
+        """批量删除字段"""
+        self._run_batch(
+            lambda field_id: self.delete_field(app_token, table_id, field_id), field_ids
+        )
+    
+    def _run_batch(self, func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """
+        执行批量操作
+        
+        飞书没有批量修改字段的接口，超过 2 个时并发发起请求。删除与顺序无关，
+        只用于删除。
+        """
+        if len(items) <= 2:
+            return [func(item) for item in items]
+        
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(items))) as executor:
+            return list(executor.map(func, items))
     
     def _field_to_dict(self, field: AppTableField) -> Dict[str, Any]:
         """将字段对象转换为字典"""
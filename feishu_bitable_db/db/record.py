@@ -1,17 +1,70 @@
 """记录管理模块"""
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Hashable, Iterator
+from concurrent.futures import Future
+import functools
 import logging
+import sys
+import threading
 
 import lark_oapi as lark
 from lark_oapi.api.bitable.v1 import *
 
 from .types import SearchCmd, ID
 from .field import FieldManagerImpl
+from ..internal.cache import TTLCache
 
 
 logger = logging.getLogger(__name__)
 
+# 飞书批量接口单次最多处理的记录数
+BATCH_SIZE = 500
+
+# 查询记录时每页的记录数
+PAGE_SIZE = 500
+
+# 查询结果缓存的过期时间（秒）
+READ_CACHE_TTL = 30
+
+# 无过滤条件的查询结果超过该行数时不缓存
+READ_CACHE_MAX_ROWS = 1000
+
+
+def _quote(val: str) -> str:
+    """将字符串格式化为 filter 中的字符串字面量，转义反斜杠与引号"""
+    return '"' + val.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+# 条件值类型到 filter 字面量格式化函数的映射
+_VALUE_FORMATTERS = {
+    str: _quote,
+    int: str,
+    float: str,
+    bool: lambda val: "true" if val else "false",
+}
+
+
+def _format_value(val: Any) -> str:
+    """将条件值格式化为 filter 字面量"""
+    formatter = _VALUE_FORMATTERS.get(type(val))
+    if formatter is None:
+        # str 的子类同样加引号，其他类型直接转字符串
+        formatter = _quote if isinstance(val, str) else str
+    return formatter(val)
+
+
+@functools.lru_cache(maxsize=512)
+def _compile_filter(search_cmds: Tuple[SearchCmd, ...], val_types: Tuple[type, ...]) -> str:
+    """
+    将搜索条件编译为飞书 filter 表达式，相同条件只编译一次
+    
+    val_types 只参与缓存键，避免 1、1.0、True 这类相等的值共用同一结果。
+    """
+    filters = [
+        f'CurrentValue.[{cmd.key}]{cmd.operator}{_format_value(cmd.val)}' for cmd in search_cmds
+    ]
+    return f"AND({','.join(filters)})" if filters else ""
+
 
 class RecordManager:
     """记录管理器"""
@@ -19,6 +72,42 @@ class RecordManager:
     def __init__(self, client: lark.Client, field_manager: FieldManagerImpl):
         self.client = client
         self.field_manager = field_manager
+        
+        # 查询结果缓存，键中带有表的版本号，写入时递增版本号使旧结果失效
+        self._read_cache = TTLCache(ttl=READ_CACHE_TTL, maxsize=512)
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._versions_lock = threading.Lock()
+        
+        # 进行中的查询，相同查询并发到达时只发起一次请求
+        self._inflight: Dict[Hashable, Future] = {}
+        self._inflight_lock = threading.Lock()
+    
+    def _invalidate(self, database: str, table: str) -> None:
+        """使表的查询结果缓存失效"""
+        with self._versions_lock:
+            key = (database, table)
+            self._versions[key] = self._versions.get(key, 0) + 1
+    
+    def _read_cache_key(self, database: str, table: str,
+                        search_cmds: List[SearchCmd]) -> Optional[Hashable]:
+        """构建查询缓存键，条件值不可哈希时返回 None"""
+        # 值类型计入键：1 与 True 相等且哈希相同，但编译出的 filter 不同；
+        # 按 repr 排序，避免不同类型的值之间比较大小
+        conditions = sorted(
+            ((cmd.key, cmd.operator, type(cmd.val), cmd.val) for cmd in search_cmds),
+            key=lambda cond: (cond[0], cond[1], cond[2].__name__, repr(cond[3])),
+        )
+        key = (
+            database,
+            table,
+            self._versions.get((database, table), 0),
+            tuple(conditions),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
     
     def create(self, database: str, table: str, record: Dict[str, Any]) -> str:
         """
@@ -32,15 +121,10 @@ class RecordManager:
         Returns:
             创建的记录 ID
         """
-        # 获取字段列表
-        fields = self.field_manager.list_fields(database, table)
-        field_map = {field["field_name"]: field["field_id"] for field in fields}
-        
         # 如果存在 ID 字段，先设置为空
-        update_id_after = False
-        if ID in field_map:
+        update_id_after = self.field_manager.has_field(database, table, ID)
+        if update_id_after:
             record[ID] = ""
-            update_id_after = True
         
         # 创建记录请求
         request_body = AppTableRecord.builder() \
@@ -54,7 +138,6 @@ class RecordManager:
             .build()
         
         # 发起请求
-        logger.info(f"创建记录请求: {request}")
         response = self.client.bitable.v1.app_table_record.create(request)
         
         # 处理响应
@@ -62,80 +145,216 @@ class RecordManager:
             logger.error(f"创建记录失败: database={database}, table={table}, error={response.msg}")
             raise Exception(f"创建记录失败: {response.msg}")
         
-        logger.debug(f"创建记录成功: {response}")
+        logger.debug("创建记录成功: %s", response)
         record_id = response.data.record.record_id
+        self._invalidate(database, table)
         
-        # 如果需要更新 ID 字段
+        # 如果需要更新 ID 字段（已知字段存在，无需再查询字段列表）
         if update_id_after:
             try:
-                self.update(database, table, record_id, {})
+                self._update_record(database, table, record_id, {ID: record_id})
             except Exception as e:
                 logger.warning(f"更新 ID 字段失败: {e}")
         
         return record_id
     
-    def read(self, database: str, table: str, search_cmds: List[SearchCmd]) -> List[Dict[str, Any]]:
+    def batch_create(self, database: str, table: str, records: List[Dict[str, Any]]) -> List[str]:
+        """
+        批量创建记录
+        
+        Args:
+            database: 数据库（应用）token
+            table: 表 ID
+            records: 记录数据列表
+            
+        Returns:
+            创建的记录 ID 列表，顺序与 records 一致
+        """
+        if not records:
+            return []
+        
+        # 如果存在 ID 字段，先设置为空
+        has_id_field = self.field_manager.has_field(database, table, ID)
+        if has_id_field:
+            for record in records:
+                record[ID] = ""
+        
+        record_ids: List[str] = []
+        for start in range(0, len(records), BATCH_SIZE):
+            chunk = records[start:start + BATCH_SIZE]
+            
+            # 创建请求
+            request_body = BatchCreateAppTableRecordRequestBody.builder() \
+                .records([AppTableRecord.builder().fields(record).build() for record in chunk]) \
+                .build()
+            
+            request = BatchCreateAppTableRecordRequest.builder() \
+                .app_token(database) \
+                .table_id(table) \
+                .request_body(request_body) \
+                .build()
+            
+            # 发起请求
+            response = self.client.bitable.v1.app_table_record.batch_create(request)
+            
+            # 处理响应
+            if not response.success():
+                logger.error(f"批量创建记录失败: database={database}, table={table}, error={response.msg}")
+                raise Exception(f"批量创建记录失败: {response.msg}")
+            
+            logger.debug("批量创建记录成功: %s", response)
+            record_ids.extend(item.record_id for item in response.data.records)
+            self._invalidate(database, table)
+        
+        # 如果需要更新 ID 字段
+        if has_id_field:
+            try:
+                self._batch_update_records(
+                    database, table, {record_id: {ID: record_id} for record_id in record_ids}
+                )
+            except Exception as e:
+                logger.warning(f"批量更新 ID 字段失败: {e}")
+        
+        return record_ids
+    
+    def read(self, database: str, table: str, search_cmds: List[SearchCmd],
+             use_cache: bool = True) -> List[Dict[str, Any]]:
         """
         查询记录
         
         Args:
             database: 数据库（应用）token
             table: 表 ID
-            search_cmds: 搜索条件列表
+            search_cmds: 搜索条件列表，多个条件以 AND 组合；
+                同一字段可出现多次以表达区间，如 >= 与 <=
+            use_cache: 是否使用查询结果缓存，需要读取最新数据时传 False
             
         Returns:
             记录列表
         """
-        # 构建过滤条件
-        filters = []
-        for cmd in search_cmds:
-            key = cmd.key
-            operator = cmd.operator
-            val = cmd.val
-            
-            if isinstance(val, str):
-                filters.append(f'CurrentValue.[{key}]{operator}"{val}"')
-            elif isinstance(val, (int, float)):
-                filters.append(f'CurrentValue.[{key}]{operator}{val}')
-            else:
-                filters.append(f'CurrentValue.[{key}]{operator}{val}')
-        
-        # 组合过滤条件
-        if len(filters) == 0:
-            filter_str = ""
-        elif len(filters) == 1:
-            filter_str = f"AND({filters[0]})"
-        else:
-            filter_str = f"AND({','.join(filters)})"
+        cache_key = self._read_cache_key(database, table, search_cmds) if use_cache else None
+        if cache_key is None:
+            return self._fetch(database, table, search_cmds)
         
-        # 创建请求
-        request = ListAppTableRecordRequest.builder() \
-            .app_token(database) \
-            .table_id(table) \
-            .filter(filter_str) \
-            .page_size(1000) \
-            .build()
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return [dict(record) for record in cached]
         
-        # 发起请求
-        response = self.client.bitable.v1.app_table_record.list(request)
+        # 相同查询正在进行时等待其结果
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[cache_key] = future
         
-        # 处理响应
-        if not response.success():
-            logger.error(f"查询记录失败: database={database}, table={table}, "
-                        f"filter={filter_str}, error={response.msg}")
-            return []
+        if not leader:
+            return [dict(record) for record in future.result()]
+        
+        try:
+            results = self._fetch(database, table, search_cmds)
+            snapshot = [dict(record) for record in results]
+            if search_cmds or len(results) <= READ_CACHE_MAX_ROWS:
+                self._read_cache.set(cache_key, snapshot)
+            future.set_result(snapshot)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(cache_key, None)
+        
+        return results
+    
+    def read_columnar(self, database: str, table: str, search_cmds: List[SearchCmd],
+                      use_cache: bool = True) -> Dict[str, List[Any]]:
+        """
+        按列查询记录
         
-        logger.debug(f"查询记录成功: {response}")
+        Args:
+            database: 数据库（应用）token
+            table: 表 ID
+            search_cmds: 搜索条件列表，含义同 read
+            use_cache: 是否使用查询结果缓存
+            
+        Returns:
+            字段名到列值列表的映射，各列长度相同，记录缺少的字段为 None
+        """
+        records = self.read(database, table, search_cmds, use_cache)
         
-        # 处理结果
-        results = []
-        if response.data and response.data.items:
-            for item in response.data.items:
+        keys: Dict[str, None] = {}
+        for record in records:
+            for key in record:
+                if key not in keys:
+                    keys[sys.intern(key)] = None
+        
+        return {key: [record.get(key) for record in records] for key in keys}
+    
+    def iter_read(self, database: str, table: str,
+                  search_cmds: List[SearchCmd]) -> Iterator[Dict[str, Any]]:
+        """
+        逐条查询记录
+        
+        按页向飞书拉取，调用方停止迭代后不再请求后续页，内存中只保留一页数据。
+        不使用查询结果缓存。任一页请求失败时抛出异常，避免调用方把不完整的结果
+        当作整张表。
+        
+        Args:
+            database: 数据库（应用）token
+            table: 表 ID
+            search_cmds: 搜索条件列表，含义同 read
+            
+        Yields:
+            记录
+        """
+        # 构建过滤条件
+        cmds = tuple(search_cmds)
+        val_types = tuple(type(cmd.val) for cmd in cmds)
+        try:
+            filter_str = _compile_filter(cmds, val_types)
+        except TypeError:
+            # 条件值不可哈希时无法缓存
+            filter_str = _compile_filter.__wrapped__(cmds, val_types)
+        
+        page_token = None
+        while True:
+            # 创建请求
+            builder = ListAppTableRecordRequest.builder() \
+                .app_token(database) \
+                .table_id(table) \
+                .filter(filter_str) \
+                .page_size(PAGE_SIZE)
+            if page_token:
+                builder = builder.page_token(page_token)
+            request = builder.build()
+            
+            # 发起请求
+            response = self.client.bitable.v1.app_table_record.list(request)
+            
+            # 处理响应
+            if not response.success():
+                logger.error(f"查询记录失败: database={database}, table={table}, "
+                            f"filter={filter_str}, error={response.msg}")
+                raise Exception(f"查询记录失败: {response.msg}")
+            
+            logger.debug("查询记录成功: %s", response)
+            
+            if not response.data:
+                return
+            
+            for item in response.data.items or []:
                 record = dict(item.fields) if item.fields else {}
                 record[ID] = item.record_id
-                results.append(record)
-        
-        return results
+                yield record
+            
+            if not response.data.has_more or not response.data.page_token:
+                return
+            page_token = response.data.page_token
+    
+    def _fetch(self, database: str, table: str,
+               search_cmds: List[SearchCmd]) -> List[Dict[str, Any]]:
+        """向飞书发起查询，拉取全部分页"""
+        return list(self.iter_read(database, table, search_cmds))
     
     def update(self, database: str, table: str, record_id: str, record: Dict[str, Any]) -> None:
         """
@@ -147,14 +366,15 @@ class RecordManager:
             record_id: 记录 ID
             record: 更新的数据
         """
-        # 获取字段列表
-        fields = self.field_manager.list_fields(database, table)
-        field_map = {field["field_name"]: field["field_id"] for field in fields}
-        
         # 如果存在 ID 字段，设置为记录 ID
-        if ID in field_map:
+        if self.field_manager.has_field(database, table, ID):
             record[ID] = record_id
         
+        self._update_record(database, table, record_id, record)
+    
+    def _update_record(self, database: str, table: str, record_id: str,
+                       record: Dict[str, Any]) -> None:
+        """发送单条记录的更新请求"""
         # 创建请求
         request_body = AppTableRecord.builder() \
             .fields(record) \
@@ -176,7 +396,59 @@ class RecordManager:
                         f"record_id={record_id}, error={response.msg}")
             raise Exception(f"更新记录失败: {response.msg}")
         
-        logger.debug(f"更新记录成功: {response}")
+        logger.debug("更新记录成功: %s", response)
+        self._invalidate(database, table)
+    
+    def batch_update(self, database: str, table: str, records: Dict[str, Dict[str, Any]]) -> None:
+        """
+        批量更新记录
+        
+        Args:
+            database: 数据库（应用）token
+            table: 表 ID
+            records: 记录 ID 到更新数据的映射
+        """
+        if not records:
+            return
+        
+        # 如果存在 ID 字段，设置为记录 ID
+        if self.field_manager.has_field(database, table, ID):
+            for record_id, record in records.items():
+                record[ID] = record_id
+        
+        self._batch_update_records(database, table, records)
+    
+    def _batch_update_records(self, database: str, table: str,
+                              records: Dict[str, Dict[str, Any]]) -> None:
+        """按批次发送更新请求"""
+        items = list(records.items())
+        for start in range(0, len(items), BATCH_SIZE):
+            chunk = items[start:start + BATCH_SIZE]
+            
+            # 创建请求
+            request_body = BatchUpdateAppTableRecordRequestBody.builder() \
+                .records([
+                    AppTableRecord.builder().record_id(record_id).fields(record).build()
+                    for record_id, record in chunk
+                ]) \
+                .build()
+            
+            request = BatchUpdateAppTableRecordRequest.builder() \
+                .app_token(database) \
+                .table_id(table) \
+                .request_body(request_body) \
+                .build()
+            
+            # 发起请求
+            response = self.client.bitable.v1.app_table_record.batch_update(request)
+            
+            # 处理响应
+            if not response.success():
+                logger.error(f"批量更新记录失败: database={database}, table={table}, error={response.msg}")
+                raise Exception(f"批量更新记录失败: {response.msg}")
+            
+            logger.debug("批量更新记录成功: %s", response)
+            self._invalidate(database, table)
     
     def delete(self, database: str, table: str, record_id: str) -> None:
         """
@@ -203,4 +475,39 @@ class RecordManager:
                         f"record_id={record_id}, error={response.msg}")
             raise Exception(f"删除记录失败: {response.msg}")
         
-        logger.debug(f"删除记录成功: {response}")
\ No newline at end of file
+        logger.debug("删除记录成功: %s", response)
+        self._invalidate(database, table)
+    
+    def batch_delete(self, database: str, table: str, record_ids: List[str]) -> None:
+        """
+        批量删除记录
+        
+        Args:
+            database: 数据库（应用）token
+            table: 表 ID
+            record_ids: 记录 ID 列表
+        """
+        for start in range(0, len(record_ids), BATCH_SIZE):
+            chunk = record_ids[start:start + BATCH_SIZE]
+            
+            # 创建请求
+            request_body = BatchDeleteAppTableRecordRequestBody.builder() \
+                .records(chunk) \
+                .build()
+            
+            request = BatchDeleteAppTableRecordRequest.builder() \
+                .app_token(database) \
+                .table_id(table) \
+                .request_body(request_body) \
+                .build()
+            
+            # 发起请求
+            response = self.client.bitable.v1.app_table_record.batch_delete(request)
+            
+            # 处理响应
+            if not response.success():
+                logger.error(f"批量删除记录失败: database={database}, table={table}, error={response.msg}")
+                raise Exception(f"批量删除记录失败: {response.msg}")
+            
+            logger.debug("批量删除记录成功: %s", response)
+            self._invalidate(database, table)
\ No newline at end of file
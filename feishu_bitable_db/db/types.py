@@ -1,8 +1,9 @@
 """数据库类型定义"""
 
 from enum import IntEnum
-from typing import List, Any, Optional
+from typing import List, Dict, Any, Optional, NamedTuple, Type
 from dataclasses import dataclass
+import keyword
 
 
 class FieldType(IntEnum):
@@ -15,13 +16,16 @@ class FieldType(IntEnum):
     PEOPLE = 11
 
 
+# 字段类型到飞书类型编码的映射
+FIELD_TYPE_CODE: Dict[FieldType, int] = {field_type: field_type.value for field_type in FieldType}
+
+
 # 常量定义
 ID = "id"
 NAME = "Databases"
 
 
-@dataclass
-class Field:
+class Field(NamedTuple):
     """字段定义"""
     name: str
     type: FieldType
@@ -41,9 +45,51 @@ class Database:
     tables: List[Table]
 
 
-@dataclass
-class SearchCmd:
+class SearchCmd(NamedTuple):
     """搜索条件"""
     key: str
     operator: str
-    val: Any
\ No newline at end of file
+    val: Any
+
+
+class Row:
+    """
+    固定字段的记录
+    
+    由 make_row_class 按表的字段生成子类，字段以属性访问，缺少的字段为 None。
+    """
+    
+    __slots__ = ()
+    
+    def __init__(self, record: Dict[str, Any]):
+        for name in self.__slots__:
+            setattr(self, name, record.get(name))
+    
+    def _asdict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._asdict() == other._asdict()
+    
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+def make_row_class(table: Table) -> Optional[Type[Row]]:
+    """
+    按表的字段生成记录类
+    
+    Args:
+        table: 表定义
+        
+    Returns:
+        记录类，字段名不能作为属性名时返回 None
+    """
+    names = [ID] + [field.name for field in table.fields if field.name != ID]
+    if not all(name.isidentifier() and not keyword.iskeyword(name) for name in names):
+        return None
+    return type(f"{table.name}Row", (Row,), {"__slots__": tuple(names)})
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""带过期时间的缓存"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    """
+    线程安全的 TTL 缓存
+    
+    条目在写入 ttl 秒后过期；超过 maxsize 时淘汰最久未访问的条目。
+    """
+    
+    def __init__(self, ttl: float, maxsize: int = 128):
+        """
+        初始化
+        
+        Args:
+            ttl: 过期时间（秒）
+            maxsize: 最大条目数
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，不存在或已过期时返回 default"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            
+            expire_at, value = item
+            if expire_at <= time.monotonic():
+                del self._data[key]
+                return default
+            
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        写入缓存
+        
+        Args:
+            key: 键
+            value: 值
+            ttl: 本条目的过期时间（秒），为空时使用默认值
+        """
+        expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expire_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> None:
+        """删除缓存条目"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
\ No newline at end of file
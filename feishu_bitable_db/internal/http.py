@@ -0,0 +1,67 @@
+"""HTTP 连接复用"""
+
+from typing import Any
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# 每个主机保留的最大连接数
+POOL_MAXSIZE = 20
+
+_lock = threading.Lock()
+_session = None
+
+
+class _SessionRequests:
+    """代替 requests 模块，使 request 调用走共享的 Session"""
+    
+    def __init__(self, session: requests.Session):
+        self._session = session
+    
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        return self._session.request(method, url, **kwargs)
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(requests, name)
+
+
+def enable_keep_alive(pool_maxsize: int = POOL_MAXSIZE) -> None:
+    """
+    让飞书 SDK 复用 HTTP 连接
+    
+    SDK 的同步请求每次都调用 requests.request，不复用连接，每次请求都要重新握手。
+    这里把 SDK 传输层使用的 requests 替换为共享连接池的 Session，重复调用无副作用。
+    替换对进程内所有使用飞书 SDK 的代码生效，因此需要显式调用（或创建 DBImpl 时
+    传 keep_alive=True），导入和默认构造都不会启用。
+    
+    Args:
+        pool_maxsize: 每个主机保留的最大连接数
+    """
+    global _session
+    
+    with _lock:
+        if _session is not None:
+            return
+        
+        try:
+            from lark_oapi.core.http import transport
+        except ImportError:
+            logger.debug("飞书 SDK 传输层不可用，跳过连接复用")
+            return
+        
+        if getattr(transport, "requests", None) is not requests:
+            logger.debug("飞书 SDK 传输层不是 requests 实现，跳过连接复用")
+            return
+        
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        
+        transport.requests = _SessionRequests(session)
+        _session = session
\ No newline at end of file
@@ -7,6 +7,32 @@ from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+
+# Config.get 缓存中表示“键不存在”的标记
+_MISSING = object()
+
+
+def _loads(raw: bytes) -> Any:
+    """解析 UTF-8 编码的 JSON 字节串"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps(data: Any) -> str:
+    """序列化为带缩进的 JSON 文本，保留非 ASCII 字符
+
+    orjson 只支持 2 空格缩进；标准库回退保持原有的 4 空格格式。
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, indent=4, ensure_ascii=False)
+
 
 @dataclass
 class DatabaseConfig:
@@ -43,12 +69,16 @@ class FeishuConfig:
 class SyncConfig:
     """同步配置"""
     poll_interval: int = 5  # 轮询间隔（秒）
+    max_poll_interval: int = 60  # 连续无变更时轮询间隔逐次翻倍的上限（秒）
     batch_size: int = 100  # 批量处理大小
+    feishu_concurrency: int = 5  # 同步到飞书的并发请求数
     retry_times: int = 3  # 重试次数
     retry_interval: int = 5  # 重试间隔（秒）
     sync_timeout: int = 300  # 同步超时（秒）
     enable_cache: bool = True  # 是否启用缓存
     cache_ttl: int = 3600  # 缓存过期时间（秒）
+    schema_cache_backend: str = "memory"  # 表结构缓存位置: memory（进程内）/ redis（多进程共享）
+    mapping_processes: int = 0  # 大批量字段转换使用的进程数，0 表示在当前线程转换
     
     # 表映射配置: {"飞书数据库:飞书表": "数据库表"}
     table_mapping: Dict[str, str] = field(default_factory=dict)
@@ -79,6 +109,9 @@ class Config:
         self.config_path = config_path or self._find_config_file()
         self._data: Dict[str, Any] = {}
         
+        # get() 查询结果缓存: {"a.b.c": 值}，配置变更时清空
+        self._get_cache: Dict[str, Any] = {}
+        
         # 配置对象
         self.database: Optional[DatabaseConfig] = None
         self.feishu: Optional[FeishuConfig] = None
@@ -107,15 +140,19 @@ class Config:
     def load(self) -> None:
         """加载配置文件"""
         if not os.path.exists(self.config_path):
+            # 默认配置已在内存中，无需再读回文件
             self._create_default_config()
-        
-        with open(self.config_path, 'r', encoding='utf-8') as f:
-            self._data = json.load(f)
+        else:
+            # 直接解析原始字节，省去先解码为 str 的一步
+            with open(self.config_path, 'rb') as f:
+                self._data = _loads(f.read())
         
         self._parse_config()
     
     def _parse_config(self) -> None:
         """解析配置"""
+        self._get_cache.clear()
+        
         # 数据库配置
         db_config = self._data.get('database', {})
         self.database = DatabaseConfig(**db_config)
@@ -171,7 +208,7 @@ class Config:
         
         os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
         with open(self.config_path, 'w', encoding='utf-8') as f:
-            json.dump(default_config, f, indent=4, ensure_ascii=False)
+            f.write(_dumps(default_config))
         
         self._data = default_config
     
@@ -185,7 +222,7 @@ class Config:
         }
         
         with open(self.config_path, 'w', encoding='utf-8') as f:
-            json.dump(config_dict, f, indent=4, ensure_ascii=False)
+            f.write(_dumps(config_dict))
     
     def validate(self) -> bool:
         """验证配置是否有效"""
@@ -203,16 +240,24 @@ class Config:
     
     def get(self, key: str, default: Any = None) -> Any:
         """获取配置值"""
-        keys = key.split('.')
+        try:
+            value = self._get_cache[key]
+        except KeyError:
+            value = self._get_cache[key] = self._lookup(key)
+        
+        return default if value is _MISSING else value
+    
+    def _lookup(self, key: str) -> Any:
+        """按点分路径查找配置值，不存在时返回 _MISSING"""
         value = self._data
         
-        for k in keys:
+        for k in key.split('.'):
             if isinstance(value, dict):
                 value = value.get(k)
                 if value is None:
-                    return default
+                    return _MISSING
             else:
-                return default
+                return _MISSING
         
         return value
     
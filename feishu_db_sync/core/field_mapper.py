@@ -1,15 +1,64 @@
 """
 字段映射器
 """
-from typing import Dict, Any, List, Optional
+from concurrent.futures import Executor
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from datetime import datetime
+import functools
+import json
+import re
 from loguru import logger
 
 
+# 日期时间字符串：ISO 格式（T 分隔）或常规格式（空格分隔）
+_DATETIME_RE = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}')
+
+# 飞书记录转换时跳过的系统字段
+_FEISHU_SKIP = frozenset({'id', 'created_at', 'updated_at'})
+
+# 数据库记录转换时跳过的系统字段
+_DB_SKIP = frozenset({'id', 'created_at', 'updated_at', 'feishu_id', '_sync_source'})
+
+# 清理数据库记录时移除的字段
+_CLEAN_SKIP = _DB_SKIP | {'_sync_hash'}
+
+# 两个方向转换时都原样保留的值类型，转换函数中直接跳过
+_PASSTHROUGH_TYPES = frozenset({int, float, bool, type(None)})
+
+# 批量转换达到该行数时才交给进程池，行数少时进程间传输的开销大于收益
+PARALLEL_MAPPING_THRESHOLD = 1000
+
+# 交给进程池时每个任务的行数
+PARALLEL_MAPPING_CHUNK = 250
+
+
+@functools.lru_cache(maxsize=4096)
+def _split_multi_select(value: str) -> Optional[Tuple[str, ...]]:
+    """拆分逗号分隔的多选值，不是多选值时返回 None（多选取值重复度高，结果缓存）"""
+    if ',' in value and not value.startswith('"'):
+        return tuple(value.split(','))
+    return None
+
+
+def _identity(record: Dict[str, Any]) -> Dict[str, Any]:
+    """原样返回记录"""
+    return record
+
+
+def _convert_chunk(field_mapping: Dict[str, Dict[str, str]], table: str, to_db: bool,
+                   records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """在工作进程中转换一组记录"""
+    mapper = FieldMapper(field_mapping)
+    if to_db:
+        return mapper.feishu_to_db_batch(table, records)
+    return mapper.db_to_feishu_batch(table, records)
+
+
 class FieldMapper:
     """字段映射器，处理飞书和数据库之间的字段转换"""
     
-    def __init__(self, field_mapping: Dict[str, Dict[str, str]]):
+    def __init__(self, field_mapping: Dict[str, Dict[str, str]],
+                 executor: Optional[Executor] = None):
         """
         field_mapping格式:
         {
@@ -18,60 +67,143 @@ class FieldMapper:
                 ...
             }
         }
+        
+        executor 为进程池时，大批量转换分块交给它并行执行，绕开 GIL
         """
         self.field_mapping = field_mapping
+        self._executor = executor
         
-    def feishu_to_db(self, table: str, feishu_record: Dict[str, Any]) -> Dict[str, Any]:
-        """飞书记录转换为数据库记录"""
-        if table not in self.field_mapping:
-            # 如果没有配置映射，直接返回原始数据
-            return feishu_record
-        
-        mapping = self.field_mapping[table]
-        db_record = {}
-        
-        for feishu_field, value in feishu_record.items():
-            # 跳过系统字段
-            if feishu_field in ['id', 'created_at', 'updated_at']:
-                continue
-            
-            # 使用映射或原字段名
-            db_field = mapping.get(feishu_field, feishu_field)
-            
-            # 转换值
-            db_record[db_field] = self._convert_feishu_value(value, feishu_field)
+        # 反向映射缓存: {"table_name": {"数据库字段": "飞书字段"}}
+        self._reverse_cache: Dict[str, Dict[str, str]] = {}
         
-        # 保存飞书ID用于映射
-        if 'id' in feishu_record:
-            db_record['feishu_id'] = feishu_record['id']
+        # 按表生成的转换函数缓存，映射变更时失效
+        self._compiled_f2d: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+        self._compiled_d2f: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
         
-        return db_record
+    def feishu_to_db(self, table: str, feishu_record: Dict[str, Any]) -> Dict[str, Any]:
+        """飞书记录转换为数据库记录"""
+        return self._feishu_to_db_converter(table)(feishu_record)
     
     def db_to_feishu(self, table: str, db_record: Dict[str, Any]) -> Dict[str, Any]:
         """数据库记录转换为飞书记录"""
-        if table not in self.field_mapping:
-            # 如果没有配置映射，直接返回原始数据
-            # 但需要移除数据库特有字段
-            return self._clean_db_record(db_record)
+        return self._db_to_feishu_converter(table)(db_record)
+    
+    def feishu_to_db_batch(self, table: str,
+                           feishu_records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """批量转换飞书记录为数据库记录，转换函数只查找一次"""
+        if self._use_executor(table, feishu_records):
+            return self._convert_parallel(table, True, feishu_records)
         
-        mapping = self.field_mapping[table]
-        # 反转映射关系
-        reverse_mapping = {v: k for k, v in mapping.items()}
+        convert = self._feishu_to_db_converter(table)
+        return [convert(record) for record in feishu_records]
+    
+    def db_to_feishu_batch(self, table: str,
+                           db_records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """批量转换数据库记录为飞书记录，转换函数只查找一次"""
+        if self._use_executor(table, db_records):
+            return self._convert_parallel(table, False, db_records)
+        
+        convert = self._db_to_feishu_converter(table)
+        return [convert(record) for record in db_records]
+    
+    def _use_executor(self, table: str, records: List[Dict[str, Any]]) -> bool:
+        """是否把批量转换交给进程池"""
+        return (
+            self._executor is not None
+            and table in self.field_mapping
+            and len(records) >= PARALLEL_MAPPING_THRESHOLD
+        )
+    
+    def _convert_parallel(self, table: str, to_db: bool,
+                          records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """分块并行转换，结果保持原顺序"""
+        # 只传当前表的映射，减少序列化开销
+        field_mapping = {table: self.field_mapping[table]}
+        futures = [
+            self._executor.submit(
+                _convert_chunk, field_mapping, table, to_db,
+                records[start:start + PARALLEL_MAPPING_CHUNK]
+            )
+            for start in range(0, len(records), PARALLEL_MAPPING_CHUNK)
+        ]
         
-        feishu_record = {}
+        results: List[Dict[str, Any]] = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+    
+    def _feishu_to_db_converter(self, table: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """获取指定表的飞书→数据库转换函数"""
+        convert = self._compiled_f2d.get(table)
+        if convert is None:
+            if table not in self.field_mapping:
+                # 如果没有配置映射，直接返回原始数据
+                return _identity
+            convert = self._compiled_f2d[table] = self._compile_feishu_to_db(table)
+        return convert
+    
+    def _db_to_feishu_converter(self, table: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """获取指定表的数据库→飞书转换函数"""
+        convert = self._compiled_d2f.get(table)
+        if convert is None:
+            if table not in self.field_mapping:
+                # 如果没有配置映射，直接返回原始数据
+                # 但需要移除数据库特有字段
+                return self._clean_db_record
+            convert = self._compiled_d2f[table] = self._compile_db_to_feishu(table)
+        return convert
+    
+    def _compile_feishu_to_db(self, table: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """生成指定表的飞书→数据库转换函数，映射和转换器在生成时绑定"""
+        rename = self.field_mapping[table].get
+        convert_value = self._convert_feishu_value
         
-        for db_field, value in db_record.items():
-            # 跳过数据库系统字段
-            if db_field in ['id', 'created_at', 'updated_at', 'feishu_id', '_sync_source']:
-                continue
+        def convert(feishu_record: Dict[str, Any]) -> Dict[str, Any]:
+            # 跳过系统字段，使用映射或原字段名；数值类型不需要转换
+            db_record = {
+                rename(feishu_field, feishu_field):
+                    value if type(value) in _PASSTHROUGH_TYPES else convert_value(value, feishu_field)
+                for feishu_field, value in feishu_record.items()
+                if feishu_field not in _FEISHU_SKIP
+            }
             
-            # 使用反向映射或原字段名
-            feishu_field = reverse_mapping.get(db_field, db_field)
+            # 保存飞书ID用于映射
+            if 'id' in feishu_record:
+                db_record['feishu_id'] = feishu_record['id']
             
-            # 转换值
-            feishu_record[feishu_field] = self._convert_db_value(value, db_field)
+            return db_record
+        
+        return convert
+    
+    def _compile_db_to_feishu(self, table: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """生成指定表的数据库→飞书转换函数，映射和转换器在生成时绑定"""
+        rename = self._get_reverse_mapping(table).get
+        convert_value = self._convert_db_value
         
-        return feishu_record
+        def convert(db_record: Dict[str, Any]) -> Dict[str, Any]:
+            # 跳过数据库系统字段，使用反向映射或原字段名；数值类型不需要转换
+            return {
+                rename(db_field, db_field):
+                    value if type(value) in _PASSTHROUGH_TYPES else convert_value(value, db_field)
+                for db_field, value in db_record.items()
+                if db_field not in _DB_SKIP
+            }
+        
+        return convert
+    
+    def _invalidate(self, table: str) -> None:
+        """映射变更后清除该表的缓存"""
+        self._reverse_cache.pop(table, None)
+        self._compiled_f2d.pop(table, None)
+        self._compiled_d2f.pop(table, None)
+    
+    def _get_reverse_mapping(self, table: str) -> Dict[str, str]:
+        """获取反向映射（数据库字段 -> 飞书字段），按表缓存"""
+        reverse_mapping = self._reverse_cache.get(table)
+        if reverse_mapping is None:
+            reverse_mapping = {v: k for k, v in self.field_mapping[table].items()}
+            self._reverse_cache[table] = reverse_mapping
+        return reverse_mapping
     
     def _convert_feishu_value(self, value: Any, field_name: str) -> Any:
         """转换飞书字段值为数据库格式"""
@@ -84,7 +216,6 @@ class FieldMapper:
             if 'id' in value and 'name' in value:
                 return value.get('id')  # 只保存ID
             # 其他复杂类型，转为JSON字符串
-            import json
             return json.dumps(value, ensure_ascii=False)
         
         # 处理数组类型（多选字段）
@@ -93,7 +224,6 @@ class FieldMapper:
             if all(isinstance(item, str) for item in value):
                 return ','.join(value)
             # 否则转为JSON
-            import json
             return json.dumps(value, ensure_ascii=False)
         
         # 处理日期时间
@@ -117,44 +247,30 @@ class FieldMapper:
         
         # 处理可能的JSON字符串
         if isinstance(value, str):
-            # 尝试解析JSON
-            if value.startswith(('{', '[')):
+            # 首尾字符都像 JSON 时才尝试解析，减少异常开销
+            if value.startswith(('{', '[')) and value.endswith(('}', ']')):
                 try:
-                    import json
                     return json.loads(value)
                 except:
                     pass
             
             # 检查是否是逗号分隔的值（多选字段）
-            if ',' in value and not value.startswith('"'):
-                return value.split(',')
+            parts = _split_multi_select(value)
+            if parts is not None:
+                return list(parts)
         
         return value
     
     def _clean_db_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
         """清理数据库记录，移除系统字段"""
-        exclude_fields = [
-            'id', 'created_at', 'updated_at', 
-            'feishu_id', '_sync_source', '_sync_hash'
-        ]
-        
         return {
             k: v for k, v in record.items() 
-            if k not in exclude_fields
+            if k not in _CLEAN_SKIP
         }
     
     def _is_datetime_string(self, value: str) -> bool:
         """检查是否是日期时间字符串"""
-        datetime_patterns = [
-            r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}',  # ISO格式
-            r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}',  # 常规格式
-        ]
-        
-        import re
-        for pattern in datetime_patterns:
-            if re.match(pattern, value):
-                return True
-        return False
+        return _DATETIME_RE.match(value) is not None
     
     def get_mapping_for_table(self, table: str) -> Dict[str, str]:
         """获取指定表的字段映射"""
@@ -166,13 +282,15 @@ class FieldMapper:
             self.field_mapping[table] = {}
         
         self.field_mapping[table][feishu_field] = db_field
-        logger.info(f"Added field mapping for {table}: {feishu_field} -> {db_field}")
+        self._invalidate(table)
+        logger.info("Added field mapping for {}: {} -> {}", table, feishu_field, db_field)
     
     def remove_mapping(self, table: str, feishu_field: str) -> None:
         """移除字段映射"""
         if table in self.field_mapping and feishu_field in self.field_mapping[table]:
             del self.field_mapping[table][feishu_field]
-            logger.info(f"Removed field mapping for {table}: {feishu_field}")
+            self._invalidate(table)
+            logger.info("Removed field mapping for {}: {}", table, feishu_field)
     
     def validate_mapping(self, table: str, 
                         feishu_fields: List[str], 
@@ -1,9 +1,10 @@
 """
 同步服务主类
 """
-import time
 import threading
-from typing import Dict, List, Any, Optional
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 import redis
@@ -11,13 +12,19 @@ import redis
 from ..config.config import Config
 from ..feishu.client import FeishuClient
 from ..feishu.change_detector import ChangeDetector
+from ..feishu.schema_cache import RedisSchemaCache
 from ..db.database import Database
 from ..db.queue_processor import QueueProcessor
+from ..db.models import SyncAction, SyncQueue
 from ..monitor.metrics import MetricsCollector
 from .field_mapper import FieldMapper
 from .sync_worker import SyncWorker
 
 
+# 队列为空时等待新任务的最长时间（秒）
+QUEUE_WAIT_TIMEOUT = 1
+
+
 class SyncService:
     """双向同步服务"""
     
@@ -26,6 +33,12 @@ class SyncService:
         self.running = False
         self._threads = []
         
+        # 停止信号，各循环用它代替 time.sleep 以便停止时立即退出
+        self._stop_event = threading.Event()
+        
+        # 配置版本号，reload_config 时递增，各循环据此重新读取配置快照
+        self._config_version = 0
+        
         # 初始化组件
         self._init_components()
         
@@ -43,18 +56,6 @@ class SyncService:
         # 验证配置
         self.config.validate()
         
-        # 初始化飞书客户端
-        self.feishu_client = FeishuClient(
-            self.config.feishu.app_id,
-            self.config.feishu.app_secret
-        )
-        
-        # 初始化数据库
-        self.database = Database(self.config.database)
-        
-        # 创建同步表
-        self.database.create_sync_tables()
-        
         # 初始化Redis（可选）
         self.redis_client = None
         if self.config.sync.enable_cache:
@@ -70,10 +71,36 @@ class SyncService:
                 logger.warning(f"Redis connection failed: {e}, using memory cache")
                 self.redis_client = None
         
+        # 多进程部署时通过Redis共享表结构缓存
+        schema_cache = None
+        if self.config.sync.schema_cache_backend == 'redis' and self.redis_client:
+            schema_cache = RedisSchemaCache(self.redis_client)
+        
+        # 初始化飞书客户端
+        self.feishu_client = FeishuClient(
+            self.config.feishu.app_id,
+            self.config.feishu.app_secret,
+            cache_ttl=self.config.sync.cache_ttl if self.config.sync.enable_cache else 0,
+            batch_size=self.config.sync.batch_size,
+            schema_cache=schema_cache
+        )
+        
+        # 初始化数据库
+        self.database = Database(self.config.database)
+        
+        # 创建同步表
+        self.database.create_sync_tables()
+        
         # 初始化其他组件
         self.change_detector = ChangeDetector(self.feishu_client, self.redis_client)
-        self.queue_processor = QueueProcessor(self.database)
-        self.field_mapper = FieldMapper(self.config.sync.field_mapping)
+        self.queue_processor = QueueProcessor(self.database, self.redis_client)
+        
+        # 大批量字段转换的进程池（可选）
+        self._mapping_pool = None
+        self._open_mapping_pool()
+        
+        self.field_mapper = FieldMapper(self.config.sync.field_mapping, self._mapping_pool)
+        self._reverse_table_mapping = self._build_reverse_table_mapping()
         self.sync_worker = SyncWorker(
             self.feishu_client,
             self.database,
@@ -89,6 +116,20 @@ class SyncService:
         
         logger.info("All components initialized successfully")
     
+    def _open_mapping_pool(self) -> bool:
+        """按配置创建字段转换的进程池，已存在或未配置时返回 False"""
+        if self._mapping_pool is not None or self.config.sync.mapping_processes <= 0:
+            return False
+        self._mapping_pool = ProcessPoolExecutor(max_workers=self.config.sync.mapping_processes)
+        return True
+    
+    def _build_reverse_table_mapping(self) -> Dict[str, str]:
+        """构建数据库表到飞书表的反向映射（多个飞书表映射到同一数据库表时取第一个）"""
+        reverse_mapping: Dict[str, str] = {}
+        for feishu_table, db_table in self.config.sync.table_mapping.items():
+            reverse_mapping.setdefault(db_table, feishu_table)
+        return reverse_mapping
+    
     def start(self) -> None:
         """启动同步服务"""
         if self.running:
@@ -97,8 +138,14 @@ class SyncService:
         
         logger.info("Starting sync service...")
         self.running = True
+        self._stop_event.clear()
         self.stats['start_time'] = datetime.now()
         
+        # 停止时关闭了字段转换的进程池，重新启动时重建
+        if self._open_mapping_pool():
+            self.field_mapper = FieldMapper(self.config.sync.field_mapping, self._mapping_pool)
+            self.sync_worker.mapper = self.field_mapper
+        
         # 测试连接
         if not self._test_connections():
             self.running = False
@@ -146,11 +193,21 @@ class SyncService:
         """停止同步服务"""
         logger.info("Stopping sync service...")
         self.running = False
+        self._stop_event.set()
         
         # 等待线程结束
         for thread in self._threads:
             thread.join(timeout=5)
         
+        self.change_detector.close()
+        if self.metrics:
+            self.metrics.close()
+        
+        # 关闭字段转换的进程池，避免工作进程在停止后和退出时残留
+        if self._mapping_pool is not None:
+            self._mapping_pool.shutdown(wait=True)
+            self._mapping_pool = None
+        
         logger.info("Sync service stopped")
     
     def _test_connections(self) -> bool:
@@ -172,120 +229,252 @@ class SyncService:
         """飞书同步循环"""
         logger.info("Feishu sync loop started")
         
+        # 循环中不变的对象提前取出，配置快照只在重新加载后刷新
+        change_detector = self.change_detector
+        sync_worker = self.sync_worker
+        metrics = self.metrics
+        config_version = None
+        
         while self.running:
+            if config_version != self._config_version:
+                config_version = self._config_version
+                sync_config = self.config.sync
+                table_mapping = sync_config.table_mapping
+                min_interval = sync_config.poll_interval
+                max_interval = max(sync_config.max_poll_interval, min_interval)
+                
+                # 轮询间隔：无变更时指数退避，有变更时恢复为 poll_interval
+                interval = min_interval
+            
             try:
                 # 检测所有表的变更
-                all_changes = self.change_detector.batch_detect_changes(
-                    self.config.sync.table_mapping
-                )
+                all_changes = change_detector.batch_detect_changes(table_mapping)
+                
+                if any(all_changes.values()):
+                    interval = min_interval
+                else:
+                    interval = min(interval * 2, max_interval)
                 
                 # 处理每个表的变更
                 for feishu_table, changes in all_changes.items():
                     if not changes:
                         continue
                     
-                    db_table = self.config.sync.table_mapping[feishu_table]
+                    db_table = table_mapping[feishu_table]
                     logger.info(f"Processing {len(changes)} changes for {feishu_table}")
                     
-                    for change in changes:
-                        success = self.sync_worker.sync_feishu_to_db(
-                            feishu_table, db_table, change
+                    # 多条变更合并为批量写入
+                    if len(changes) == 1:
+                        results = {changes[0].record_id: sync_worker.sync_feishu_to_db(
+                            feishu_table, db_table, changes[0]
+                        )}
+                    else:
+                        results = sync_worker.sync_feishu_to_db_batch(
+                            feishu_table, db_table, changes
                         )
-                        
-                        # 更新统计
-                        if success:
-                            self.stats['feishu_to_db_success'] += 1
-                        else:
-                            self.stats['feishu_to_db_failed'] += 1
-                        
-                        # 更新监控指标
-                        if self.metrics:
-                            self.metrics.record_sync(
-                                'feishu_to_db',
-                                'success' if success else 'failed'
-                            )
+                    
+                    self._record_results('feishu_to_db', results.values())
                 
             except Exception as e:
                 logger.error(f"Error in Feishu sync loop: {e}")
-                if self.metrics:
-                    self.metrics.record_error('feishu_sync_loop', str(e))
+                if metrics:
+                    metrics.record_error('feishu_sync_loop', str(e))
             
             # 等待下次轮询
-            time.sleep(self.config.sync.poll_interval)
+            if self._stop_event.wait(interval):
+                break
     
     def _db_sync_loop(self) -> None:
         """数据库同步循环"""
         logger.info("Database sync loop started")
         
-        while self.running:
-            try:
-                # 获取待处理的队列项
-                queue_items = self.queue_processor.get_pending_items(
-                    limit=self.config.sync.batch_size
-                )
-                
-                if not queue_items:
-                    time.sleep(1)  # 没有任务时短暂休眠
-                    continue
-                
-                logger.info(f"Processing {len(queue_items)} queue items")
+        with ThreadPoolExecutor(max_workers=max(1, self.config.sync.feishu_concurrency),
+                                thread_name_prefix="FeishuWriter") as executor:
+            queue_processor = self.queue_processor
+            metrics = self.metrics
+            config_version = None
+            
+            while self.running:
+                if config_version != self._config_version:
+                    config_version = self._config_version
+                    batch_size = self.config.sync.batch_size
                 
-                for item in queue_items:
-                    # 标记为处理中
-                    self.queue_processor.mark_processing(item.id)
-                    
-                    # 找到对应的飞书表
-                    feishu_table = None
-                    for ft, dt in self.config.sync.table_mapping.items():
-                        if dt == item.table_name:
-                            feishu_table = ft
-                            break
+                try:
+                    # 领取待处理的队列项（同时标记为处理中）
+                    queue_items = queue_processor.claim_pending_items(limit=batch_size)
                     
-                    if not feishu_table:
-                        logger.error(f"No Feishu table mapping for {item.table_name}")
-                        self.queue_processor.mark_failed(
-                            item.id, 
-                            f"No mapping for table {item.table_name}"
-                        )
+                    if not queue_items:
+                        # 有Redis时阻塞等待入队通知，否则短暂休眠；数据库触发器
+                        # 写入的队列项不发通知，最长 QUEUE_WAIT_TIMEOUT 秒后重新查询
+                        queue_processor.wait_for_items(QUEUE_WAIT_TIMEOUT)
                         continue
                     
-                    # 解析飞书数据库和表名
-                    feishu_db, feishu_table_name = feishu_table.split(':')
-                    
-                    # 执行同步
-                    success = self.sync_worker.sync_db_to_feishu(
-                        item, feishu_db, feishu_table_name
-                    )
-                    
-                    # 更新统计
-                    if success:
-                        self.stats['db_to_feishu_success'] += 1
-                    else:
-                        self.stats['db_to_feishu_failed'] += 1
+                    logger.info(f"Processing {len(queue_items)} queue items")
+                    self._process_queue_items(executor, queue_items)
                     
-                    # 更新监控指标
-                    if self.metrics:
-                        self.metrics.record_sync(
-                            'db_to_feishu',
-                            'success' if success else 'failed'
-                        )
-                
-            except Exception as e:
-                logger.error(f"Error in database sync loop: {e}")
-                if self.metrics:
-                    self.metrics.record_error('db_sync_loop', str(e))
+                except Exception as e:
+                    logger.error(f"Error in database sync loop: {e}")
+                    if metrics:
+                        metrics.record_error('db_sync_loop', str(e))
+                    # 出错后短暂休眠避免反复报错
+                    if self._stop_event.wait(1):
+                        break
+    
+    def _process_queue_items(self, executor: ThreadPoolExecutor,
+                             queue_items: List[SyncQueue]) -> None:
+        """并发同步一批已领取的队列项，同一条记录的队列项保持先后顺序"""
+        # 按记录分组: (表名, 记录ID) -> [(队列项, 飞书表)]
+        chains: Dict[Tuple[str, str], List[Tuple[SyncQueue, str]]] = {}
+        unmapped: Dict[str, List[int]] = {}
+        for item in queue_items:
+            # 找到对应的飞书表
+            feishu_table = self._reverse_table_mapping.get(item.table_name)
+            
+            if not feishu_table:
+                unmapped.setdefault(item.table_name, []).append(item.id)
+                continue
             
-            time.sleep(0.1)  # 短暂休眠避免CPU占用过高
+            chains.setdefault((item.table_name, item.record_id), []).append((item, feishu_table))
+        
+        # 没有映射的表按表批量标记失败
+        for table_name, queue_ids in unmapped.items():
+            logger.error(f"No Feishu table mapping for {table_name}")
+            self.queue_processor.mark_failed_batch(queue_ids, f"No mapping for table {table_name}")
+        
+        # 合并同一记录连续的修改，只同步最终状态
+        skipped: List[int] = []
+        chains = {key: self._coalesce_chain(chain, skipped) for key, chain in chains.items()}
+        if skipped:
+            logger.debug(f"Coalesced {len(skipped)} queue items")
+            self.queue_processor.mark_skipped_batch(skipped)
+        
+        # 第一阶段：各记录开头的 INSERT 按飞书表合并为批量请求
+        inserts: Dict[str, List[SyncQueue]] = {}
+        rest: List[List[Tuple[SyncQueue, str]]] = []
+        for chain in chains.values():
+            item, feishu_table = chain[0]
+            if item.action == SyncAction.INSERT.value:
+                inserts.setdefault(feishu_table, []).append(item)
+                chain = chain[1:]
+            if chain:
+                rest.append(chain)
+        
+        self._run_concurrently(executor, [
+            functools.partial(self._flush_inserts, items, feishu_table)
+            for feishu_table, items in inserts.items()
+        ])
+        
+        # 第二阶段：其余队列项按记录并发，同一记录内顺序执行
+        self._prefetch_feishu_ids(rest)
+        self._run_concurrently(executor, [
+            functools.partial(self._sync_chain, chain) for chain in rest
+        ])
+    
+    def _prefetch_feishu_ids(self, chains: List[List[Tuple[SyncQueue, str]]]) -> None:
+        """
+        按表批量查询 UPDATE/DELETE 队列项的飞书ID并写入映射缓存
+        
+        之后逐条同步时 get_feishu_id 直接命中缓存，不再每条记录查询一次数据库；
+        预取失败时逐条同步仍会自行查询。
+        """
+        db_ids: Dict[str, List[str]] = {}
+        for chain in chains:
+            for item, feishu_table in chain:
+                if item.action != SyncAction.INSERT.value:
+                    db_ids.setdefault(feishu_table.split(':')[1], []).append(item.record_id)
+        
+        for table, ids in db_ids.items():
+            try:
+                self.queue_processor.get_feishu_ids(table, ids)
+            except Exception as e:
+                logger.warning(f"Failed to prefetch Feishu IDs for {table}: {e}")
+    
+    @staticmethod
+    def _coalesce_chain(chain: List[Tuple[SyncQueue, str]],
+                        skipped: List[int]) -> List[Tuple[SyncQueue, str]]:
+        """
+        合并同一记录的连续修改
+        
+        紧跟在 INSERT/UPDATE 之后的 UPDATE 取代前一项：new_data 合并，前一项是 INSERT
+        时动作改为 INSERT，被取代的队列项 ID 追加到 skipped。保留的是最新的队列项，
+        失败重试时按它在库中的数据重新同步（UPDATE 找不到飞书记录时会改为插入）。
+        DELETE 前后不合并，保证删除后重建的记录不会丢失删除。
+        """
+        result: List[Tuple[SyncQueue, str]] = []
+        for item, feishu_table in chain:
+            if result and item.action == SyncAction.UPDATE.value:
+                last, _ = result[-1]
+                if last.action in (SyncAction.INSERT.value, SyncAction.UPDATE.value):
+                    item.new_data = {**(last.new_data or {}), **(item.new_data or {})}
+                    item.action = last.action
+                    skipped.append(last.id)
+                    result[-1] = (item, feishu_table)
+                    continue
+            result.append((item, feishu_table))
+        return result
+    
+    def _run_concurrently(self, executor: ThreadPoolExecutor,
+                          tasks: List[Callable[[], List[bool]]]) -> None:
+        """并发执行同步任务，在当前线程汇总结果"""
+        futures = [executor.submit(task) for task in tasks]
+        all_results: List[bool] = []
+        for future in as_completed(futures):
+            try:
+                all_results.extend(future.result())
+            except Exception as e:
+                logger.error(f"Error syncing to Feishu: {e}")
+        
+        self._record_results('db_to_feishu', all_results)
+    
+    def _sync_chain(self, chain: List[Tuple[SyncQueue, str]]) -> List[bool]:
+        """按顺序同步同一条记录的队列项"""
+        results = []
+        for item, feishu_table in chain:
+            # 解析飞书数据库和表名
+            feishu_db, feishu_table_name = feishu_table.split(':')
+            results.append(self.sync_worker.sync_db_to_feishu(
+                item, feishu_db, feishu_table_name
+            ))
+        return results
+    
+    def _flush_inserts(self, items: List[SyncQueue], feishu_table: str) -> List[bool]:
+        """批量同步同一张表的 INSERT 队列项"""
+        feishu_db, feishu_table_name = feishu_table.split(':')
+        
+        if len(items) == 1:
+            return [self.sync_worker.sync_db_to_feishu(
+                items[0], feishu_db, feishu_table_name
+            )]
+        
+        results = self.sync_worker.sync_inserts_to_feishu(
+            items, feishu_db, feishu_table_name
+        )
+        return list(results.values())
+    
+    def _record_results(self, direction: str, results: Iterable[bool]) -> None:
+        """汇总一批同步结果，统计和监控指标各更新一次"""
+        success = failed = 0
+        for ok in results:
+            if ok:
+                success += 1
+            else:
+                failed += 1
+        
+        # 更新统计
+        self.stats[f'{direction}_success'] += success
+        self.stats[f'{direction}_failed'] += failed
+        
+        # 更新监控指标
+        if self.metrics and (success or failed):
+            self.metrics.record_sync_bulk(direction, success, failed)
     
     def _cleanup_loop(self) -> None:
         """清理循环"""
         logger.info("Cleanup loop started")
         
-        while self.running:
+        # 每小时执行一次清理
+        while not self._stop_event.wait(3600):
             try:
-                # 每小时执行一次清理
-                time.sleep(3600)
-                
                 # 清理旧记录
                 self.queue_processor.cleanup_old_records(days=7)
                 
@@ -309,11 +498,12 @@ class SyncService:
                 # 记录同步统计
                 self.metrics.update_sync_stats(self.stats)
                 
-                # 每30秒更新一次
-                time.sleep(30)
-                
             except Exception as e:
                 logger.error(f"Error in metrics loop: {e}")
+            
+            # 每30秒更新一次
+            if self._stop_event.wait(30):
+                break
     
     def get_status(self) -> Dict[str, Any]:
         """获取服务状态"""
@@ -346,7 +536,12 @@ class SyncService:
         self.config.reload()
         
         # 更新组件配置
-        self.field_mapper = FieldMapper(self.config.sync.field_mapping)
+        self.field_mapper = FieldMapper(self.config.sync.field_mapping, self._mapping_pool)
+        self.sync_worker.mapper = self.field_mapper
+        self._reverse_table_mapping = self._build_reverse_table_mapping()
+        
+        # 通知各循环刷新配置快照
+        self._config_version += 1
         
         logger.info("Configuration reloaded")
     
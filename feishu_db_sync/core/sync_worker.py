@@ -2,7 +2,7 @@
 同步工作器
 """
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 
@@ -34,7 +34,7 @@ class SyncWorker:
             if change.hash and self.queue.check_sync_loop(
                 change.hash, SyncDirection.FEISHU_TO_DB.value
             ):
-                logger.debug(f"Skip circular sync for record {change.record_id}")
+                logger.debug("Skip circular sync for record {}", change.record_id)
                 return True
             
             # 根据动作类型处理
@@ -70,6 +70,88 @@ class SyncWorker:
             )
             return False
     
+    def sync_feishu_to_db_batch(self, feishu_table: str, db_table: str,
+                                changes: List[ChangeRecord]) -> Dict[str, bool]:
+        """
+        批量同步飞书变更到数据库
+        
+        同一动作的变更合并为多行 SQL，ID 映射和同步日志也批量写入。
+        
+        Args:
+            feishu_table: 飞书表
+            db_table: 数据库表
+            changes: 同一张表的变更列表
+            
+        Returns:
+            飞书记录 ID 到是否成功的映射
+        """
+        try:
+            # 检查是否是循环同步
+            looping = self.queue.check_sync_loops(
+                [change.hash for change in changes if change.hash],
+                SyncDirection.FEISHU_TO_DB.value
+            )
+            
+            # 一次查出更新和删除所需的数据库ID
+            db_ids = self.queue.get_db_ids(db_table, [
+                change.record_id for change in changes if change.action != 'insert'
+            ])
+        except Exception as e:
+            logger.error(f"Failed to sync Feishu to DB: {e}")
+            return {change.record_id: False for change in changes}
+        
+        results: Dict[str, bool] = {}
+        buckets: Dict[str, List[ChangeRecord]] = {'delete': [], 'update': [], 'insert': []}
+        
+        for change in changes:
+            if change.hash and change.hash in looping:
+                logger.debug("Skip circular sync for record {}", change.record_id)
+                results[change.record_id] = True
+            elif change.action in buckets:
+                buckets[change.action].append(change)
+        
+        handlers = {
+            'delete': lambda bucket: self._delete_batch_from_db(db_table, bucket, db_ids),
+            'update': lambda bucket: self._update_batch_in_db(db_table, bucket, db_ids),
+            'insert': lambda bucket: self._insert_batch_to_db(db_table, bucket)
+        }
+        
+        pending = [change for bucket in buckets.values() for change in bucket]
+        logs = [{
+            'table_name': db_table,
+            'record_id': change.record_id,
+            'direction': SyncDirection.FEISHU_TO_DB.value,
+            'sync_hash': change.hash,
+            'status': 'completed',
+            'error_message': None
+        } for change in pending]
+        
+        try:
+            # 整批写入和同步日志在同一事务中，只提交一次；任一步出错时整批回滚
+            with self.db.transaction():
+                for action, bucket in buckets.items():
+                    if bucket:
+                        handlers[action](bucket)
+                
+                self.queue.log_sync_batch(logs)
+        except Exception as e:
+            logger.error(f"Failed to sync Feishu changes to DB {db_table}, batch rolled back: {e}")
+            # 回滚后事务内缓存的ID映射已失效
+            for change in pending:
+                self.queue.evict_id_mapping(db_table, feishu_id=change.record_id)
+            for log in logs:
+                log['status'], log['error_message'] = 'failed', str(e)
+            try:
+                self.queue.log_sync_batch(logs)
+            except Exception as log_error:
+                logger.error(f"Failed to write sync logs: {log_error}")
+        
+        for log in logs:
+            results[log['record_id']] = log['status'] == 'completed'
+        
+        logger.info(f"Synced {len(logs)} changes from Feishu {feishu_table} to DB {db_table}")
+        return results
+    
     def sync_db_to_feishu(self, queue_item: SyncQueue,
                          feishu_db: str, feishu_table: str) -> bool:
         """同步数据库变更到飞书"""
@@ -93,36 +175,137 @@ class SyncWorker:
                 self._delete_from_feishu(feishu_db, feishu_table,
                                        queue_item.record_id)
             
-            # 标记队列项为完成
-            self.queue.mark_completed(queue_item.id)
-            
-            # 记录同步日志
-            self.queue.log_sync(
-                table_name=queue_item.table_name,
-                record_id=queue_item.record_id,
-                direction=SyncDirection.DB_TO_FEISHU.value,
-                sync_hash=queue_item.sync_hash,
-                status='completed'
-            )
+            # 标记队列项为完成并记录同步日志，一次提交
+            with self.db.transaction():
+                self.queue.mark_completed(queue_item.id)
+                self.queue.log_sync(
+                    table_name=queue_item.table_name,
+                    record_id=queue_item.record_id,
+                    direction=SyncDirection.DB_TO_FEISHU.value,
+                    sync_hash=queue_item.sync_hash,
+                    status='completed'
+                )
             
             logger.info(f"Synced {queue_item.action} from DB to Feishu: {queue_item.record_id}")
             return True
             
         except Exception as e:
             logger.error(f"Failed to sync DB to Feishu: {e}")
-            # 标记失败
-            self.queue.mark_failed(queue_item.id, str(e))
-            # 记录失败日志
-            self.queue.log_sync(
-                table_name=queue_item.table_name,
-                record_id=queue_item.record_id,
-                direction=SyncDirection.DB_TO_FEISHU.value,
-                sync_hash=queue_item.sync_hash,
-                status='failed',
-                error_message=str(e)
-            )
+            # 标记失败并记录失败日志
+            with self.db.transaction():
+                self.queue.mark_failed(queue_item.id, str(e))
+                self.queue.log_sync(
+                    table_name=queue_item.table_name,
+                    record_id=queue_item.record_id,
+                    direction=SyncDirection.DB_TO_FEISHU.value,
+                    sync_hash=queue_item.sync_hash,
+                    status='failed',
+                    error_message=str(e)
+                )
             return False
     
+    def sync_inserts_to_feishu(self, queue_items: List[SyncQueue],
+                               feishu_db: str, feishu_table: str) -> Dict[int, bool]:
+        """
+        批量同步数据库新增记录到飞书
+        
+        Args:
+            queue_items: 同一张表的 INSERT 队列项
+            feishu_db: 飞书数据库
+            feishu_table: 飞书表
+            
+        Returns:
+            队列项 ID 到是否成功的映射
+        """
+        results: Dict[int, bool] = {}
+        try:
+            self._sync_inserts(queue_items, feishu_db, feishu_table, results)
+        except Exception as e:
+            logger.error(f"Failed to sync inserts to Feishu: {e}")
+            failed = [item for item in queue_items if item.id not in results]
+            with self.db.transaction():
+                self.queue.mark_failed_batch([item.id for item in failed], str(e))
+                self.queue.log_sync_batch([
+                    {
+                        'table_name': item.table_name,
+                        'record_id': item.record_id,
+                        'direction': SyncDirection.DB_TO_FEISHU.value,
+                        'sync_hash': item.sync_hash,
+                        'status': 'failed',
+                        'error_message': str(e)
+                    }
+                    for item in failed
+                ])
+            for item in failed:
+                results[item.id] = False
+        return results
+    
+    def _sync_inserts(self, queue_items: List[SyncQueue], feishu_db: str,
+                      feishu_table: str, results: Dict[int, bool]) -> None:
+        """批量插入，结果写入 results"""
+        pending: List[SyncQueue] = []
+        looped: List[int] = []
+        
+        for item in queue_items:
+            # 检查是否是循环同步
+            if item.sync_hash and self.queue.check_sync_loop(
+                item.sync_hash, SyncDirection.DB_TO_FEISHU.value
+            ):
+                logger.debug("Skip circular sync for record {}", item.record_id)
+                looped.append(item.id)
+                continue
+            
+            pending.append(item)
+        
+        if looped:
+            self.queue.mark_completed_batch(looped)
+            for queue_id in looped:
+                results[queue_id] = True
+        
+        if not pending:
+            return
+        
+        records = self.mapper.db_to_feishu_batch(feishu_table, [item.new_data for item in pending])
+        for item, feishu_data in zip(pending, records):
+            if 'db_id' not in feishu_data:
+                feishu_data['db_id'] = item.record_id
+        
+        feishu_ids = self.feishu.batch_create_records(feishu_db, feishu_table, records)
+        
+        mappings: List[Tuple[str, str]] = []
+        completed: List[int] = []
+        failed: List[int] = []
+        logs: List[Dict[str, Any]] = []
+        for item, feishu_id in zip(pending, feishu_ids):
+            if feishu_id:
+                mappings.append((item.record_id, feishu_id))
+                completed.append(item.id)
+                status, error = 'completed', None
+            else:
+                failed.append(item.id)
+                status, error = 'failed', "Failed to create record in Feishu"
+            
+            logs.append({
+                'table_name': item.table_name,
+                'record_id': item.record_id,
+                'direction': SyncDirection.DB_TO_FEISHU.value,
+                'sync_hash': item.sync_hash,
+                'status': status,
+                'error_message': error
+            })
+        
+        # ID映射、队列状态和同步日志批量写入，一次提交
+        with self.db.transaction():
+            self.queue.save_id_mappings(feishu_table, mappings)
+            self.queue.mark_completed_batch(completed)
+            self.queue.mark_failed_batch(failed, "Failed to create record in Feishu")
+            self.queue.log_sync_batch(logs)
+        
+        for item, feishu_id in zip(pending, feishu_ids):
+            results[item.id] = bool(feishu_id)
+        
+        logger.info(f"Synced {len(pending)} inserts from DB to Feishu {feishu_db}:{feishu_table}")
+    
     def _insert_to_db(self, table: str, feishu_data: Dict[str, Any], 
                      feishu_id: str) -> None:
         """插入记录到数据库"""
@@ -175,6 +358,74 @@ class SyncWorker:
         else:
             # 尝试用feishu_id删除
             self.db.delete(table, {'feishu_id': feishu_id})
+        
+        self.queue.evict_id_mapping(table, db_id, feishu_id)
+    
+    def _insert_batch_to_db(self, table: str, changes: List[ChangeRecord]) -> None:
+        """批量插入记录到数据库"""
+        rows = self.mapper.feishu_to_db_batch(table, [change.new_data for change in changes])
+        for change, db_data in zip(changes, rows):
+            db_data['feishu_id'] = change.record_id
+        
+        self.db.batch_upsert(table, rows, ['feishu_id'])
+        
+        # 回查新记录的数据库ID，保存映射
+        db_ids = self._find_db_ids(table, [change.record_id for change in changes])
+        self.queue.save_id_mappings(
+            table, [(db_id, feishu_id) for feishu_id, db_id in db_ids.items()]
+        )
+    
+    def _update_batch_in_db(self, table: str, changes: List[ChangeRecord],
+                            db_ids: Dict[str, str]) -> None:
+        """批量更新数据库记录，找不到的记录改为插入；db_ids 为预先查出的ID映射"""
+        feishu_ids = [change.record_id for change in changes]
+        db_ids = {feishu_id: db_ids[feishu_id] for feishu_id in feishu_ids if feishu_id in db_ids}
+        
+        # 没有映射的记录尝试用feishu_id查找
+        missing = [feishu_id for feishu_id in feishu_ids if feishu_id not in db_ids]
+        if missing:
+            found = self._find_db_ids(table, missing)
+            if found:
+                self.queue.save_id_mappings(
+                    table, [(db_id, feishu_id) for feishu_id, db_id in found.items()]
+                )
+                db_ids.update(found)
+        
+        updates = [change for change in changes if change.record_id in db_ids]
+        inserts = [change for change in changes if change.record_id not in db_ids]
+        
+        rows = self.mapper.feishu_to_db_batch(table, [change.new_data for change in updates])
+        rows = [dict(db_data, id=db_ids[change.record_id]) for change, db_data in zip(updates, rows)]
+        
+        # 按主键更新，本地已删除的记录不会被重新插入
+        self.db.batch_update(table, rows, 'id')
+        
+        if inserts:
+            self._insert_batch_to_db(table, inserts)
+    
+    def _delete_batch_from_db(self, table: str, changes: List[ChangeRecord],
+                              db_ids: Dict[str, str]) -> None:
+        """批量从数据库删除记录；db_ids 为预先查出的ID映射"""
+        feishu_ids = [change.record_id for change in changes]
+        db_ids = {feishu_id: db_ids[feishu_id] for feishu_id in feishu_ids if feishu_id in db_ids}
+        
+        self.db.delete_in(table, 'id', list(db_ids.values()))
+        # 没有映射的记录用feishu_id删除
+        self.db.delete_in(
+            table, 'feishu_id', [feishu_id for feishu_id in feishu_ids if feishu_id not in db_ids]
+        )
+        
+        for feishu_id in feishu_ids:
+            self.queue.evict_id_mapping(table, db_ids.get(feishu_id), feishu_id)
+    
+    def _find_db_ids(self, table: str, feishu_ids: List[str]) -> Dict[str, str]:
+        """用feishu_id查找数据库记录ID，返回飞书ID到数据库ID的映射"""
+        placeholders = ', '.join(['%s'] * len(feishu_ids))
+        rows = self.db.query_fast(
+            f"SELECT id, feishu_id FROM {table} WHERE feishu_id IN ({placeholders})",
+            tuple(feishu_ids)
+        )
+        return {feishu_id: str(db_id) for db_id, feishu_id in rows}
     
     def _insert_to_feishu(self, database: str, table: str,
                          db_data: Dict[str, Any], db_id: str) -> None:
@@ -200,8 +451,9 @@ class SyncWorker:
         
         if not feishu_id:
             # 如果找不到映射，尝试搜索
+            # 不使用查询缓存，过期的“未找到”会导致重复插入或漏删
             records = self.feishu.search_records(
-                database, table, 'db_id', '=', db_id
+                database, table, 'db_id', '=', db_id, use_cache=False
             )
             if records:
                 feishu_id = records[0]['id']
@@ -227,8 +479,11 @@ class SyncWorker:
             self.feishu.delete_record(database, table, feishu_id)
         else:
             # 尝试搜索并删除
+            # 不使用查询缓存，过期的“未找到”会导致重复插入或漏删
             records = self.feishu.search_records(
-                database, table, 'db_id', '=', db_id
+                database, table, 'db_id', '=', db_id, use_cache=False
             )
             for record in records:
-                self.feishu.delete_record(database, table, record['id'])
\ No newline at end of file
+                self.feishu.delete_record(database, table, record['id'])
+        
+        self.queue.evict_id_mapping(table, db_id, feishu_id)
\ No newline at end of file
@@ -1,25 +1,82 @@
 """
 数据库操作封装
 """
+import functools
 import json
-from typing import Dict, List, Any, Optional, Tuple
+import operator
+import threading
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from contextlib import contextmanager
 import pymysql
 from pymysql.connections import Connection
-from pymysql.cursors import DictCursor
+from pymysql.cursors import Cursor, DictCursor
 from dbutils.pooled_db import PooledDB
 from loguru import logger
 
 from ..config.config import DatabaseConfig
 
 
+# 多行 INSERT 每条语句的最大行数
+MAX_ROWS_PER_INSERT = 1000
+
+# 多行 INSERT 每条语句的参数估算大小上限（字节），低于默认 max_allowed_packet
+MAX_INSERT_PAYLOAD = 4 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=256)
+def _row_getter(columns: Tuple[str, ...]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """生成按固定字段顺序取值的函数，结果为元组"""
+    if len(columns) == 1:
+        column = columns[0]
+        return lambda data: (data[column],)
+    return operator.itemgetter(*columns)
+
+
+@functools.lru_cache(maxsize=256)
+def _insert_sql(table: str, columns: Tuple[str, ...], row_count: int = 1) -> str:
+    """生成（多行）INSERT 语句"""
+    row = f"({', '.join(['%s'] * len(columns))})"
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row] * row_count)}"
+
+
+@functools.lru_cache(maxsize=256)
+def _upsert_sql(table: str, columns: Tuple[str, ...], unique_keys: Tuple[str, ...],
+                row_count: int = 1) -> str:
+    """生成（多行）INSERT ... ON DUPLICATE KEY UPDATE 语句"""
+    update_clause = ', '.join([
+        f"{col} = VALUES({col})"
+        for col in columns
+        if col not in unique_keys
+    ]) or f"{columns[0]} = {columns[0]}"
+    return f"{_insert_sql(table, columns, row_count)} ON DUPLICATE KEY UPDATE {update_clause}"
+
+
+@functools.lru_cache(maxsize=256)
+def _update_sql(table: str, columns: Tuple[str, ...], where_columns: Tuple[str, ...]) -> str:
+    """生成 UPDATE 语句"""
+    set_clause = ', '.join([f"{k} = %s" for k in columns])
+    where_clause = ' AND '.join([f"{k} = %s" for k in where_columns])
+    return f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
+
+
+@functools.lru_cache(maxsize=256)
+def _delete_sql(table: str, where_columns: Tuple[str, ...]) -> str:
+    """生成 DELETE 语句"""
+    where_clause = ' AND '.join([f"{k} = %s" for k in where_columns])
+    return f"DELETE FROM {table} WHERE {where_clause}"
+
+
 class Database:
     """数据库操作类"""
     
     def __init__(self, config: DatabaseConfig):
         self.config = config
         self._pool = None
+        
+        # 当前线程所在事务的连接
+        self._local = threading.local()
+        
         self._init_pool()
     
     def _init_pool(self) -> None:
@@ -46,7 +103,12 @@ class Database:
     
     @contextmanager
     def get_connection(self) -> Connection:
-        """获取数据库连接（上下文管理器）"""
+        """获取数据库连接（上下文管理器），处于事务中时返回事务的连接"""
+        tx_conn = getattr(self._local, 'conn', None)
+        if tx_conn is not None:
+            yield tx_conn
+            return
+        
         conn = None
         try:
             conn = self._pool.connection()
@@ -60,13 +122,58 @@ class Database:
             if conn:
                 conn.close()
     
+    @contextmanager
+    def transaction(self) -> Iterator[Cursor]:
+        """
+        事务（上下文管理器）
+        
+        块内当前线程的所有数据库操作共用同一个连接，退出时只提交一次，
+        出错时回滚。嵌套调用时并入外层事务。提交成功后依次执行 after_commit
+        登记的回调，回滚时丢弃。
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if getattr(self._local, 'conn', None) is not None:
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
+                return
+            
+            self._local.conn = conn
+            self._local.after_commit = []
+            try:
+                yield cursor
+                conn.commit()
+                callbacks = self._local.after_commit
+            finally:
+                self._local.conn = None
+                self._local.after_commit = None
+                cursor.close()
+            
+            for callback in callbacks:
+                callback()
+    
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """处于事务中时在提交成功后执行 callback，否则立即执行"""
+        callbacks = getattr(self._local, 'after_commit', None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+    
+    def _commit(self, conn: Connection) -> None:
+        """提交，处于事务中时由事务统一提交"""
+        if getattr(self._local, 'conn', None) is None:
+            conn.commit()
+    
     def execute(self, sql: str, params: Optional[Tuple] = None) -> int:
         """执行SQL语句"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             try:
                 result = cursor.execute(sql, params)
-                conn.commit()
+                self._commit(conn)
                 return result
             finally:
                 cursor.close()
@@ -77,7 +184,7 @@ class Database:
             cursor = conn.cursor()
             try:
                 result = cursor.executemany(sql, params_list)
-                conn.commit()
+                self._commit(conn)
                 return result
             finally:
                 cursor.close()
@@ -92,6 +199,26 @@ class Database:
             finally:
                 cursor.close()
     
+    def query_fast(self, sql: str, params: Optional[Tuple] = None,
+                   row_cls: Optional[Callable[..., Any]] = None) -> List[Any]:
+        """
+        查询数据，结果为元组而非字典
+        
+        用于热点查询：不为每行创建字典。row_cls 为 namedtuple 等类型时，
+        用 row_cls._make 包装每行。
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor(Cursor)
+            try:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        
+        if row_cls is not None:
+            return list(map(row_cls._make, rows))
+        return list(rows)
+    
     def query_one(self, sql: str, params: Optional[Tuple] = None) -> Optional[Dict[str, Any]]:
         """查询单条数据"""
         with self.get_connection() as conn:
@@ -104,72 +231,160 @@ class Database:
     
     def insert(self, table: str, data: Dict[str, Any]) -> int:
         """插入数据"""
-        columns = list(data.keys())
+        sql = _insert_sql(table, tuple(data))
         values = list(data.values())
-        placeholders = ', '.join(['%s'] * len(columns))
-        
-        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
         
         with self.get_connection() as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute(sql, values)
-                conn.commit()
+                self._commit(conn)
                 return cursor.lastrowid
             finally:
                 cursor.close()
     
-    def batch_insert(self, table: str, data_list: List[Dict[str, Any]]) -> int:
-        """批量插入数据"""
+    def batch_insert(self, table: str, data_list: List[Dict[str, Any]],
+                     multi_row: bool = True) -> int:
+        """
+        批量插入数据
+        
+        默认合并为多行 INSERT，每条语句不超过 MAX_ROWS_PER_INSERT 行、参数约
+        MAX_INSERT_PAYLOAD 字节，所有语句在同一事务中执行。
+        multi_row 为 False 时退回 executemany。
+        """
         if not data_list:
             return 0
         
-        columns = list(data_list[0].keys())
-        placeholders = ', '.join(['%s'] * len(columns))
-        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        columns = tuple(data_list[0].keys())
         
-        values_list = [tuple(data[col] for col in columns) for data in data_list]
+        if not multi_row:
+            values_list = list(map(_row_getter(columns), data_list))
+            return self.execute_many(_insert_sql(table, columns), values_list)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                affected = 0
+                for chunk in self._chunk_rows(data_list, columns):
+                    values = [value for row in chunk for value in row]
+                    affected += cursor.execute(_insert_sql(table, columns, len(chunk)), values)
+                
+                self._commit(conn)
+                return affected
+            finally:
+                cursor.close()
+    
+    @staticmethod
+    def _chunk_rows(data_list: List[Dict[str, Any]],
+                    columns: Tuple[str, ...]) -> Iterator[List[Tuple[Any, ...]]]:
+        """按行数和估算大小把数据切分为多行 INSERT 的分组"""
+        get_row = _row_getter(columns)
+        chunk: List[Tuple[Any, ...]] = []
+        payload = 0
+        for data in data_list:
+            row = get_row(data)
+            size = sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row)
+            if chunk and (len(chunk) >= MAX_ROWS_PER_INSERT or payload + size > MAX_INSERT_PAYLOAD):
+                yield chunk
+                chunk, payload = [], 0
+            chunk.append(row)
+            payload += size
         
-        return self.execute_many(sql, values_list)
+        if chunk:
+            yield chunk
     
     def update(self, table: str, data: Dict[str, Any], 
                where: Dict[str, Any]) -> int:
         """更新数据"""
-        set_clause = ', '.join([f"{k} = %s" for k in data.keys()])
-        where_clause = ' AND '.join([f"{k} = %s" for k in where.keys()])
-        
-        sql = f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
+        sql = _update_sql(table, tuple(data), tuple(where))
         params = list(data.values()) + list(where.values())
         
         return self.execute(sql, params)
     
+    def batch_update(self, table: str, data_list: List[Dict[str, Any]], key: str) -> int:
+        """
+        按 key 字段批量更新数据
+        
+        字段相同的行合并为一次 executemany 的 UPDATE ... WHERE key = %s，
+        key 对应的行不存在时不做任何修改，所有语句在同一个事务中执行。
+        """
+        if not data_list:
+            return 0
+        
+        # 按字段组合分组，缺失的字段保持原值
+        groups: Dict[Tuple[str, ...], List[Tuple[Any, ...]]] = {}
+        for data in data_list:
+            columns = tuple(column for column in data if column != key)
+            if columns:
+                groups.setdefault(columns, []).append(
+                    tuple(data[column] for column in columns) + (data[key],)
+                )
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                affected = 0
+                for columns, params_list in groups.items():
+                    affected += cursor.executemany(_update_sql(table, columns, (key,)), params_list)
+                
+                self._commit(conn)
+                return affected
+            finally:
+                cursor.close()
+    
     def upsert(self, table: str, data: Dict[str, Any], 
                unique_keys: List[str]) -> int:
         """插入或更新数据"""
-        columns = list(data.keys())
-        values = list(data.values())
-        placeholders = ', '.join(['%s'] * len(columns))
+        sql = _upsert_sql(table, tuple(data), tuple(unique_keys))
         
-        update_clause = ', '.join([
-            f"{col} = VALUES({col})" 
-            for col in columns 
-            if col not in unique_keys
-        ])
+        return self.execute(sql, list(data.values()))
+    
+    def batch_upsert(self, table: str, data_list: List[Dict[str, Any]],
+                     unique_keys: List[str]) -> int:
+        """
+        批量插入或更新数据
         
-        sql = f"""
-            INSERT INTO {table} ({', '.join(columns)}) 
-            VALUES ({placeholders})
-            ON DUPLICATE KEY UPDATE {update_clause}
+        字段相同的行合并为多行 INSERT ... ON DUPLICATE KEY UPDATE 语句，与 batch_insert
+        一样按 MAX_ROWS_PER_INSERT 行、约 MAX_INSERT_PAYLOAD 字节切分，
+        所有语句在同一个事务中执行。
         """
+        if not data_list:
+            return 0
+        
+        # 按字段组合分组，缺失的字段不会被覆盖为 NULL
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for data in data_list:
+            groups.setdefault(tuple(data.keys()), []).append(data)
         
-        return self.execute(sql, values)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                affected = 0
+                unique_keys = tuple(unique_keys)
+                for columns, rows in groups.items():
+                    for chunk in self._chunk_rows(rows, columns):
+                        values = [value for row in chunk for value in row]
+                        sql = _upsert_sql(table, columns, unique_keys, len(chunk))
+                        affected += cursor.execute(sql, values)
+                
+                self._commit(conn)
+                return affected
+            finally:
+                cursor.close()
     
     def delete(self, table: str, where: Dict[str, Any]) -> int:
         """删除数据"""
-        where_clause = ' AND '.join([f"{k} = %s" for k in where.keys()])
-        sql = f"DELETE FROM {table} WHERE {where_clause}"
+        return self.execute(_delete_sql(table, tuple(where)), list(where.values()))
+    
+    def delete_in(self, table: str, column: str, values: List[Any]) -> int:
+        """删除指定字段取值在 values 中的数据"""
+        if not values:
+            return 0
+        
+        placeholders = ', '.join(['%s'] * len(values))
+        sql = f"DELETE FROM {table} WHERE {column} IN ({placeholders})"
         
-        return self.execute(sql, list(where.values()))
+        return self.execute(sql, list(values))
     
     def table_exists(self, table: str) -> bool:
         """检查表是否存在"""
@@ -216,6 +431,7 @@ class Database:
                 retry_count INT DEFAULT 0,
                 error_message TEXT,
                 INDEX idx_status_created (status, created_at),
+                INDEX idx_status_processed (status, processed_at),
                 INDEX idx_table_record (table_name, record_id)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         """)
@@ -232,7 +448,7 @@ class Database:
                 status VARCHAR(20),
                 error_message TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX idx_sync_hash (sync_hash),
+                INDEX idx_hash_status_time (sync_hash, status, created_at, direction),
                 INDEX idx_created_at (created_at)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         """)
@@ -1,7 +1,7 @@
 """
 数据库模型定义
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Sequence
 from datetime import datetime
 from enum import Enum
 import json
@@ -32,20 +32,33 @@ class SyncAction(Enum):
 class SyncQueue:
     """同步队列模型"""
     
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('id')
-        self.table_name = kwargs.get('table_name')
-        self.record_id = kwargs.get('record_id')
-        self.action = kwargs.get('action')
-        self.old_data = kwargs.get('old_data')
-        self.new_data = kwargs.get('new_data')
-        self.sync_hash = kwargs.get('sync_hash')
-        self.sync_source = kwargs.get('sync_source', 'database')
-        self.created_at = kwargs.get('created_at', datetime.now())
-        self.processed_at = kwargs.get('processed_at')
-        self.status = kwargs.get('status', SyncStatus.PENDING.value)
-        self.retry_count = kwargs.get('retry_count', 0)
-        self.error_message = kwargs.get('error_message')
+    # 每个队列项一个实例，使用 __slots__ 省去实例字典
+    __slots__ = (
+        'id', 'table_name', 'record_id', 'action', 'old_data', 'new_data', 'sync_hash',
+        'sync_source', 'created_at', 'processed_at', 'status', 'retry_count', 'error_message'
+    )
+    
+    def __init__(self, id: Optional[int] = None, table_name: Optional[str] = None,
+                 record_id: Optional[str] = None, action: Optional[str] = None,
+                 old_data: Optional[Dict] = None, new_data: Optional[Dict] = None,
+                 sync_hash: Optional[str] = None, sync_source: str = 'database',
+                 created_at: Optional[datetime] = None, processed_at: Optional[datetime] = None,
+                 status: str = SyncStatus.PENDING.value, retry_count: int = 0,
+                 error_message: Optional[str] = None):
+        # 参数顺序与 sync_queue 表的列顺序一致，可以直接用元组行按位置构造
+        self.id = id
+        self.table_name = table_name
+        self.record_id = record_id
+        self.action = action
+        self.old_data = old_data
+        self.new_data = new_data
+        self.sync_hash = sync_hash
+        self.sync_source = sync_source
+        self.created_at = created_at if created_at is not None else datetime.now()
+        self.processed_at = processed_at
+        self.status = status
+        self.retry_count = retry_count
+        self.error_message = error_message
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
@@ -73,11 +86,29 @@ class SyncQueue:
             record['new_data'] = json.loads(record['new_data']) if record['new_data'] else None
         
         return SyncQueue(**record)
+    
+    @classmethod
+    def from_db_row(cls, row: Sequence[Any]) -> 'SyncQueue':
+        """从按 sync_queue 列顺序排列的元组行创建对象，不经过中间字典"""
+        id, table_name, record_id, action, old_data, new_data, *rest = row
+        if isinstance(old_data, str):
+            old_data = json.loads(old_data) if old_data else None
+        if isinstance(new_data, str):
+            new_data = json.loads(new_data) if new_data else None
+        return cls(id, table_name, record_id, action, old_data, new_data, *rest)
+    
+    # 供 Database.query_fast 的 row_cls 参数使用
+    _make = from_db_row
 
 
 class SyncLog:
     """同步日志模型"""
     
+    __slots__ = (
+        'id', 'sync_id', 'table_name', 'record_id', 'direction', 'sync_hash',
+        'status', 'error_message', 'created_at'
+    )
+    
     def __init__(self, **kwargs):
         self.id = kwargs.get('id')
         self.sync_id = kwargs.get('sync_id')
@@ -110,6 +141,8 @@ class SyncLog:
 class IdMapping:
     """ID映射模型"""
     
+    __slots__ = ('id', 'table_name', 'db_id', 'feishu_id', 'created_at', 'updated_at')
+    
     def __init__(self, **kwargs):
         self.id = kwargs.get('id')
         self.table_name = kwargs.get('table_name')
@@ -2,87 +2,327 @@
 同步队列处理器
 """
 import json
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
 from datetime import datetime, timedelta
 from loguru import logger
+import redis
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+from feishu_bitable_db.internal.cache import TTLCache
 
 from .database import Database
 from .models import SyncQueue, SyncLog, SyncStatus, SyncDirection
 
 
+# 热点方法中使用的状态值，避免每次调用都访问枚举属性
+_PENDING = SyncStatus.PENDING.value
+_PROCESSING = SyncStatus.PROCESSING.value
+_COMPLETED = SyncStatus.COMPLETED.value
+_FAILED = SyncStatus.FAILED.value
+_SKIPPED = SyncStatus.SKIPPED.value
+
+# 所有同步方向，以及每个方向对应的其他方向
+_DIRECTIONS = tuple(item.value for item in SyncDirection)
+_OTHER_DIRECTIONS = {
+    direction: [other for other in _DIRECTIONS if other != direction]
+    for direction in _DIRECTIONS
+}
+
+# 写入同步日志，使用 UPSERT 避免重复
+_LOG_SYNC_SQL = """
+    INSERT INTO sync_log (sync_id, table_name, record_id, direction, sync_hash, status, error_message)
+    VALUES (%(sync_id)s, %(table_name)s, %(record_id)s, %(direction)s, %(sync_hash)s, %(status)s, %(error_message)s)
+    ON DUPLICATE KEY UPDATE status = VALUES(status), error_message = VALUES(error_message)
+"""
+
+# ID映射缓存的过期时间（秒）
+ID_MAPPING_CACHE_TTL = 300
+
+# ID映射缓存的最大条目数（每个方向）
+ID_MAPPING_CACHE_SIZE = 10000
+
+# sync_queue 的全部字段，顺序与 SyncQueue 构造参数一致
+_QUEUE_COLUMNS = (
+    "id, table_name, record_id, action, old_data, new_data, sync_hash, "
+    "sync_source, created_at, processed_at, status, retry_count, error_message"
+)
+
+# 领取队列项时读取的字段：同步到飞书不需要 old_data，以 NULL 占位不读取以减少传输量；
+# 顺序与 SyncQueue 构造参数一致
+_CLAIM_COLUMNS = (
+    "id, table_name, record_id, action, NULL, new_data, sync_hash, "
+    "sync_source, created_at, NULL, status, retry_count"
+)
+
+# 队列数据的 JSON 紧凑分隔符
+_JSON_SEPARATORS = (',', ':')
+
+
+def _to_json(value: Any) -> Optional[str]:
+    """
+    序列化队列数据，空值返回 None
+    
+    已序列化的 str/bytes 原样使用（bytes 解码为 str，JSON 列不接受二进制字符集）；
+    dict 优先使用 orjson 生成紧凑格式。
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(value, separators=_JSON_SEPARATORS)
+
+# 清理旧记录时每条 DELETE 删除的最大行数，避免大事务长时间锁表
+CLEANUP_BATCH_SIZE = 5000
+
+# 清理旧记录时两批之间的间隔（秒），让出锁和从库复制的时间
+CLEANUP_BATCH_PAUSE = 0.05
+
+# 新队列项通知列表，同步循环在此阻塞等待，唤醒后清空；
+# 数据库触发器无法写 Redis，触发器写入的队列项靠等待超时后的重新查询发现
+QUEUE_NOTIFY_KEY = 'sync_queue_notify'
+
+# 循环同步检测窗口（秒）：此时间内反方向同步过相同哈希视为循环
+SYNC_LOOP_WINDOW = 10
+
+# 已同步哈希的Redis键前缀，完整键为 前缀 + 方向:哈希
+SYNC_SEEN_PREFIX = 'sync_seen:'
+
+# 进程内已同步哈希缓存的最大条目数
+SYNC_SEEN_CACHE_SIZE = 10000
+
+
 class QueueProcessor:
     """同步队列处理器"""
     
-    def __init__(self, database: Database):
+    def __init__(self, database: Database, redis_client: Optional[redis.Redis] = None):
         self.db = database
+        self.redis = redis_client
+        
+        # ID映射缓存: (表名, 数据库ID) -> 飞书ID，(表名, 飞书ID) -> 数据库ID
+        self._feishu_id_cache = TTLCache(ttl=ID_MAPPING_CACHE_TTL, maxsize=ID_MAPPING_CACHE_SIZE)
+        self._db_id_cache = TTLCache(ttl=ID_MAPPING_CACHE_TTL, maxsize=ID_MAPPING_CACHE_SIZE)
+        
+        # 本进程同步完成的哈希，键与Redis相同；只用于确认循环，未命中时仍需查Redis或同步日志
+        self._seen_cache = TTLCache(ttl=SYNC_LOOP_WINDOW, maxsize=SYNC_SEEN_CACHE_SIZE)
     
     def add_to_queue(self, table_name: str, record_id: str, 
-                    action: str, old_data: Optional[Dict] = None,
-                    new_data: Optional[Dict] = None, 
+                    action: str, old_data: Union[Dict, str, bytes, None] = None,
+                    new_data: Union[Dict, str, bytes, None] = None, 
                     sync_hash: Optional[str] = None) -> int:
-        """添加到同步队列"""
-        data = {
+        """添加到同步队列，old_data/new_data 可以是字典或已序列化的 JSON"""
+        data = self._queue_row(table_name, record_id, action, old_data, new_data, sync_hash)
+        
+        queue_id = self.db.insert('sync_queue', data)
+        self.notify(queue_id)
+        return queue_id
+    
+    def add_many_to_queue(self, items: List[Dict[str, Any]]) -> int:
+        """
+        批量添加到同步队列
+        
+        items 中每项的键与 add_to_queue 的参数相同；所有行通过多行 INSERT
+        一次写入，只通知一次同步循环。
+        
+        Returns:
+            插入的行数
+        """
+        if not items:
+            return 0
+        
+        rows = [
+            self._queue_row(item['table_name'], item['record_id'], item['action'],
+                            item.get('old_data'), item.get('new_data'), item.get('sync_hash'))
+            for item in items
+        ]
+        
+        count = self.db.batch_insert('sync_queue', rows)
+        self.notify(count)
+        return count
+    
+    @staticmethod
+    def _queue_row(table_name: str, record_id: str, action: str,
+                   old_data: Union[Dict, str, bytes, None],
+                   new_data: Union[Dict, str, bytes, None],
+                   sync_hash: Optional[str]) -> Dict[str, Any]:
+        """构造 sync_queue 行，JSON 字段使用紧凑格式"""
+        return {
             'table_name': table_name,
             'record_id': record_id,
             'action': action,
-            'old_data': json.dumps(old_data) if old_data else None,
-            'new_data': json.dumps(new_data) if new_data else None,
+            'old_data': _to_json(old_data),
+            'new_data': _to_json(new_data),
             'sync_hash': sync_hash,
             'sync_source': 'database'
         }
+    
+    def notify(self, payload: Any) -> None:
+        """
+        通知同步循环有新的队列项，Redis不可用时由轮询兜底
+        
+        payload 只用于唤醒等待方（单条入队时为队列ID，批量入队时为行数）。
+        数据库触发器写入的队列项不会调用这里；应用在提交触发写入的事务后可
+        调用 notify 让同步循环立即处理，否则最长延迟 QUEUE_WAIT_TIMEOUT 秒。
+        """
+        if self.redis is None:
+            return
+        
+        try:
+            self.redis.lpush(QUEUE_NOTIFY_KEY, payload)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to notify sync queue: {e}")
+    
+    def wait_for_items(self, timeout: int) -> bool:
+        """
+        阻塞等待新队列项通知，最长 timeout 秒
         
-        return self.db.insert('sync_queue', data)
+        唤醒后清空通知列表：一次领取会处理此前提交的所有队列项，多余的通知
+        只会引发空的领取事务，也会让列表无限增长。
+        
+        Returns:
+            收到通知返回 True；超时返回 False。Redis不可用或出错时退化为休眠
+        """
+        if self.redis is None:
+            time.sleep(timeout)
+            return False
+        
+        try:
+            if self.redis.brpop(QUEUE_NOTIFY_KEY, timeout=timeout) is None:
+                return False
+            self.redis.delete(QUEUE_NOTIFY_KEY)
+            return True
+        except redis.RedisError as e:
+            logger.warning(f"Failed to wait for sync queue notification: {e}")
+            time.sleep(timeout)
+            return False
     
     def get_pending_items(self, limit: int = 50) -> List[SyncQueue]:
         """获取待处理的队列项"""
-        sql = """
-            SELECT * FROM sync_queue
+        sql = f"""
+            SELECT {_QUEUE_COLUMNS} FROM sync_queue
             WHERE status = %s AND retry_count < 3
             ORDER BY created_at ASC
             LIMIT %s
         """
         
-        records = self.db.query(sql, (SyncStatus.PENDING.value, limit))
-        return [SyncQueue.from_db_record(record) for record in records]
+        return self.db.query_fast(sql, (_PENDING, limit), SyncQueue)
+    
+    def claim_pending_items(self, limit: int = 50) -> List[SyncQueue]:
+        """
+        领取待处理的队列项并标记为处理中
+        
+        查询和标记在同一事务中完成；SKIP LOCKED（MySQL 8.0+）跳过其他事务
+        已锁定的行，多个工作进程可以并行领取互不重叠的队列项。
+        """
+        sql = f"""
+            SELECT {_CLAIM_COLUMNS} FROM sync_queue
+            WHERE status = %s AND retry_count < 3
+            ORDER BY created_at ASC, id ASC
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """
+        
+        with self.db.transaction():
+            items = self.db.query_fast(sql, (_PENDING, limit), SyncQueue)
+            self.mark_processing_batch([item.id for item in items])
+        
+        for item in items:
+            item.status = _PROCESSING
+        return items
     
     def mark_processing(self, queue_id: int) -> None:
         """标记为处理中"""
         self.db.update(
             'sync_queue',
-            {'status': SyncStatus.PROCESSING.value},
+            {'status': _PROCESSING},
             {'id': queue_id}
         )
     
+    def mark_processing_batch(self, queue_ids: List[int]) -> None:
+        """批量标记为处理中"""
+        if not queue_ids:
+            return
+        
+        placeholders = ', '.join(['%s'] * len(queue_ids))
+        self.db.execute(
+            f"UPDATE sync_queue SET status = %s WHERE id IN ({placeholders})",
+            (_PROCESSING, *queue_ids)
+        )
+    
     def mark_completed(self, queue_id: int) -> None:
         """标记为已完成"""
         self.db.update(
             'sync_queue',
             {
-                'status': SyncStatus.COMPLETED.value,
+                'status': _COMPLETED,
                 'processed_at': datetime.now()
             },
             {'id': queue_id}
         )
     
+    def mark_completed_batch(self, queue_ids: List[int]) -> None:
+        """批量标记为已完成"""
+        self._mark_processed_batch(queue_ids, _COMPLETED)
+    
+    def mark_skipped_batch(self, queue_ids: List[int]) -> None:
+        """批量标记为已跳过（已合并到同一记录的其他队列项）"""
+        self._mark_processed_batch(queue_ids, _SKIPPED)
+    
+    def _mark_processed_batch(self, queue_ids: List[int], status: str) -> None:
+        """批量设置处理结束的状态和处理时间"""
+        if not queue_ids:
+            return
+        
+        placeholders = ', '.join(['%s'] * len(queue_ids))
+        self.db.execute(
+            f"UPDATE sync_queue SET status = %s, processed_at = %s WHERE id IN ({placeholders})",
+            (status, datetime.now(), *queue_ids)
+        )
+    
     def mark_failed(self, queue_id: int, error_message: str) -> None:
-        """标记为失败"""
-        # 获取当前重试次数
-        item = self.db.query_one("SELECT retry_count FROM sync_queue WHERE id = %s", (queue_id,))
-        retry_count = item['retry_count'] + 1 if item else 1
+        """标记为失败，重试次数达到3次后不再重试"""
+        self.mark_failed_batch([queue_id], error_message)
+    
+    def mark_failed_batch(self, queue_ids: List[int], error_message: str) -> None:
+        """批量标记为失败（相同错误信息），重试次数达到3次后不再重试"""
+        if not queue_ids:
+            return
         
-        self.db.update(
-            'sync_queue',
-            {
-                'status': SyncStatus.FAILED.value if retry_count >= 3 else SyncStatus.PENDING.value,
-                'retry_count': retry_count,
-                'error_message': error_message
-            },
-            {'id': queue_id}
+        # 在一条语句中累加重试次数（status 先于 retry_count 赋值，读到的是旧值）
+        placeholders = ', '.join(['%s'] * len(queue_ids))
+        self.db.execute(
+            f"""
+            UPDATE sync_queue
+            SET status = IF(retry_count + 1 >= 3, %s, %s),
+                retry_count = retry_count + 1,
+                error_message = %s
+            WHERE id IN ({placeholders})
+            """,
+            (_FAILED, _PENDING, error_message, *queue_ids)
         )
     
     def check_sync_loop(self, sync_hash: str, direction: str, 
-                       window_seconds: int = 10) -> bool:
-        """检查是否存在同步循环"""
+                       window_seconds: int = SYNC_LOOP_WINDOW) -> bool:
+        """检查是否存在同步循环，依次查进程内缓存、Redis，不可用时查同步日志"""
+        if window_seconds == SYNC_LOOP_WINDOW:
+            keys = [self._seen_key(other, sync_hash) for other in self._other_directions(direction)]
+            if any(self._seen_cache.get(key) for key in keys):
+                return True
+        
+        if self.redis is not None and window_seconds == SYNC_LOOP_WINDOW:
+            try:
+                return self.redis.exists(*keys) > 0
+            except redis.RedisError as e:
+                logger.warning(f"Failed to check sync loop in Redis, falling back to sync_log: {e}")
+        
         sql = """
             SELECT COUNT(*) as count FROM sync_log
             WHERE sync_hash = %s
@@ -94,11 +334,58 @@ class QueueProcessor:
         time_threshold = datetime.now() - timedelta(seconds=window_seconds)
         result = self.db.query_one(
             sql, 
-            (sync_hash, direction, time_threshold, 'completed')
+            (sync_hash, direction, time_threshold, _COMPLETED)
         )
         
         return result['count'] > 0
     
+    def check_sync_loops(self, sync_hashes: List[str], direction: str,
+                         window_seconds: int = SYNC_LOOP_WINDOW) -> Set[str]:
+        """批量检查同步循环，返回存在循环的哈希集合"""
+        if not sync_hashes:
+            return set()
+        
+        looping: Set[str] = set()
+        if window_seconds == SYNC_LOOP_WINDOW:
+            # 本进程刚同步过的哈希直接确认，其余的再查Redis或同步日志
+            others = self._other_directions(direction)
+            looping = {
+                sync_hash for sync_hash in sync_hashes
+                if any(self._seen_cache.get(self._seen_key(other, sync_hash)) for other in others)
+            }
+            sync_hashes = [sync_hash for sync_hash in sync_hashes if sync_hash not in looping]
+            if not sync_hashes:
+                return looping
+        
+        if self.redis is not None and window_seconds == SYNC_LOOP_WINDOW:
+            try:
+                pairs = [
+                    (sync_hash, self._seen_key(other, sync_hash))
+                    for sync_hash in sync_hashes
+                    for other in others
+                ]
+                values = self.redis.mget([key for _, key in pairs])
+                return looping | {sync_hash for (sync_hash, _), value in zip(pairs, values) if value is not None}
+            except redis.RedisError as e:
+                logger.warning(f"Failed to check sync loops in Redis, falling back to sync_log: {e}")
+        
+        placeholders = ', '.join(['%s'] * len(sync_hashes))
+        sql = f"""
+            SELECT DISTINCT sync_hash FROM sync_log
+            WHERE sync_hash IN ({placeholders})
+            AND direction != %s
+            AND created_at > %s
+            AND status = %s
+        """
+        
+        time_threshold = datetime.now() - timedelta(seconds=window_seconds)
+        rows = self.db.query(
+            sql,
+            (*sync_hashes, direction, time_threshold, _COMPLETED)
+        )
+        
+        return looping | {row['sync_hash'] for row in rows}
+    
     def log_sync(self, table_name: str, record_id: str, 
                 direction: str, sync_hash: str, 
                 status: str, error_message: Optional[str] = None) -> None:
@@ -115,59 +402,130 @@ class QueueProcessor:
             'error_message': error_message
         }
         
-        # 使用 UPSERT 避免重复
-        self.db.execute("""
-            INSERT INTO sync_log (sync_id, table_name, record_id, direction, sync_hash, status, error_message)
-            VALUES (%(sync_id)s, %(table_name)s, %(record_id)s, %(direction)s, %(sync_hash)s, %(status)s, %(error_message)s)
-            ON DUPLICATE KEY UPDATE status = VALUES(status), error_message = VALUES(error_message)
-        """, data)
+        self.db.execute(_LOG_SYNC_SQL, data)
+        self.db.after_commit(lambda: self._remember_synced([data]))
+    
+    def log_sync_batch(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        批量记录同步日志
+        
+        Args:
+            entries: 日志列表，每项包含 log_sync 的参数
+        """
+        if not entries:
+            return
+        
+        rows = []
+        for entry in entries:
+            row = {'error_message': None, **entry}
+            row['sync_id'] = SyncLog.generate_sync_id(
+                row['table_name'], row['record_id'], row['sync_hash']
+            )
+            rows.append(row)
+        
+        self.db.execute_many(_LOG_SYNC_SQL, rows)
+        self.db.after_commit(lambda: self._remember_synced(rows))
+    
+    def _remember_synced(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        把同步完成的哈希写入进程内缓存和Redis，SYNC_LOOP_WINDOW 秒后自动过期
+        
+        在同步日志提交后执行，事务回滚时不留下“已同步”标记，避免重试被当作循环跳过。
+        """
+        keys = [
+            self._seen_key(entry['direction'], entry['sync_hash'])
+            for entry in entries
+            if entry['status'] == _COMPLETED and entry['sync_hash']
+        ]
+        if not keys:
+            return
+        
+        for key in keys:
+            self._seen_cache.set(key, True)
+        
+        if self.redis is None:
+            return
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(key, 1, ex=SYNC_LOOP_WINDOW)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to record synced hashes in Redis: {e}")
+    
+    @staticmethod
+    def _seen_key(direction: str, sync_hash: str) -> str:
+        """已同步哈希的Redis键"""
+        return f"{SYNC_SEEN_PREFIX}{direction}:{sync_hash}"
+    
+    @staticmethod
+    def _other_directions(direction: str) -> List[str]:
+        """除 direction 外的同步方向"""
+        others = _OTHER_DIRECTIONS.get(direction)
+        if others is None:
+            return list(_DIRECTIONS)
+        return others
     
-    def cleanup_old_records(self, days: int = 7) -> None:
-        """清理旧记录"""
+    def cleanup_old_records(self, days: int = 7, max_rows: Optional[int] = None) -> None:
+        """
+        清理旧记录
+        
+        Args:
+            days: 保留天数
+            max_rows: 每张表本次最多删除的行数，为空时删除全部过期记录；
+                剩余的记录留到下次清理
+        """
         time_threshold = datetime.now() - timedelta(days=days)
         
-        # 清理已完成的队列记录
-        deleted_queue = self.db.execute("""
+        # 清理已完成和已跳过的队列记录
+        deleted_queue = self._delete_in_batches("""
             DELETE FROM sync_queue 
-            WHERE status = %s AND processed_at < %s
-        """, (SyncStatus.COMPLETED.value, time_threshold))
+            WHERE status IN (%s, %s) AND processed_at < %s
+            LIMIT %s
+        """, (_COMPLETED, _SKIPPED, time_threshold), max_rows)
         
         # 清理同步日志
-        deleted_logs = self.db.execute("""
+        deleted_logs = self._delete_in_batches("""
             DELETE FROM sync_log 
             WHERE created_at < %s
-        """, (time_threshold,))
+            LIMIT %s
+        """, (time_threshold,), max_rows)
         
         logger.info(f"Cleaned up {deleted_queue} queue records and {deleted_logs} log records")
     
+    def _delete_in_batches(self, sql: str, params: Tuple, max_rows: Optional[int] = None) -> int:
+        """分批执行带 LIMIT 的 DELETE，每批单独提交，批次之间短暂停顿，返回删除总行数"""
+        total = 0
+        while max_rows is None or total < max_rows:
+            limit = CLEANUP_BATCH_SIZE if max_rows is None else min(CLEANUP_BATCH_SIZE, max_rows - total)
+            deleted = self.db.execute(sql, (*params, limit))
+            total += deleted
+            if deleted < limit:
+                break
+            time.sleep(CLEANUP_BATCH_PAUSE)
+        return total
+    
     def get_queue_stats(self) -> Dict[str, Any]:
         """获取队列统计信息"""
+        # 只用到 idx_status_created 中的列，按索引扫描完成分组
         sql = """
             SELECT 
                 status,
                 COUNT(*) as count,
-                MIN(created_at) as oldest,
-                MAX(created_at) as newest
+                MIN(created_at) as oldest
             FROM sync_queue
             GROUP BY status
         """
         
-        results = self.db.query(sql)
+        rows = self.db.query_fast(sql)
+        by_status = {status: count for status, count, _ in rows}
         
-        stats = {
-            'total': 0,
-            'by_status': {},
-            'oldest_pending': None
+        return {
+            'total': sum(by_status.values()),
+            'by_status': by_status,
+            'oldest_pending': next((oldest for status, _, oldest in rows if status == _PENDING), None)
         }
-        
-        for row in results:
-            stats['total'] += row['count']
-            stats['by_status'][row['status']] = row['count']
-            
-            if row['status'] == SyncStatus.PENDING.value and row['oldest']:
-                stats['oldest_pending'] = row['oldest']
-        
-        return stats
     
     def save_id_mapping(self, table_name: str, db_id: str, feishu_id: str) -> None:
         """保存ID映射关系"""
@@ -180,19 +538,124 @@ class QueueProcessor:
             },
             ['table_name', 'db_id']
         )
+        self._cache_id_mapping(table_name, db_id, feishu_id)
+    
+    def save_id_mappings(self, table_name: str, mappings: List[Tuple[str, str]]) -> None:
+        """
+        批量保存ID映射关系
+        
+        Args:
+            table_name: 表名
+            mappings: (数据库ID, 飞书ID) 列表
+        """
+        self.db.batch_upsert(
+            'id_mapping',
+            [
+                {'table_name': table_name, 'db_id': db_id, 'feishu_id': feishu_id}
+                for db_id, feishu_id in mappings
+            ],
+            ['table_name', 'db_id']
+        )
+        for db_id, feishu_id in mappings:
+            self._cache_id_mapping(table_name, db_id, feishu_id)
     
     def get_feishu_id(self, table_name: str, db_id: str) -> Optional[str]:
         """根据数据库ID获取飞书ID"""
-        result = self.db.query_one(
+        feishu_id = self._feishu_id_cache.get((table_name, db_id))
+        if feishu_id is not None:
+            return feishu_id
+        
+        rows = self.db.query_fast(
             "SELECT feishu_id FROM id_mapping WHERE table_name = %s AND db_id = %s",
             (table_name, db_id)
         )
-        return result['feishu_id'] if result else None
+        if not rows:
+            return None
+        
+        feishu_id = rows[0][0]
+        self._cache_id_mapping(table_name, db_id, feishu_id)
+        return feishu_id
     
     def get_db_id(self, table_name: str, feishu_id: str) -> Optional[str]:
         """根据飞书ID获取数据库ID"""
-        result = self.db.query_one(
+        db_id = self._db_id_cache.get((table_name, feishu_id))
+        if db_id is not None:
+            return db_id
+        
+        rows = self.db.query_fast(
             "SELECT db_id FROM id_mapping WHERE table_name = %s AND feishu_id = %s",
             (table_name, feishu_id)
         )
-        return result['db_id'] if result else None
\ No newline at end of file
+        if not rows:
+            return None
+        
+        db_id = rows[0][0]
+        self._cache_id_mapping(table_name, db_id, feishu_id)
+        return db_id
+    
+    def get_feishu_ids(self, table_name: str, db_ids: List[str]) -> Dict[str, str]:
+        """批量根据数据库ID获取飞书ID，返回数据库ID到飞书ID的映射；结果写入缓存"""
+        feishu_ids: Dict[str, str] = {}
+        missing: List[str] = []
+        for db_id in db_ids:
+            feishu_id = self._feishu_id_cache.get((table_name, db_id))
+            if feishu_id is None:
+                missing.append(db_id)
+            else:
+                feishu_ids[db_id] = feishu_id
+        
+        if not missing:
+            return feishu_ids
+        
+        placeholders = ', '.join(['%s'] * len(missing))
+        rows = self.db.query_fast(
+            f"SELECT db_id, feishu_id FROM id_mapping WHERE table_name = %s AND db_id IN ({placeholders})",
+            (table_name, *missing)
+        )
+        for db_id, feishu_id in rows:
+            self._cache_id_mapping(table_name, db_id, feishu_id)
+            feishu_ids[db_id] = feishu_id
+        return feishu_ids
+    
+    def get_db_ids(self, table_name: str, feishu_ids: List[str]) -> Dict[str, str]:
+        """批量根据飞书ID获取数据库ID，返回飞书ID到数据库ID的映射"""
+        db_ids: Dict[str, str] = {}
+        missing: List[str] = []
+        for feishu_id in feishu_ids:
+            db_id = self._db_id_cache.get((table_name, feishu_id))
+            if db_id is None:
+                missing.append(feishu_id)
+            else:
+                db_ids[feishu_id] = db_id
+        
+        if not missing:
+            return db_ids
+        
+        placeholders = ', '.join(['%s'] * len(missing))
+        rows = self.db.query_fast(
+            f"SELECT feishu_id, db_id FROM id_mapping WHERE table_name = %s AND feishu_id IN ({placeholders})",
+            (table_name, *missing)
+        )
+        for feishu_id, db_id in rows:
+            self._cache_id_mapping(table_name, db_id, feishu_id)
+            db_ids[feishu_id] = db_id
+        return db_ids
+    
+    def evict_id_mapping(self, table_name: str, db_id: Optional[str] = None,
+                         feishu_id: Optional[str] = None) -> None:
+        """记录删除后清除对应的ID映射缓存"""
+        if db_id is not None:
+            feishu_id = feishu_id or self._feishu_id_cache.get((table_name, db_id))
+            self._feishu_id_cache.pop((table_name, db_id))
+        if feishu_id is not None:
+            self._db_id_cache.pop((table_name, feishu_id))
+    
+    def _cache_id_mapping(self, table_name: str, db_id: str, feishu_id: str) -> None:
+        """写入双向ID映射缓存"""
+        # 同一数据库ID换了飞书ID时，清除旧的反向映射
+        old_feishu_id = self._feishu_id_cache.get((table_name, db_id))
+        if old_feishu_id is not None and old_feishu_id != feishu_id:
+            self._db_id_cache.pop((table_name, old_feishu_id))
+        
+        self._feishu_id_cache.set((table_name, db_id), feishu_id)
+        self._db_id_cache.set((table_name, feishu_id), db_id)
\ No newline at end of file
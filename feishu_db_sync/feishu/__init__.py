@@ -2,5 +2,6 @@
 
 from .client import FeishuClient
 from .change_detector import ChangeDetector
+from .schema_cache import RedisSchemaCache
 
-__all__ = ["FeishuClient", "ChangeDetector"]
\ No newline at end of file
+__all__ = ["FeishuClient", "ChangeDetector", "RedisSchemaCache"]
\ No newline at end of file
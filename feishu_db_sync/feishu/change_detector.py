@@ -2,26 +2,65 @@
 飞书表格变更检测器
 """
 import json
-from typing import Dict, List, Any, Optional, Set, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Any, Optional, Set, Tuple
 from datetime import datetime
 import redis
 from loguru import logger
 
-from .client import FeishuClient
+from .client import FeishuClient, _digest
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+
+# 并发检测的最大表数，避免触发飞书接口限流
+DETECT_WORKERS = 10
+
+# Redis 中快照的过期时间（秒）
+SNAPSHOT_TTL = 86400
+
+
+def _loads(raw: Any) -> Any:
+    """解析 Redis 中的 JSON 快照（str 或 bytes）"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps(data: Any) -> Any:
+    """序列化快照，orjson 直接输出 UTF-8 字节串"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def _table_digest(record_hashes: Dict[str, str]) -> str:
+    """整表摘要：按记录ID排序的 (记录ID, 记录哈希) 序列的哈希"""
+    return _digest('\n'.join(
+        f"{record_id}:{record_hash}" for record_id, record_hash in sorted(record_hashes.items())
+    ).encode('utf-8'))
 
 
 class ChangeRecord:
     """变更记录"""
     
+    # 每条变更一个实例，使用 __slots__ 省去实例字典
+    __slots__ = ('record_id', 'action', 'old_data', 'new_data', 'timestamp', 'hash')
+    
     def __init__(self, record_id: str, action: str, 
                  old_data: Optional[Dict] = None, 
-                 new_data: Optional[Dict] = None):
+                 new_data: Optional[Dict] = None,
+                 record_hash: Optional[str] = None):
         self.record_id = record_id
         self.action = action  # 'insert', 'update', 'delete'
         self.old_data = old_data
         self.new_data = new_data
         self.timestamp = datetime.now()
-        self.hash = None
+        self.hash = record_hash
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -45,103 +84,172 @@ class ChangeDetector:
         
         # 内存快照缓存（当Redis不可用时使用）
         self.memory_snapshots: Dict[str, Dict[str, Any]] = {}
+        
+        # 内存整表摘要（当Redis不可用时使用），键与快照相同
+        self.memory_digests: Dict[str, str] = {}
+        
+        # 并发检测的线程池，首次批量检测时创建，之后每轮轮询复用
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
     
     def _get_snapshot_key(self, database: str, table: str) -> str:
         """获取快照键名"""
         return f"feishu_snapshot:{database}:{table}"
     
+    def _get_digest_key(self, database: str, table: str) -> str:
+        """获取整表摘要键名"""
+        return f"feishu_digest:{database}:{table}"
+    
+    def _get_digest(self, database: str, table: str) -> Optional[str]:
+        """获取上次保存快照时的整表摘要"""
+        if self.use_redis:
+            digest = self.redis.get(self._get_digest_key(database, table))
+            return digest.decode() if isinstance(digest, bytes) else digest
+        return self.memory_digests.get(self._get_snapshot_key(database, table))
+    
+    def _save_digest(self, database: str, table: str, digest: str) -> None:
+        """保存整表摘要，与快照同时过期"""
+        if self.use_redis:
+            self.redis.set(self._get_digest_key(database, table), digest, ex=SNAPSHOT_TTL)
+        else:
+            self.memory_digests[self._get_snapshot_key(database, table)] = digest
+    
+    def _touch_snapshot(self, database: str, table: str) -> None:
+        """表未变化时只刷新快照和摘要的过期时间"""
+        if self.use_redis:
+            pipe = self.redis.pipeline()
+            pipe.expire(self._get_snapshot_key(database, table), SNAPSHOT_TTL)
+            pipe.expire(self._get_digest_key(database, table), SNAPSHOT_TTL)
+            pipe.execute()
+    
     def _get_snapshot(self, database: str, table: str) -> Dict[str, Dict[str, Any]]:
-        """获取表快照"""
+        """获取表快照，Redis 中每条记录是哈希表的一个字段"""
         key = self._get_snapshot_key(database, table)
         
         if self.use_redis:
-            snapshot_data = self.redis.get(key)
-            if snapshot_data:
-                return json.loads(snapshot_data)
-            return {}
+            try:
+                fields = self.redis.hgetall(key)
+            except redis.ResponseError:
+                # 旧版本把整张表存成一个 JSON 字符串，下次保存时改写为哈希表
+                snapshot_data = self.redis.get(key)
+                return _loads(snapshot_data) if snapshot_data else {}
+            return {
+                record_id.decode() if isinstance(record_id, bytes) else record_id: _loads(entry)
+                for record_id, entry in fields.items()
+            }
         else:
             return self.memory_snapshots.get(key, {})
     
     def _save_snapshot(self, database: str, table: str, 
-                      snapshot: Dict[str, Dict[str, Any]]) -> None:
-        """保存表快照"""
+                      snapshot: Dict[str, Dict[str, Any]],
+                      changed_ids: Optional[Iterable[str]] = None,
+                      deleted_ids: Iterable[str] = ()) -> None:
+        """
+        保存表快照
+        
+        changed_ids 为空时整体重写；否则只写入 changed_ids 对应的记录并删除 deleted_ids，
+        未变化的记录不再重复序列化和传输
+        """
         key = self._get_snapshot_key(database, table)
         
         if self.use_redis:
-            self.redis.set(key, json.dumps(snapshot), ex=86400)  # 24小时过期
+            if changed_ids is not None:
+                try:
+                    self._write_snapshot_fields(key, snapshot, changed_ids, deleted_ids)
+                    return
+                except redis.ResponseError:
+                    # 键仍是旧版本的 JSON 字符串，改为整体重写
+                    pass
+            self._write_snapshot_fields(key, snapshot, snapshot, (), replace=True)
         else:
             self.memory_snapshots[key] = snapshot
     
+    def _write_snapshot_fields(self, key: str, snapshot: Dict[str, Dict[str, Any]],
+                               changed_ids: Iterable[str], deleted_ids: Iterable[str],
+                               replace: bool = False) -> None:
+        """在一个 pipeline 中写入/删除快照字段并刷新过期时间"""
+        mapping = {record_id: _dumps(snapshot[record_id]) for record_id in changed_ids}
+        deleted_ids = list(deleted_ids)
+        
+        pipe = self.redis.pipeline()
+        if replace:
+            pipe.delete(key)
+        if mapping:
+            pipe.hset(key, mapping=mapping)
+        if deleted_ids:
+            pipe.hdel(key, *deleted_ids)
+        pipe.expire(key, SNAPSHOT_TTL)  # 24小时过期
+        pipe.execute()
+    
     def detect_changes(self, database: str, table: str) -> List[ChangeRecord]:
         """检测表格变更"""
         logger.debug(f"Detecting changes for {database}.{table}")
-        changes = []
-        
         try:
-            # 获取当前所有记录
-            current_records = self.feishu.read_all_records(database, table)
+            # 逐页获取当前记录，避免一次性加载整张表
+            current_by_id = {
+                record['id']: record
+                for record in self.feishu.iter_records(database, table)
+                if record.get('id')
+            }
+            
+            # 一次性计算所有记录的哈希
+            calculate_hash = self.feishu.calculate_record_hash
+            current_hashes = {
+                record_id: calculate_hash(record)
+                for record_id, record in current_by_id.items()
+            }
+            
+            # 整表摘要与上次相同时表未变化，跳过快照读取和比对
+            digest = _table_digest(current_hashes)
+            if digest == self._get_digest(database, table):
+                self._touch_snapshot(database, table)
+                logger.debug(f"No changes in {database}.{table}")
+                return []
             
             # 获取上次快照
             last_snapshot = self._get_snapshot(database, table)
             
-            # 构建当前快照
-            current_snapshot = {}
-            current_ids = set()
+            # 新增记录（保持飞书返回的顺序）
+            changes = [
+                ChangeRecord(record_id, 'insert', new_data=record,
+                             record_hash=current_hashes[record_id])
+                for record_id, record in current_by_id.items()
+                if record_id not in last_snapshot
+            ]
             
-            # 检测新增和修改的记录
-            for record in current_records:
-                record_id = record.get('id')
-                if not record_id:
-                    continue
-                
-                current_ids.add(record_id)
-                
-                # 计算记录哈希
-                record_hash = self.feishu.calculate_record_hash(record)
-                current_snapshot[record_id] = {
-                    'data': record,
-                    'hash': record_hash
-                }
-                
-                # 检查是否有变更
-                if record_id not in last_snapshot:
-                    # 新增记录
-                    change = ChangeRecord(
-                        record_id=record_id,
-                        action='insert',
-                        new_data=record
-                    )
-                    change.hash = record_hash
-                    changes.append(change)
-                    logger.debug(f"Detected new record: {record_id}")
-                    
-                elif last_snapshot[record_id]['hash'] != record_hash:
-                    # 修改记录
-                    change = ChangeRecord(
-                        record_id=record_id,
-                        action='update',
-                        old_data=last_snapshot[record_id]['data'],
-                        new_data=record
-                    )
-                    change.hash = record_hash
-                    changes.append(change)
-                    logger.debug(f"Detected updated record: {record_id}")
+            # 两次都存在且哈希不同的记录需要写回快照
+            stale_ids = [
+                record_id for record_id in current_by_id.keys() & last_snapshot.keys()
+                if last_snapshot[record_id]['hash'] != current_hashes[record_id]
+            ]
             
-            # 检测删除的记录
-            last_ids = set(last_snapshot.keys())
-            deleted_ids = last_ids - current_ids
+            # 修改记录（哈希算法或编码变化时哈希不同但数据相同，不算修改）
+            for record_id in stale_ids:
+                last = last_snapshot[record_id]
+                record = current_by_id[record_id]
+                if last['data'] != record:
+                    changes.append(ChangeRecord(record_id, 'update', old_data=last['data'],
+                                                new_data=record,
+                                                record_hash=current_hashes[record_id]))
             
-            for record_id in deleted_ids:
-                change = ChangeRecord(
-                    record_id=record_id,
-                    action='delete',
-                    old_data=last_snapshot[record_id]['data']
-                )
-                changes.append(change)
-                logger.debug(f"Detected deleted record: {record_id}")
+            # 删除记录
+            deleted_ids = last_snapshot.keys() - current_by_id.keys()
+            changes.extend(
+                ChangeRecord(record_id, 'delete', old_data=last_snapshot[record_id]['data'])
+                for record_id in deleted_ids
+            )
             
-            # 保存新快照
-            self._save_snapshot(database, table, current_snapshot)
+            # 构建当前快照
+            current_snapshot = {
+                record_id: {'data': record, 'hash': current_hashes[record_id]}
+                for record_id, record in current_by_id.items()
+            }
+            
+            # 保存新快照，Redis 中只写入新增和哈希变化的记录
+            changed_ids = [c.record_id for c in changes if c.action == 'insert']
+            changed_ids.extend(stale_ids)
+            self._save_snapshot(database, table, current_snapshot, changed_ids, deleted_ids)
+            self._save_digest(database, table, digest)
             
             logger.info(f"Detected {len(changes)} changes in {database}.{table}")
             return changes
@@ -155,9 +263,10 @@ class ChangeDetector:
         key = self._get_snapshot_key(database, table)
         
         if self.use_redis:
-            self.redis.delete(key)
+            self.redis.delete(key, self._get_digest_key(database, table))
         else:
             self.memory_snapshots.pop(key, None)
+            self.memory_digests.pop(key, None)
         
         logger.info(f"Reset snapshot for {database}.{table}")
     
@@ -173,16 +282,36 @@ class ChangeDetector:
         }
     
     def batch_detect_changes(self, table_mapping: Dict[str, str]) -> Dict[str, List[ChangeRecord]]:
-        """批量检测多个表的变更"""
-        all_changes = {}
+        """批量检测多个表的变更，各表的网络请求并发执行"""
+        tables = list(table_mapping)
+        if len(tables) <= 1:
+            return {feishu_table: self._detect_table(feishu_table) for feishu_table in tables}
         
-        for feishu_table, db_table in table_mapping.items():
-            try:
-                database, table = feishu_table.split(':')
-                changes = self.detect_changes(database, table)
-                all_changes[feishu_table] = changes
-            except Exception as e:
-                logger.error(f"Error detecting changes for {feishu_table}: {e}")
-                all_changes[feishu_table] = []
-        
-        return all_changes
\ No newline at end of file
+        results = self._get_executor().map(self._detect_table, tables)
+        return dict(zip(tables, results))
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取并发检测的线程池，避免每轮轮询都创建和销毁线程"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=DETECT_WORKERS, thread_name_prefix='change-detector'
+                    )
+        return self._executor
+    
+    def close(self) -> None:
+        """关闭并发检测的线程池"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def _detect_table(self, feishu_table: str) -> List[ChangeRecord]:
+        """检测单个表的变更，失败时返回空列表"""
+        try:
+            database, table = feishu_table.split(':')
+            return self.detect_changes(database, table)
+        except Exception as e:
+            logger.error(f"Error detecting changes for {feishu_table}: {e}")
+            return []
\ No newline at end of file
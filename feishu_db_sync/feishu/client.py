@@ -2,23 +2,57 @@
 飞书客户端封装
 """
 import time
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterator, List, Any, Optional
 from datetime import datetime, timedelta
 import hashlib
 import json
 
 from feishu_bitable_db import DBImpl
+from feishu_bitable_db.db.field import FIELD_CACHE_TTL
+from feishu_bitable_db.db.record import BATCH_SIZE
 from feishu_bitable_db.db.types import Table, Field, FieldType, SearchCmd
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:  # 未安装 xxhash 时回退到 hashlib.md5
+    xxhash = None
+
+
+# 计算记录哈希时默认排除的字段
+_HASH_EXCLUDE = frozenset({'id', 'created_at', 'updated_at', '_sync_source'})
+
+
+def _canonical_bytes(record: Dict[str, Any]) -> bytes:
+    """按键排序的紧凑 JSON 字节串，作为记录哈希的规范编码"""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(record, sort_keys=True, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def _digest(data: bytes) -> str:
+    """计算规范编码的摘要"""
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.md5(data).hexdigest()
+
 
 class FeishuClient:
     """飞书客户端封装"""
     
-    def __init__(self, app_id: str, app_secret: str):
+    def __init__(self, app_id: str, app_secret: str, cache_ttl: float = FIELD_CACHE_TTL,
+                 batch_size: int = BATCH_SIZE, schema_cache: Optional[Any] = None):
         self.app_id = app_id
         self.app_secret = app_secret
-        self.db_client = DBImpl(app_id, app_secret)
+        self.batch_size = max(1, min(batch_size, BATCH_SIZE))
+        # 同步服务独占进程，启用 SDK 的 HTTP 连接复用
+        self.db_client = DBImpl(app_id, app_secret, cache_ttl, schema_cache, keep_alive=True)
         self._token_cache = {}
         self._token_expire_time = None
     
@@ -54,63 +88,58 @@ class FeishuClient:
         """创建记录"""
         try:
             record_id = self.db_client.create(database, table, record)
-            logger.debug(f"Created record in {database}.{table}: {record_id}")
+            logger.debug("Created record in {}.{}: {}", database, table, record_id)
             return record_id
         except Exception as e:
             logger.error(f"Failed to create record: {e}")
             raise
     
     def batch_create_records(self, database: str, table: str, records: List[Dict[str, Any]]) -> List[str]:
-        """批量创建记录"""
+        """批量创建记录，失败的记录对应位置为 None"""
+        def create_chunk(chunk: List[Dict[str, Any]]) -> List[str]:
+            record_ids = self.db_client.batch_create(database, table, chunk)
+            logger.debug(f"Created {len(chunk)} records in {database}.{table}")
+            return record_ids
+        
         record_ids = []
-        for record in records:
-            try:
-                record_id = self.create_record(database, table, record)
-                record_ids.append(record_id)
-            except Exception as e:
-                logger.error(f"Failed to create record: {e}")
-                record_ids.append(None)
+        for chunk in self._chunks(records):
+            record_ids.extend(self._bisect_batch(
+                chunk, create_chunk, lambda record: self.create_record(database, table, record)
+            ))
         return record_ids
     
     def read_records(self, database: str, table: str, 
-                    search_cmds: Optional[List[SearchCmd]] = None) -> List[Dict[str, Any]]:
+                    search_cmds: Optional[List[SearchCmd]] = None,
+                    use_cache: bool = True) -> List[Dict[str, Any]]:
         """读取记录"""
         try:
             search_cmds = search_cmds or []
-            records = self.db_client.read(database, table, search_cmds)
+            records = self.db_client.read(database, table, search_cmds, use_cache)
             logger.debug(f"Read {len(records)} records from {database}.{table}")
             return records
         except Exception as e:
             logger.error(f"Failed to read records: {e}")
             raise
     
-    def read_all_records(self, database: str, table: str) -> List[Dict[str, Any]]:
-        """读取所有记录（分页处理）"""
-        all_records = []
-        page_size = 500  # 飞书API单次最大返回数
-        
+    def iter_records(self, database: str, table: str,
+                     search_cmds: Optional[List[SearchCmd]] = None) -> Iterator[Dict[str, Any]]:
+        """逐页读取记录，内存中最多只保留一页数据（不使用查询缓存）"""
         try:
-            # 第一次查询
-            records = self.read_records(database, table)
-            all_records.extend(records)
-            
-            # 如果记录数等于页大小，可能还有更多记录
-            while len(records) == page_size:
-                # TODO: 实现基于游标的分页查询
-                # 目前飞书 API 可能不支持游标分页，需要根据实际 API 调整
-                break
-            
-            return all_records
+            yield from self.db_client.iter_read(database, table, search_cmds or [])
         except Exception as e:
-            logger.error(f"Failed to read all records: {e}")
+            logger.error(f"Failed to iterate records: {e}")
             raise
     
+    def read_all_records(self, database: str, table: str) -> List[Dict[str, Any]]:
+        """读取所有记录（分页处理）"""
+        return list(self.iter_records(database, table))
+    
     def update_record(self, database: str, table: str, 
                      record_id: str, record: Dict[str, Any]) -> None:
         """更新记录"""
         try:
             self.db_client.update(database, table, record_id, record)
-            logger.debug(f"Updated record {record_id} in {database}.{table}")
+            logger.debug("Updated record {} in {}.{}", record_id, database, table)
         except Exception as e:
             logger.error(f"Failed to update record {record_id}: {e}")
             raise
@@ -118,17 +147,25 @@ class FeishuClient:
     def batch_update_records(self, database: str, table: str, 
                            updates: List[Dict[str, Any]]) -> None:
         """批量更新记录"""
-        for update in updates:
-            try:
-                self.update_record(database, table, update['id'], update['fields'])
-            except Exception as e:
-                logger.error(f"Failed to update record {update['id']}: {e}")
+        def update_chunk(chunk: List[Dict[str, Any]]) -> List[bool]:
+            self.db_client.batch_update(
+                database, table, {update['id']: update['fields'] for update in chunk}
+            )
+            logger.debug(f"Updated {len(chunk)} records in {database}.{table}")
+            return [True] * len(chunk)
+        
+        def update_one(update: Dict[str, Any]) -> bool:
+            self.update_record(database, table, update['id'], update['fields'])
+            return True
+        
+        for chunk in self._chunks(updates):
+            self._bisect_batch(chunk, update_chunk, update_one)
     
     def delete_record(self, database: str, table: str, record_id: str) -> None:
         """删除记录"""
         try:
             self.db_client.delete(database, table, record_id)
-            logger.debug(f"Deleted record {record_id} from {database}.{table}")
+            logger.debug("Deleted record {} from {}.{}", record_id, database, table)
         except Exception as e:
             logger.error(f"Failed to delete record {record_id}: {e}")
             raise
@@ -136,11 +173,49 @@ class FeishuClient:
     def batch_delete_records(self, database: str, table: str, 
                            record_ids: List[str]) -> None:
         """批量删除记录"""
-        for record_id in record_ids:
+        def delete_chunk(chunk: List[str]) -> List[bool]:
+            self.db_client.batch_delete(database, table, chunk)
+            logger.debug(f"Deleted {len(chunk)} records from {database}.{table}")
+            return [True] * len(chunk)
+        
+        def delete_one(record_id: str) -> bool:
+            self.delete_record(database, table, record_id)
+            return True
+        
+        for chunk in self._chunks(record_ids):
+            self._bisect_batch(chunk, delete_chunk, delete_one)
+    
+    def _chunks(self, items: List[Any]) -> List[List[Any]]:
+        """按 batch_size 分批"""
+        return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+    
+    def _bisect_batch(self, items: List[Any],
+                      batch_call: Callable[[List[Any]], List[Any]],
+                      single_call: Callable[[Any], Any]) -> List[Any]:
+        """
+        执行批量写入，失败时对半拆分重试，直到定位出具体失败的记录
+        
+        少数坏记录只需 O(k·log n) 次请求即可隔离，不必逐条重试整批；
+        同一张表的写入仍然串行，飞书多维表格不支持对同一张表并发写入。
+        
+        Returns:
+            与 items 顺序一致的结果，失败的记录对应位置为 None
+        """
+        if len(items) == 1:
             try:
-                self.delete_record(database, table, record_id)
-            except Exception as e:
-                logger.error(f"Failed to delete record {record_id}: {e}")
+                return [single_call(items[0])]
+            except Exception:
+                # 单条接口已记录错误
+                return [None]
+        
+        try:
+            return batch_call(items)
+        except Exception as e:
+            logger.warning(f"Batch write of {len(items)} records failed, splitting: {e}")
+        
+        middle = len(items) // 2
+        return (self._bisect_batch(items[:middle], batch_call, single_call)
+                + self._bisect_batch(items[middle:], batch_call, single_call))
     
     def get_table_fields(self, database: str, table: str) -> List[Field]:
         """获取表字段信息"""
@@ -149,15 +224,16 @@ class FeishuClient:
         pass
     
     def search_records(self, database: str, table: str, 
-                      field: str, operator: str, value: Any) -> List[Dict[str, Any]]:
-        """搜索记录"""
+                      field: str, operator: str, value: Any,
+                      use_cache: bool = True) -> List[Dict[str, Any]]:
+        """搜索记录，写入前查找目标记录时应传 use_cache=False"""
         search_cmd = SearchCmd(key=field, operator=operator, val=value)
-        return self.read_records(database, table, [search_cmd])
+        return self.read_records(database, table, [search_cmd], use_cache)
     
     def calculate_record_hash(self, record: Dict[str, Any], 
                             exclude_fields: Optional[List[str]] = None) -> str:
         """计算记录哈希值"""
-        exclude_fields = exclude_fields or ['id', 'created_at', 'updated_at', '_sync_source']
+        exclude_fields = frozenset(exclude_fields) if exclude_fields else _HASH_EXCLUDE
         
         # 创建记录副本并移除排除字段
         clean_record = {
@@ -165,11 +241,8 @@ class FeishuClient:
             if k not in exclude_fields
         }
         
-        # 对字典进行排序并序列化
-        record_str = json.dumps(clean_record, sort_keys=True, ensure_ascii=False)
-        
-        # 计算哈希
-        return hashlib.md5(record_str.encode('utf-8')).hexdigest()
+        # 序列化为规范编码后计算哈希
+        return _digest(_canonical_bytes(clean_record))
     
     def test_connection(self) -> bool:
         """测试连接"""
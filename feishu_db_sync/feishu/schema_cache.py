@@ -0,0 +1,37 @@
+"""
+多进程共享的飞书表结构缓存
+"""
+from typing import Optional
+
+import redis
+from loguru import logger
+
+
+class RedisSchemaCache:
+    """基于 Redis 的字段列表缓存，供多个同步进程共享"""
+    
+    def __init__(self, redis_client: redis.Redis, prefix: str = "feishu:schema:"):
+        self.redis = redis_client
+        self.prefix = prefix
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，Redis 不可用时视为未命中"""
+        try:
+            return self.redis.get(self.prefix + key)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to read schema cache {key}: {e}")
+            return None
+    
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """写入缓存"""
+        try:
+            self.redis.set(self.prefix + key, value, ex=max(1, int(ttl)))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to write schema cache {key}: {e}")
+    
+    def pop(self, key: str) -> None:
+        """删除缓存，所有进程下次读取时重新拉取"""
+        try:
+            self.redis.delete(self.prefix + key)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to invalidate schema cache {key}: {e}")
\ No newline at end of file
@@ -9,7 +9,13 @@ from ..config.config import MonitorConfig
 
 
 def setup_logger(config: MonitorConfig) -> None:
-    """配置日志"""
+    """
+    配置日志
+    
+    所有输出都设置 enqueue=True，由后台线程写入，日志调用不再阻塞在
+    控制台/文件 I/O 和轮转压缩上；文件输出关闭 diagnose/backtrace，
+    记录异常时不再遍历调用栈中的局部变量。
+    """
     # 移除默认的日志处理器
     logger.remove()
     
@@ -18,7 +24,8 @@ def setup_logger(config: MonitorConfig) -> None:
         sys.stdout,
         level=config.log_level,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        colorize=True
+        colorize=True,
+        enqueue=True
     )
     
     # 添加文件输出
@@ -30,7 +37,10 @@ def setup_logger(config: MonitorConfig) -> None:
             rotation=config.log_max_size,
             retention=config.log_backup_count,
             compression="zip",
-            encoding="utf-8"
+            encoding="utf-8",
+            enqueue=True,
+            backtrace=False,
+            diagnose=False
         )
     
     # 添加错误日志文件
@@ -42,7 +52,10 @@ def setup_logger(config: MonitorConfig) -> None:
         rotation=config.log_max_size,
         retention=config.log_backup_count * 2,  # 错误日志保留更长时间
         compression="zip",
-        encoding="utf-8"
+        encoding="utf-8",
+        enqueue=True,
+        backtrace=False,
+        diagnose=False
     )
     
     logger.info(f"Logger initialized with level: {config.log_level}")
\ No newline at end of file
@@ -3,32 +3,127 @@
 """
 import time
 import json
+import queue
+import itertools
 import threading
-from typing import Dict, Any, Optional
+from array import array
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
 from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from collections import deque
 from loguru import logger
 import requests
+from requests.adapters import HTTPAdapter
 
 from ..config.config import MonitorConfig
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+
+# 常用的 (方向, 状态) 计数在每个线程自己的列表中按下标累加
+_COUNTER_KEYS = tuple(
+    (direction, status)
+    for direction in ('feishu_to_db', 'db_to_feishu')
+    for status in ('success', 'failed', 'total')
+)
+_COUNTER_INDEX = {key: idx for idx, key in enumerate(_COUNTER_KEYS)}
+
+# 热点路径一次字典查找得到全部下标：(方向, 状态) -> (状态下标, total 下标)，
+# 方向 -> (success 下标, failed 下标, total 下标)
+_RECORD_SLOTS = {
+    (direction, status): (idx, _COUNTER_INDEX[(direction, 'total')])
+    for (direction, status), idx in _COUNTER_INDEX.items()
+}
+_BULK_SLOTS = {
+    direction: tuple(_COUNTER_INDEX[(direction, status)] for status in ('success', 'failed', 'total'))
+    for direction, _ in _COUNTER_KEYS
+}
+
+# 保留的同步耗时样本数，以及计算平均耗时使用的最近样本数
+DURATION_SAMPLES = 1000
+DURATION_AVERAGE_WINDOW = 100
+
+# get_metrics 快照的默认有效期（秒）
+METRICS_SNAPSHOT_TTL = 1.0
+
+class ErrorRecord(NamedTuple):
+    """错误记录，时间戳为秒数"""
+    type: str
+    message: str
+    timestamp: float
+
+
+def _to_json(data: Any) -> str:
+    """序列化为缩进的 JSON 文本，无法序列化的值转为字符串"""
+    if orjson is not None:
+        return orjson.dumps(
+            data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
+    return json.dumps(data, ensure_ascii=False, indent=2, default=str)
+
+
+# Prometheus 导出中各指标的 HELP/TYPE 行
+_PROM_UPTIME_HEADER = (
+    '# HELP sync_uptime_seconds Sync service uptime in seconds\n'
+    '# TYPE sync_uptime_seconds gauge'
+)
+_PROM_SYNC_TOTAL_HEADER = (
+    '# HELP sync_total Sync operations by direction and status\n'
+    '# TYPE sync_total counter'
+)
+_PROM_SUCCESS_RATE_HEADER = (
+    '# HELP sync_success_rate Sync success rate in percent\n'
+    '# TYPE sync_success_rate gauge'
+)
+_PROM_QUEUE_SIZE_HEADER = (
+    '# HELP queue_size_total Sync queue size\n'
+    '# TYPE queue_size_total gauge'
+)
+
+# 等待后台线程发送的告警数上限
+ALERT_QUEUE_SIZE = 64
+
+# 计算平均耗时的方向及其编号，其他方向记为 _OTHER_DIRECTION_ID
+_DURATION_DIRECTIONS = ('feishu_to_db', 'db_to_feishu')
+_DURATION_DIRECTION_IDS = {direction: idx for idx, direction in enumerate(_DURATION_DIRECTIONS)}
+_OTHER_DIRECTION_ID = 255
+
 
 class MetricsCollector:
     """监控指标收集器"""
     
-    def __init__(self, config: MonitorConfig):
+    def __init__(self, config: MonitorConfig, snapshot_ttl: float = METRICS_SNAPSHOT_TTL):
         self.config = config
         self._lock = threading.Lock()
         
-        # 同步计数器
-        self.sync_counters = defaultdict(lambda: defaultdict(int))
+        # get_metrics 的快照缓存，告警检查和面板频繁读取时不必每次重新汇总
+        self.snapshot_ttl = snapshot_ttl
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_at = 0.0
+        
+        # 同步计数器：每个线程只写自己的计数列表，无需加锁，读取指标时再合并；
+        # 不在 _COUNTER_KEYS 中的计数加锁写入 _other_counters
+        self._thread_counters: List[List[int]] = []
+        self._local = threading.local()
+        self._other_counters: Dict[Tuple[str, str], int] = {}
+        
+        # 错误记录（ErrorRecord）
+        self.errors: "deque[ErrorRecord]" = deque(maxlen=1000)
         
-        # 错误记录
-        self.errors = deque(maxlen=1000)
+        # 同步耗时样本：三个定长数组组成的环形缓冲区，写入时不创建对象
+        self._durations = array('d', bytes(8 * DURATION_SAMPLES))
+        self._duration_directions = array('B', bytes(DURATION_SAMPLES))
+        self._duration_timestamps = array('d', bytes(8 * DURATION_SAMPLES))
+        self._duration_count = 0
+        
+        # 最近 DURATION_AVERAGE_WINDOW 个样本中各方向的耗时之和与样本数，写入时增量维护
+        self._window_sums = [0.0] * len(_DURATION_DIRECTIONS)
+        self._window_counts = [0] * len(_DURATION_DIRECTIONS)
         
         # 性能指标
         self.performance_metrics = {
-            'sync_duration': deque(maxlen=1000),
             'queue_size': deque(maxlen=100),
             'memory_usage': deque(maxlen=100)
         }
@@ -39,101 +134,224 @@ class MetricsCollector:
         # 同步统计
         self.sync_stats = {}
         
-        # 启动时间
+        # 启动时间；运行时间按单调时钟计算，不受系统时间调整影响
         self.start_time = datetime.now()
+        self._start_monotonic = time.monotonic()
+        
+        # 告警 webhook 复用同一个会话的连接，避免每条告警重新握手
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=1)
+        self._http.mount('https://', adapter)
+        self._http.mount('http://', adapter)
+        
+        # 告警格式按 webhook 地址确定一次（飞书机器人或通用 webhook）
+        if 'open.feishu.cn' in (self.config.alert_webhook or ''):
+            self._build_alert_payload = self._feishu_alert_payload
+        else:
+            self._build_alert_payload = self._generic_alert_payload
+        
+        # 待发送的告警，由后台线程发送；队列满时丢弃的告警数
+        self._alert_queue: "queue.Queue[Optional[Tuple[str, str, Optional[Dict], float]]]" = (
+            queue.Queue(maxsize=ALERT_QUEUE_SIZE)
+        )
+        self._alert_thread: Optional[threading.Thread] = None
+        self.alerts_dropped = 0
+    
+    def _counters(self) -> List[int]:
+        """当前线程的计数列表，线程首次记录时创建并登记"""
+        try:
+            return self._local.counters
+        except AttributeError:
+            counters = self._local.counters = [0] * len(_COUNTER_KEYS)
+            with self._lock:
+                self._thread_counters.append(counters)
+            return counters
+    
+    @property
+    def sync_counters(self) -> Dict[str, Dict[str, int]]:
+        """合并所有线程的同步计数器，按方向分组，只包含非零计数"""
+        with self._lock:
+            thread_counters = list(self._thread_counters)
+            totals = dict(self._other_counters)
+        
+        for key, count in zip(_COUNTER_KEYS, map(sum, zip(*thread_counters))):
+            if count:
+                totals[key] = totals.get(key, 0) + count
+        
+        grouped: Dict[str, Dict[str, int]] = {}
+        for (direction, status), count in totals.items():
+            grouped.setdefault(direction, {})[status] = count
+        return grouped
     
     def record_sync(self, direction: str, status: str) -> None:
         """记录同步操作"""
+        slots = _RECORD_SLOTS.get((direction, status))
+        if slots is None:
+            self._add_other_counts(direction, ((status, 1), ('total', 1)))
+            return
+        
+        idx, total_idx = slots
+        counters = self._counters()
+        counters[idx] += 1
+        counters[total_idx] += 1
+    
+    def record_sync_bulk(self, direction: str, success_count: int, failed_count: int) -> None:
+        """批量记录同步操作"""
+        slots = _BULK_SLOTS.get(direction)
+        if slots is None:
+            self._add_other_counts(direction, (('success', success_count),
+                                               ('failed', failed_count),
+                                               ('total', success_count + failed_count)))
+            return
+        
+        success_idx, failed_idx, total_idx = slots
+        counters = self._counters()
+        counters[success_idx] += success_count
+        counters[failed_idx] += failed_count
+        counters[total_idx] += success_count + failed_count
+    
+    def _add_other_counts(self, direction: str, status_counts: Iterable[Tuple[str, int]]) -> None:
+        """加锁累加不在 _COUNTER_KEYS 中的计数，键为 (方向, 状态)"""
+        other_counters = self._other_counters
         with self._lock:
-            self.sync_counters[direction][status] += 1
-            self.sync_counters[direction]['total'] += 1
+            for status, count in status_counts:
+                key = (direction, status)
+                other_counters[key] = other_counters.get(key, 0) + count
     
     def record_sync_duration(self, direction: str, duration_seconds: float) -> None:
         """记录同步耗时"""
+        direction_id = _DURATION_DIRECTION_IDS.get(direction, _OTHER_DIRECTION_ID)
         with self._lock:
-            self.performance_metrics['sync_duration'].append({
-                'direction': direction,
-                'duration': duration_seconds,
-                'timestamp': datetime.now()
-            })
+            # 移出平均窗口的样本从对应方向的累计值中减去
+            expired = self._duration_count - DURATION_AVERAGE_WINDOW
+            if expired >= 0:
+                self._window_remove(expired % DURATION_SAMPLES)
+            
+            idx = self._duration_count % DURATION_SAMPLES
+            self._durations[idx] = duration_seconds
+            self._duration_directions[idx] = direction_id
+            self._duration_timestamps[idx] = time.time()
+            self._duration_count += 1
+            
+            if direction_id != _OTHER_DIRECTION_ID:
+                self._window_sums[direction_id] += duration_seconds
+                self._window_counts[direction_id] += 1
+    
+    def _window_remove(self, idx: int) -> None:
+        """把缓冲区 idx 处的样本移出平均窗口，调用方需持有 self._lock"""
+        direction_id = self._duration_directions[idx]
+        if direction_id == _OTHER_DIRECTION_ID:
+            return
+        self._window_counts[direction_id] -= 1
+        if self._window_counts[direction_id]:
+            self._window_sums[direction_id] -= self._durations[idx]
+        else:
+            # 窗口中已没有该方向的样本，归零以消除浮点累计误差
+            self._window_sums[direction_id] = 0.0
     
     def record_error(self, error_type: str, error_message: str) -> None:
-        """记录错误"""
+        """记录错误，时间戳存为秒数，读取指标时再格式化"""
         with self._lock:
-            self.errors.append({
-                'type': error_type,
-                'message': error_message,
-                'timestamp': datetime.now()
-            })
+            self.errors.append(ErrorRecord(error_type, error_message, time.time()))
     
     def update_queue_stats(self, stats: Dict[str, Any]) -> None:
-        """更新队列统计"""
-        with self._lock:
-            self.queue_stats = stats
-            self.performance_metrics['queue_size'].append({
-                'size': stats.get('total', 0),
-                'timestamp': datetime.now()
-            })
+        """更新队列统计（整体替换引用，deque.append 本身是原子的，不需要加锁）"""
+        self.queue_stats = stats
+        self.performance_metrics['queue_size'].append({
+            'size': stats.get('total', 0),
+            'timestamp': time.time()
+        })
     
     def update_sync_stats(self, stats: Dict[str, Any]) -> None:
-        """更新同步统计"""
-        with self._lock:
-            self.sync_stats = stats
+        """更新同步统计（整体替换引用，不需要加锁）"""
+        self.sync_stats = stats
     
     def get_metrics(self) -> Dict[str, Any]:
-        """获取所有指标"""
+        """获取所有指标，snapshot_ttl 秒内重复调用返回同一份快照"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._snapshot_at < self.snapshot_ttl:
+            return snapshot
+        
+        snapshot = self._build_metrics()
+        self._snapshot, self._snapshot_at = snapshot, time.monotonic()
+        return snapshot
+    
+    def get_metrics_raw(self) -> Dict[str, Any]:
+        """获取原始指标（运行时间、计数器和统计数据），不计算成功率、平均耗时等派生指标"""
+        # 合并各线程的计数器（内部会短暂持有 self._lock）
+        sync_counters = self.sync_counters
+        
+        # 统计数据由更新方整体替换，直接读取引用即可
+        return {
+            'uptime_seconds': time.monotonic() - self._start_monotonic,
+            'sync_counters': {direction: dict(counters) for direction, counters in sync_counters.items()},
+            'queue_stats': self.queue_stats,
+            'sync_stats': self.sync_stats,
+            'alerts_dropped': self.alerts_dropped
+        }
+    
+    @staticmethod
+    def _success_rates(sync_counters: Dict[str, Dict[str, int]]) -> Dict[str, float]:
+        """计算各方向的成功率（百分比）"""
+        success_rates = {}
+        for direction, counters in sync_counters.items():
+            total = counters.get('total', 0)
+            success = counters.get('success', 0)
+            if total > 0:
+                success_rates[direction] = round(success / total * 100, 2)
+            else:
+                success_rates[direction] = 0
+        return success_rates
+    
+    def _build_metrics(self) -> Dict[str, Any]:
+        """生成指标快照，加锁时只复制数据，计算在锁外进行"""
+        raw = self.get_metrics_raw()
+        
         with self._lock:
-            # 计算运行时间
-            uptime = (datetime.now() - self.start_time).total_seconds()
-            
-            # 计算成功率
-            success_rates = {}
-            for direction, counters in self.sync_counters.items():
-                total = counters.get('total', 0)
-                success = counters.get('success', 0)
-                if total > 0:
-                    success_rates[direction] = round(success / total * 100, 2)
-                else:
-                    success_rates[direction] = 0
-            
-            # 计算平均同步耗时
-            avg_durations = {}
-            recent_durations = list(self.performance_metrics['sync_duration'])[-100:]
-            if recent_durations:
-                for direction in ['feishu_to_db', 'db_to_feishu']:
-                    dir_durations = [
-                        d['duration'] for d in recent_durations 
-                        if d['direction'] == direction
-                    ]
-                    if dir_durations:
-                        avg_durations[direction] = round(
-                            sum(dir_durations) / len(dir_durations), 3
-                        )
-            
-            # 获取最近的错误
-            recent_errors = list(self.errors)[-10:]
-            
-            return {
-                'uptime_seconds': uptime,
-                'sync_counters': dict(self.sync_counters),
-                'success_rates': success_rates,
-                'average_sync_duration': avg_durations,
-                'queue_stats': self.queue_stats,
-                'sync_stats': self.sync_stats,
-                'recent_errors': recent_errors,
-                'timestamp': datetime.now().isoformat()
+            window = list(zip(self._window_sums, self._window_counts))
+            # 从尾部取最近 10 条，不复制整个 deque
+            errors = list(itertools.islice(reversed(self.errors), 10))[::-1]
+        
+        # 计算平均同步耗时
+        avg_durations = {
+            direction: round(total / count, 3)
+            for direction, (total, count) in zip(_DURATION_DIRECTIONS, window)
+            if count
+        }
+        
+        # 获取最近的错误
+        recent_errors = [
+            {
+                'type': error.type,
+                'message': error.message,
+                'timestamp': datetime.fromtimestamp(error.timestamp).isoformat()
             }
+            for error in errors
+        ]
+        
+        return {
+            'uptime_seconds': raw['uptime_seconds'],
+            'sync_counters': raw['sync_counters'],
+            'success_rates': self._success_rates(raw['sync_counters']),
+            'average_sync_duration': avg_durations,
+            'queue_stats': raw['queue_stats'],
+            'sync_stats': raw['sync_stats'],
+            'recent_errors': recent_errors,
+            'alerts_dropped': raw['alerts_dropped'],
+            'timestamp': datetime.now().isoformat()
+        }
     
     def get_health_status(self) -> Dict[str, Any]:
-        """获取健康状态"""
-        metrics = self.get_metrics()
+        """获取健康状态，只使用原始指标和成功率"""
+        metrics = self.get_metrics_raw()
+        success_rates = self._success_rates(metrics['sync_counters'])
         
         # 判断健康状态
         health_status = "healthy"
         issues = []
         
         # 检查成功率
-        for direction, rate in metrics['success_rates'].items():
+        for direction, rate in success_rates.items():
             if rate < 90:
                 health_status = "degraded"
                 issues.append(f"Low success rate for {direction}: {rate}%")
@@ -149,7 +367,7 @@ class MetricsCollector:
             issues.append(f"Moderate queue backlog: {queue_pending} pending items")
         
         # 检查错误率
-        recent_errors = len(list(self.errors)[-100:])
+        recent_errors = min(len(self.errors), 100)
         if recent_errors > 50:
             health_status = "unhealthy"
             issues.append(f"High error rate: {recent_errors} errors in recent 100 operations")
@@ -159,7 +377,7 @@ class MetricsCollector:
             'issues': issues,
             'metrics_summary': {
                 'uptime_hours': round(metrics['uptime_seconds'] / 3600, 2),
-                'success_rates': metrics['success_rates'],
+                'success_rates': success_rates,
                 'queue_pending': queue_pending,
                 'recent_errors': recent_errors
             }
@@ -170,29 +388,39 @@ class MetricsCollector:
         if not self.config.alert_webhook:
             return
         
-        alert_data = {
-            'type': alert_type,
-            'message': message,
-            'details': details or {},
-            'timestamp': datetime.now().isoformat(),
-            'service': 'feishu_db_sync'
-        }
-        
+        # 交给后台线程发送，调用方不等待网络请求；队列满时丢弃
+        self._ensure_alert_thread()
         try:
-            # 发送到 webhook（假设是飞书机器人）
-            if 'open.feishu.cn' in self.config.alert_webhook:
-                # 飞书机器人格式
-                payload = {
-                    "msg_type": "text",
-                    "content": {
-                        "text": f"【{alert_type}】{message}\n{json.dumps(details, ensure_ascii=False, indent=2)}"
-                    }
-                }
-            else:
-                # 通用 webhook 格式
-                payload = alert_data
-            
-            response = requests.post(
+            self._alert_queue.put_nowait((alert_type, message, details, time.time()))
+        except queue.Full:
+            with self._lock:
+                self.alerts_dropped += 1
+            logger.warning(f"Alert queue full, dropped alert {alert_type}: {message}")
+    
+    def _ensure_alert_thread(self) -> None:
+        """首次发送告警时启动后台发送线程"""
+        if self._alert_thread is None:
+            with self._lock:
+                if self._alert_thread is None:
+                    self._alert_thread = threading.Thread(
+                        target=self._alert_loop, name='metrics-alert', daemon=True
+                    )
+                    self._alert_thread.start()
+    
+    def _alert_loop(self) -> None:
+        """后台线程：逐条发送队列中的告警，收到 None 时退出"""
+        while True:
+            alert = self._alert_queue.get()
+            if alert is None:
+                return
+            self._post_alert(*alert)
+    
+    def _post_alert(self, alert_type: str, message: str,
+                    details: Optional[Dict], timestamp: float) -> None:
+        """向 webhook 发送一条告警"""
+        try:
+            payload = self._build_alert_payload(alert_type, message, details, timestamp)
+            response = self._http.post(
                 self.config.alert_webhook,
                 json=payload,
                 timeout=5
@@ -204,6 +432,38 @@ class MetricsCollector:
         except Exception as e:
             logger.error(f"Error sending alert: {e}")
     
+    @staticmethod
+    def _feishu_alert_payload(alert_type: str, message: str,
+                              details: Optional[Dict], timestamp: float) -> Dict[str, Any]:
+        """飞书机器人格式"""
+        return {
+            "msg_type": "text",
+            "content": {
+                "text": f"【{alert_type}】{message}\n{_to_json(details)}"
+            }
+        }
+    
+    @staticmethod
+    def _generic_alert_payload(alert_type: str, message: str,
+                               details: Optional[Dict], timestamp: float) -> Dict[str, Any]:
+        """通用 webhook 格式"""
+        return {
+            'type': alert_type,
+            'message': message,
+            'details': details or {},
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'service': 'feishu_db_sync'
+        }
+    
+    def close(self) -> None:
+        """发送完已排队的告警后关闭 webhook 连接"""
+        with self._lock:
+            alert_thread, self._alert_thread = self._alert_thread, None
+        if alert_thread is not None:
+            self._alert_queue.put(None)
+            alert_thread.join(timeout=10)
+        self._http.close()
+    
     def check_and_alert(self) -> None:
         """检查指标并发送告警"""
         health = self.get_health_status()
@@ -226,29 +486,25 @@ class MetricsCollector:
         metrics = self.get_metrics()
         
         if format == 'json':
-            return json.dumps(metrics, ensure_ascii=False, indent=2, default=str)
+            return _to_json(metrics)
         elif format == 'prometheus':
-            # Prometheus 格式
-            lines = []
-            
-            # 运行时间
-            lines.append(f'# HELP sync_uptime_seconds Sync service uptime in seconds')
-            lines.append(f'# TYPE sync_uptime_seconds gauge')
-            lines.append(f'sync_uptime_seconds {metrics["uptime_seconds"]}')
-            
-            # 同步计数
-            for direction, counters in metrics['sync_counters'].items():
-                for status, count in counters.items():
-                    lines.append(f'sync_total{{direction="{direction}",status="{status}"}} {count}')
-            
-            # 成功率
-            for direction, rate in metrics['success_rates'].items():
-                lines.append(f'sync_success_rate{{direction="{direction}"}} {rate}')
-            
-            # 队列大小
-            queue_total = metrics['queue_stats'].get('total', 0)
-            lines.append(f'queue_size_total {queue_total}')
-            
-            return '\n'.join(lines)
+            # Prometheus 格式，HELP/TYPE 行为常量，每次只生成数值行
+            return '\n'.join([
+                _PROM_UPTIME_HEADER,
+                f'sync_uptime_seconds {metrics["uptime_seconds"]}',
+                _PROM_SYNC_TOTAL_HEADER,
+                *[
+                    f'sync_total{{direction="{direction}",status="{status}"}} {count}'
+                    for direction, counters in metrics['sync_counters'].items()
+                    for status, count in counters.items()
+                ],
+                _PROM_SUCCESS_RATE_HEADER,
+                *[
+                    f'sync_success_rate{{direction="{direction}"}} {rate}'
+                    for direction, rate in metrics['success_rates'].items()
+                ],
+                _PROM_QUEUE_SIZE_HEADER,
+                f'queue_size_total {metrics["queue_stats"].get("total", 0)}'
+            ])
         else:
             raise ValueError(f"Unsupported format: {format}")
\ No newline at end of file
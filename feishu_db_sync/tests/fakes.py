@@ -0,0 +1,200 @@
+"""
+测试用的内存实现
+
+InMemoryDatabase 和 InMemoryQueueProcessor 用字典保存数据，只实现 SyncWorker
+实际调用的方法。与 Mock 不同，写入的数据可以再读出来，可用于验证完整的数据路径，
+也可以放大记录数做压力测试。
+"""
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+
+# SyncWorker 中按 feishu_id 回查数据库ID的两种查询
+_SELECT_ID_BY_FEISHU_ID = re.compile(r"SELECT id FROM (\w+) WHERE feishu_id = %s")
+_SELECT_IDS_BY_FEISHU_IDS = re.compile(r"SELECT id, feishu_id FROM (\w+) WHERE feishu_id IN \(")
+
+
+class InMemoryDatabase:
+    """字典实现的数据库，每张表为 {id: 行}，id 自增"""
+    
+    def __init__(self):
+        self.tables: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._next_id = 1
+    
+    def _table(self, table: str) -> Dict[int, Dict[str, Any]]:
+        return self.tables.setdefault(table, {})
+    
+    def _matches(self, row: Dict[str, Any], where: Dict[str, Any]) -> bool:
+        return all(str(row.get(column)) == str(value) for column, value in where.items())
+    
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """内存实现不需要事务"""
+        yield None
+    
+    def after_commit(self, callback) -> None:
+        """内存实现没有事务，立即执行"""
+        callback()
+    
+    def insert(self, table: str, data: Dict[str, Any]) -> int:
+        """插入数据，返回自增ID"""
+        row_id = int(data['id']) if 'id' in data else self._next_id
+        self._next_id = max(self._next_id, row_id) + 1
+        self._table(table)[row_id] = dict(data, id=row_id)
+        return row_id
+    
+    def batch_insert(self, table: str, data_list: List[Dict[str, Any]],
+                     multi_row: bool = True) -> int:
+        """批量插入数据"""
+        for data in data_list:
+            self.insert(table, data)
+        return len(data_list)
+    
+    def update(self, table: str, data: Dict[str, Any], where: Dict[str, Any]) -> int:
+        """更新数据"""
+        rows = [row for row in self._table(table).values() if self._matches(row, where)]
+        for row in rows:
+            row.update(data)
+        return len(rows)
+    
+    def batch_update(self, table: str, data_list: List[Dict[str, Any]], key: str) -> int:
+        """按 key 字段批量更新数据"""
+        return sum(
+            self.update(table, {k: v for k, v in data.items() if k != key}, {key: data[key]})
+            for data in data_list
+        )
+    
+    def upsert(self, table: str, data: Dict[str, Any], unique_keys: List[str]) -> int:
+        """插入或更新数据"""
+        where = {key: data[key] for key in unique_keys}
+        if self.update(table, data, where):
+            return 2
+        self.insert(table, data)
+        return 1
+    
+    def batch_upsert(self, table: str, data_list: List[Dict[str, Any]],
+                     unique_keys: List[str]) -> int:
+        """批量插入或更新数据"""
+        return sum(self.upsert(table, data, unique_keys) for data in data_list)
+    
+    def delete(self, table: str, where: Dict[str, Any]) -> int:
+        """删除数据"""
+        rows = self._table(table)
+        row_ids = [row_id for row_id, row in rows.items() if self._matches(row, where)]
+        for row_id in row_ids:
+            del rows[row_id]
+        return len(row_ids)
+    
+    def delete_in(self, table: str, column: str, values: List[Any]) -> int:
+        """删除指定字段取值在 values 中的数据"""
+        return sum(self.delete(table, {column: value}) for value in values)
+    
+    def query_one(self, sql: str, params: Optional[Tuple] = None) -> Optional[Dict[str, Any]]:
+        """只支持按 feishu_id 查询数据库ID"""
+        match = _SELECT_ID_BY_FEISHU_ID.match(sql)
+        if not match:
+            raise NotImplementedError(sql)
+        for row in self._table(match.group(1)).values():
+            if row.get('feishu_id') == params[0]:
+                return {'id': row['id']}
+        return None
+    
+    def query_fast(self, sql: str, params: Optional[Tuple] = None,
+                   row_cls: Optional[type] = None) -> List[Any]:
+        """只支持按一组 feishu_id 查询数据库ID"""
+        match = _SELECT_IDS_BY_FEISHU_IDS.match(sql)
+        if not match:
+            raise NotImplementedError(sql)
+        feishu_ids = set(params)
+        rows = [
+            (row['id'], row['feishu_id'])
+            for row in self._table(match.group(1)).values()
+            if row.get('feishu_id') in feishu_ids
+        ]
+        return [row_cls._make(row) for row in rows] if row_cls else rows
+
+
+class InMemoryQueueProcessor:
+    """字典实现的队列处理器，保存ID映射、同步日志和已处理的队列项"""
+    
+    def __init__(self):
+        self.id_mappings: Dict[Tuple[str, str], str] = {}  # (表, 飞书ID) -> 数据库ID
+        self.sync_logs: List[Dict[str, Any]] = []
+        self.completed: List[int] = []
+        self.failed: List[int] = []
+    
+    def check_sync_loop(self, sync_hash: str, direction: str, window_seconds: int = 0) -> bool:
+        """同步日志中有其他方向完成的相同哈希时视为循环"""
+        return sync_hash in self.check_sync_loops([sync_hash], direction)
+    
+    def check_sync_loops(self, sync_hashes: List[str], direction: str,
+                         window_seconds: int = 0) -> Set[str]:
+        """返回其他方向已完成同步的哈希"""
+        hashes = set(sync_hashes)
+        return {
+            log['sync_hash'] for log in self.sync_logs
+            if log['sync_hash'] in hashes and log['direction'] != direction
+            and log['status'] == 'completed'
+        }
+    
+    def log_sync(self, table_name: str, record_id: str, direction: str, sync_hash: str,
+                 status: str, error_message: Optional[str] = None) -> None:
+        """记录同步日志"""
+        self.sync_logs.append({
+            'table_name': table_name, 'record_id': record_id, 'direction': direction,
+            'sync_hash': sync_hash, 'status': status, 'error_message': error_message
+        })
+    
+    def log_sync_batch(self, entries: List[Dict[str, Any]]) -> None:
+        """批量记录同步日志"""
+        for entry in entries:
+            self.log_sync(**entry)
+    
+    def save_id_mapping(self, table_name: str, db_id: str, feishu_id: str) -> None:
+        """保存ID映射"""
+        self.id_mappings[(table_name, feishu_id)] = str(db_id)
+    
+    def save_id_mappings(self, table_name: str, mappings: List[Tuple[str, str]]) -> None:
+        """批量保存ID映射，mappings 为 (数据库ID, 飞书ID)"""
+        for db_id, feishu_id in mappings:
+            self.save_id_mapping(table_name, db_id, feishu_id)
+    
+    def get_db_id(self, table_name: str, feishu_id: str) -> Optional[str]:
+        """根据飞书ID获取数据库ID"""
+        return self.id_mappings.get((table_name, feishu_id))
+    
+    def get_db_ids(self, table_name: str, feishu_ids: List[str]) -> Dict[str, str]:
+        """批量根据飞书ID获取数据库ID"""
+        return {
+            feishu_id: self.id_mappings[(table_name, feishu_id)]
+            for feishu_id in feishu_ids if (table_name, feishu_id) in self.id_mappings
+        }
+    
+    def get_feishu_id(self, table_name: str, db_id: str) -> Optional[str]:
+        """根据数据库ID获取飞书ID"""
+        for (table, feishu_id), mapped_db_id in self.id_mappings.items():
+            if table == table_name and mapped_db_id == str(db_id):
+                return feishu_id
+        return None
+    
+    def evict_id_mapping(self, table_name: str, db_id: Optional[str] = None,
+                         feishu_id: Optional[str] = None) -> None:
+        """删除ID映射"""
+        self.id_mappings.pop((table_name, feishu_id), None)
+    
+    def mark_completed(self, queue_id: int) -> None:
+        """标记完成"""
+        self.completed.append(queue_id)
+    
+    def mark_completed_batch(self, queue_ids: List[int]) -> None:
+        """批量标记完成"""
+        self.completed.extend(queue_ids)
+    
+    def mark_failed(self, queue_id: int, error_message: str) -> None:
+        """标记失败"""
+        self.failed.append(queue_id)
+    
+    def mark_failed_batch(self, queue_ids: List[int], error_message: str) -> None:
+        """批量标记失败"""
+        self.failed.extend(queue_ids)
\ No newline at end of file
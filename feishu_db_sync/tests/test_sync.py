@@ -3,12 +3,17 @@
 """
 import unittest
 import json
+import os
+import tempfile
 import time
 from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 
+import pytest
+import redis
+
 from feishu_db_sync.config.config import Config, DatabaseConfig, FeishuConfig, SyncConfig
-from feishu_db_sync.feishu.client import FeishuClient
+from feishu_db_sync.feishu.client import FeishuClient, _canonical_bytes, _digest
 from feishu_db_sync.feishu.change_detector import ChangeDetector, ChangeRecord
 from feishu_db_sync.db.database import Database
 from feishu_db_sync.db.queue_processor import QueueProcessor
@@ -16,111 +21,450 @@ from feishu_db_sync.core.field_mapper import FieldMapper
 from feishu_db_sync.core.sync_worker import SyncWorker
 
 
-class TestFieldMapper(unittest.TestCase):
+# 测试用的字段映射
+FIELD_MAPPING = {
+    "users": {
+        "姓名": "name",
+        "年龄": "age",
+        "邮箱": "email"
+    }
+}
+
+
+@pytest.fixture(scope='module')
+def mapper() -> FieldMapper:
+    """字段映射器，只用于不修改映射的测试"""
+    return FieldMapper(FIELD_MAPPING)
+
+
+class TestFieldMapper:
     """字段映射器测试"""
     
+    @pytest.mark.parametrize('table,feishu,expected', [
+        ("users",
+         {"id": "rec123", "姓名": "张三", "年龄": 25, "邮箱": "zhangsan@example.com"},
+         {"name": "张三", "age": 25, "email": "zhangsan@example.com", "feishu_id": "rec123"}),
+        ("users", {"姓名": "李四", "电话": "123"}, {"name": "李四", "电话": "123"}),
+        ("orders", {"id": "rec1", "total": 5}, {"id": "rec1", "total": 5}),
+    ])
+    def test_feishu_to_db(self, table, feishu, expected, mapper):
+        """测试飞书到数据库的字段映射"""
+        assert mapper.feishu_to_db(table, feishu) == expected
+    
+    @pytest.mark.parametrize('table,db,expected', [
+        ("users",
+         {"id": 1, "name": "李四", "age": 30, "email": "lisi@example.com", "feishu_id": "rec456"},
+         {"姓名": "李四", "年龄": 30, "邮箱": "lisi@example.com"}),
+        ("users", {"name": "王五", "phone": "123"}, {"姓名": "王五", "phone": "123"}),
+        ("orders", {"id": 1, "total": 5}, {"total": 5}),
+    ])
+    def test_db_to_feishu(self, table, db, expected, mapper):
+        """测试数据库到飞书的字段映射，不回写 id 和 feishu_id"""
+        assert mapper.db_to_feishu(table, db) == expected
+    
+    def test_add_mapping_refreshes_conversion(self):
+        """测试新增映射后按表生成的转换函数失效"""
+        mapper = FieldMapper(FIELD_MAPPING)
+        assert mapper.feishu_to_db("users", {"电话": "123"}) == {"电话": "123"}
+        
+        mapper.add_mapping("users", "电话", "phone")
+        
+        assert mapper.feishu_to_db("users", {"电话": "123"}) == {"phone": "123"}
+        assert mapper.db_to_feishu("users", {"phone": "123"}) == {"电话": "123"}
+    
+    @pytest.mark.parametrize('table,feishu_records,db_records', [
+        ("users",
+         [{"姓名": "张三", "id": "rec1"}, {"姓名": "李四", "年龄": 30}],
+         [{"name": "张三", "feishu_id": "rec1"}, {"email": "a@b.c"}]),
+        ("orders", [{"id": "rec1", "total": 5}], [{"id": 1, "total": 5}]),
+        ("users", [], []),
+    ])
+    def test_batch_conversion(self, table, feishu_records, db_records, mapper):
+        """测试批量转换与逐条转换结果一致"""
+        assert mapper.feishu_to_db_batch(table, feishu_records) == [
+            mapper.feishu_to_db(table, record) for record in feishu_records
+        ]
+        assert mapper.db_to_feishu_batch(table, db_records) == [
+            mapper.db_to_feishu(table, record) for record in db_records
+        ]
+    
+    def test_batch_conversion_with_executor(self, mapper):
+        """测试大批量转换分块交给线程池/进程池，结果顺序不变"""
+        from concurrent.futures import ThreadPoolExecutor
+        from feishu_db_sync.core import field_mapper as field_mapper_module
+        
+        records = [{"姓名": f"user{i}", "年龄": i, "id": f"rec{i}"} for i in range(5)]
+        expected = mapper.feishu_to_db_batch("users", records)
+        
+        with ThreadPoolExecutor(max_workers=2) as executor, \
+                patch.object(field_mapper_module, 'PARALLEL_MAPPING_THRESHOLD', 2), \
+                patch.object(field_mapper_module, 'PARALLEL_MAPPING_CHUNK', 2):
+            parallel = FieldMapper(FIELD_MAPPING, executor)
+            assert parallel.feishu_to_db_batch("users", records) == expected
+    
+    @pytest.mark.parametrize('value,field,expected', [
+        ('{"a": 1}', "extra", {"a": 1}),
+        ("{a,b", "tags", ["{a", "b"]),
+        ("red,blue", "tags", ["red", "blue"]),
+    ])
+    def test_convert_db_value_strings(self, value, field, expected, mapper):
+        """测试数据库字符串值的 JSON 与多选转换"""
+        assert mapper._convert_db_value(value, field) == expected
+    
+    def test_convert_db_value_returns_copy(self, mapper):
+        """测试缓存的多选转换结果被修改后不影响下次转换"""
+        tags = mapper._convert_db_value("red,blue", "tags")
+        tags.append("green")
+        assert mapper._convert_db_value("red,blue", "tags") == ["red", "blue"]
+
+
+class TestFeishuClient(unittest.TestCase):
+    """飞书客户端测试"""
+    
     def setUp(self):
-        self.field_mapping = {
-            "users": {
-                "姓名": "name",
-                "年龄": "age",
-                "邮箱": "email"
-            }
-        }
-        self.mapper = FieldMapper(self.field_mapping)
+        with patch('feishu_db_sync.feishu.client.DBImpl') as db_impl:
+            self.client = FeishuClient("app_id", "app_secret")
+        self.db_client = db_impl.return_value
     
-    def test_feishu_to_db(self):
-        """测试飞书到数据库的字段映射"""
-        feishu_record = {
-            "id": "rec123",
-            "姓名": "张三",
-            "年龄": 25,
-            "邮箱": "zhangsan@example.com"
-        }
+    def test_batch_create_bisects_failures(self):
+        """测试批量创建失败时对半拆分，只有坏记录返回 None"""
+        def batch_create(database, table, records):
+            if any(record.get("bad") for record in records):
+                raise RuntimeError("invalid record")
+            return [f"rec_{record['n']}" for record in records]
         
-        db_record = self.mapper.feishu_to_db("users", feishu_record)
-        
-        self.assertEqual(db_record["name"], "张三")
-        self.assertEqual(db_record["age"], 25)
-        self.assertEqual(db_record["email"], "zhangsan@example.com")
-        self.assertEqual(db_record["feishu_id"], "rec123")
-    
-    def test_db_to_feishu(self):
-        """测试数据库到飞书的字段映射"""
-        db_record = {
-            "id": 1,
-            "name": "李四",
-            "age": 30,
-            "email": "lisi@example.com",
-            "feishu_id": "rec456"
-        }
+        self.db_client.batch_create.side_effect = batch_create
+        self.db_client.create.side_effect = lambda database, table, record: batch_create(
+            database, table, [record]
+        )[0]
+        records = [{"n": n, "bad": n == 5} for n in range(8)]
         
-        feishu_record = self.mapper.db_to_feishu("users", db_record)
+        record_ids = self.client.batch_create_records("TestDB", "users", records)
+        
+        self.assertEqual(record_ids, [f"rec_{n}" if n != 5 else None for n in range(8)])
+        # 8 -> 4+4 -> (4..7) 2+2 -> (4,5) 1+1：共 5 次批量请求和 2 次单条请求
+        self.assertEqual(self.db_client.batch_create.call_count, 5)
+        self.assertEqual(self.db_client.create.call_count, 2)
+    
+    def test_batch_delete_success(self):
+        """测试批量删除成功时只请求一次"""
+        self.client.batch_delete_records("TestDB", "users", ["rec1", "rec2"])
         
-        self.assertEqual(feishu_record["姓名"], "李四")
-        self.assertEqual(feishu_record["年龄"], 30)
-        self.assertEqual(feishu_record["邮箱"], "lisi@example.com")
-        self.assertNotIn("id", feishu_record)
-        self.assertNotIn("feishu_id", feishu_record)
+        self.db_client.batch_delete.assert_called_once_with("TestDB", "users", ["rec1", "rec2"])
+        self.db_client.delete.assert_not_called()
 
 
-class TestChangeDetector(unittest.TestCase):
+def _str_hash(record, exclude_fields=None):
+    """以记录的字符串形式作为哈希，便于断言"""
+    return str(record)
+
+
+@pytest.fixture
+def feishu_client() -> Mock:
+    """模拟飞书客户端，使用真实的哈希计算，否则每条记录的哈希都是同一个 Mock"""
+    client = Mock(spec=FeishuClient)
+    client.calculate_record_hash.side_effect = (
+        lambda record, exclude_fields=None: _digest(_canonical_bytes(record))
+    )
+    return client
+
+
+@pytest.fixture
+def detector(feishu_client) -> ChangeDetector:
+    """不使用 Redis 的变更检测器"""
+    detector = ChangeDetector(feishu_client, None)
+    yield detector
+    detector.close()
+
+
+class TestChangeDetector:
     """变更检测器测试"""
     
-    def setUp(self):
-        self.feishu_client = Mock(spec=FeishuClient)
-        self.detector = ChangeDetector(self.feishu_client, None)
-    
-    def test_detect_new_record(self):
-        """测试检测新增记录"""
-        # 模拟飞书返回数据
-        self.feishu_client.read_all_records.return_value = [
-            {"id": "rec1", "name": "Test1", "age": 20},
-            {"id": "rec2", "name": "Test2", "age": 25}
-        ]
+    @pytest.mark.parametrize('before,after,expected', [
+        # 第一次检测，所有记录都是新增
+        (None,
+         [{"id": "rec1", "name": "Test1", "age": 20}, {"id": "rec2", "name": "Test2", "age": 25}],
+         {"rec1": "insert", "rec2": "insert"}),
+        # 修改记录
+        ([{"id": "rec1", "name": "Test1", "age": 20}],
+         [{"id": "rec1", "name": "Test1", "age": 21}],
+         {"rec1": "update"}),
+        # 删除记录
+        ([{"id": "rec1", "name": "Test1", "age": 20}, {"id": "rec2", "name": "Test2", "age": 25}],
+         [{"id": "rec1", "name": "Test1", "age": 20}],
+         {"rec2": "delete"}),
+        # 新增、修改和删除同时发生，没有 id 的记录被忽略
+        ([{"id": "rec1", "age": 20}, {"id": "rec2", "age": 25}, {"id": "rec3", "age": 30}],
+         [{"id": "rec1", "age": 20}, {"id": "rec3", "age": 31}, {"id": "rec4", "age": 40},
+          {"name": "no id"}],
+         {"rec4": "insert", "rec3": "update", "rec2": "delete"}),
+        # 没有变化
+        ([{"id": "rec1", "age": 20}], [{"id": "rec1", "age": 20}], {}),
+    ])
+    def test_detect_changes(self, before, after, expected, feishu_client, detector):
+        """测试两次检测之间的新增、修改和删除"""
+        if before is not None:
+            feishu_client.iter_records.return_value = before
+            detector.detect_changes("TestDB", "users")
         
-        # 第一次检测（所有记录都是新的）
-        changes = self.detector.detect_changes("TestDB", "users")
+        feishu_client.iter_records.return_value = after
+        changes = detector.detect_changes("TestDB", "users")
         
-        self.assertEqual(len(changes), 2)
-        self.assertTrue(all(c.action == 'insert' for c in changes))
+        assert {c.record_id: c.action for c in changes} == expected
+        current = {record["id"]: record for record in after if "id" in record}
+        for change in changes:
+            if change.action == 'delete':
+                assert change.new_data is None
+            else:
+                assert change.new_data == current[change.record_id]
+        assert detector.get_snapshot_info("TestDB", "users")['record_count'] == len(current)
     
-    def test_detect_updated_record(self):
-        """测试检测更新记录"""
-        # 第一次检测
-        self.feishu_client.read_all_records.return_value = [
-            {"id": "rec1", "name": "Test1", "age": 20}
-        ]
-        self.detector.detect_changes("TestDB", "users")
+    def test_update_carries_old_data_and_hash(self, feishu_client, detector):
+        """测试修改记录带有旧数据和新哈希"""
+        feishu_client.calculate_record_hash.side_effect = _str_hash
+        feishu_client.iter_records.return_value = [{"id": "rec3", "age": 30}]
+        detector.detect_changes("TestDB", "users")
+        
+        feishu_client.iter_records.return_value = [{"id": "rec3", "age": 31}]
+        update, = detector.detect_changes("TestDB", "users")
+        
+        assert update.old_data == {"id": "rec3", "age": 30}
+        assert update.hash == str({"id": "rec3", "age": 31})
+    
+    def test_redis_snapshot_roundtrip(self, feishu_client):
+        """测试 Redis 快照按记录存为哈希表字段，旧的 JSON 文本快照仍可读取"""
+        redis_client = MagicMock()
+        pipe = redis_client.pipeline.return_value
+        detector = ChangeDetector(feishu_client, redis_client)
+        snapshot = {"rec1": {"data": {"id": "rec1", "name": "测试"}, "hash": "h1"}}
+        
+        detector._save_snapshot("TestDB", "users", snapshot)
+        pipe.delete.assert_called_once_with("feishu_snapshot:TestDB:users")
+        pipe.expire.assert_called_once_with("feishu_snapshot:TestDB:users", 86400)
+        fields = pipe.hset.call_args[1]["mapping"]
+        
+        redis_client.hgetall.return_value = {k.encode(): v for k, v in fields.items()}
+        assert detector._get_snapshot("TestDB", "users") == snapshot
+        
+        redis_client.hgetall.side_effect = redis.ResponseError("WRONGTYPE")
+        redis_client.get.return_value = json.dumps(snapshot)
+        assert detector._get_snapshot("TestDB", "users") == snapshot
+    
+    def test_redis_snapshot_writes_only_changes(self, feishu_client):
+        """测试轮询后只写入变化的快照字段"""
+        redis_client = MagicMock()
+        pipe = redis_client.pipeline.return_value
+        detector = ChangeDetector(feishu_client, redis_client)
+        feishu_client.calculate_record_hash.side_effect = _str_hash
         
-        # 修改数据后第二次检测
-        self.feishu_client.read_all_records.return_value = [
-            {"id": "rec1", "name": "Test1", "age": 21}  # age 改变了
+        last = {
+            "rec1": {"data": {"id": "rec1", "age": 20}, "hash": str({"id": "rec1", "age": 20})},
+            "rec2": {"data": {"id": "rec2", "age": 25}, "hash": str({"id": "rec2", "age": 25})}
+        }
+        redis_client.hgetall.return_value = {k: json.dumps(v) for k, v in last.items()}
+        feishu_client.iter_records.return_value = [
+            {"id": "rec1", "age": 20},
+            {"id": "rec3", "age": 30}
         ]
-        changes = self.detector.detect_changes("TestDB", "users")
-        
-        self.assertEqual(len(changes), 1)
-        self.assertEqual(changes[0].action, 'update')
-        self.assertEqual(changes[0].new_data['age'], 21)
-    
-    def test_detect_deleted_record(self):
-        """测试检测删除记录"""
-        # 第一次检测
-        self.feishu_client.read_all_records.return_value = [
-            {"id": "rec1", "name": "Test1", "age": 20},
-            {"id": "rec2", "name": "Test2", "age": 25}
+        
+        changes = detector.detect_changes("TestDB", "users")
+        
+        assert {c.record_id: c.action for c in changes} == {"rec3": "insert", "rec2": "delete"}
+        pipe.delete.assert_not_called()
+        assert list(pipe.hset.call_args[1]["mapping"]) == ["rec3"]
+        pipe.hdel.assert_called_once_with("feishu_snapshot:TestDB:users", "rec2")
+        pipe.execute.assert_called_once()
+    
+    def test_unchanged_table_short_circuit(self, feishu_client, detector):
+        """测试整表摘要未变化时不读取快照"""
+        feishu_client.iter_records.return_value = [
+            {"id": "rec1", "age": 20},
+            {"id": "rec2", "age": 25}
         ]
-        self.detector.detect_changes("TestDB", "users")
+        detector.detect_changes("TestDB", "users")
+        
+        with patch.object(detector, '_get_snapshot') as get_snapshot:
+            assert detector.detect_changes("TestDB", "users") == []
+            get_snapshot.assert_not_called()
+        
+        # 表有变化时摘要不同，走完整比对
+        feishu_client.iter_records.return_value = [{"id": "rec1", "age": 20}]
+        changes = detector.detect_changes("TestDB", "users")
+        assert [(c.record_id, c.action) for c in changes] == [("rec2", "delete")]
+        
+        # 重置快照后所有记录重新视为新增
+        detector.reset_snapshot("TestDB", "users")
+        assert len(detector.detect_changes("TestDB", "users")) == 1
+    
+    def test_batch_detect_changes(self, feishu_client, detector):
+        """测试并发检测多个表，单表失败不影响其他表"""
+        def iter_records(database, table):
+            if table == "broken":
+                raise RuntimeError("boom")
+            return iter([{"id": f"{table}_rec", "name": table}])
         
-        # 删除一条记录后第二次检测
-        self.feishu_client.read_all_records.return_value = [
+        feishu_client.iter_records.side_effect = iter_records
+        
+        all_changes = detector.batch_detect_changes({
+            "TestDB:users": "users",
+            "TestDB:orders": "orders",
+            "TestDB:broken": "broken"
+        })
+        
+        assert list(all_changes) == ["TestDB:users", "TestDB:orders", "TestDB:broken"]
+        assert all_changes["TestDB:users"][0].record_id == "users_rec"
+        assert all_changes["TestDB:orders"][0].record_id == "orders_rec"
+        assert all_changes["TestDB:broken"] == []
+        
+        # 线程池在多轮检测之间复用，close 后释放
+        executor = detector._executor
+        detector.batch_detect_changes({"TestDB:users": "users", "TestDB:orders": "orders"})
+        assert detector._executor is executor
+        detector.close()
+        assert detector._executor is None
+    
+    @pytest.mark.parametrize('other,kwargs,same', [
+        ({"age": 20, "name": "Test1", "id": "rec2"}, {}, True),
+        ({"id": "rec1", "name": "Test1", "age": 21}, {}, False),
+        ({"id": "rec1", "name": "Test1", "age": 20}, {"exclude_fields": ["name"]}, False),
+    ])
+    def test_record_hash(self, other, kwargs, same):
+        """测试记录哈希与键顺序、排除字段无关"""
+        calculate = FeishuClient.calculate_record_hash
+        record_hash = calculate(None, {"id": "rec1", "name": "Test1", "age": 20})
+        
+        assert (calculate(None, other, **kwargs) == record_hash) is same
+    
+    def test_hash_change_without_data_change(self, feishu_client, detector):
+        """测试哈希算法变化但数据未变时不检测为修改"""
+        feishu_client.iter_records.return_value = [
             {"id": "rec1", "name": "Test1", "age": 20}
         ]
-        changes = self.detector.detect_changes("TestDB", "users")
+        feishu_client.calculate_record_hash.side_effect = None
+        feishu_client.calculate_record_hash.return_value = "old-hash"
+        detector.detect_changes("TestDB", "users")
+        
+        feishu_client.calculate_record_hash.return_value = "new-hash"
+        assert detector.detect_changes("TestDB", "users") == []
+
+
+class TestDatabase(unittest.TestCase):
+    """数据库操作测试"""
+    
+    @patch('feishu_db_sync.db.database.PooledDB')
+    def test_transaction_commits_once(self, mock_pool):
+        """测试事务内的操作共用连接，只提交一次"""
+        conn = mock_pool.return_value.connection.return_value
+        db = Database(DatabaseConfig(host="localhost", database="test"))
+        
+        with db.transaction():
+            db.insert("users", {"name": "A"})
+            db.update("users", {"name": "B"}, {"id": 1})
+            db.delete("users", {"id": 2})
+        
+        mock_pool.return_value.connection.assert_called_once()
+        conn.commit.assert_called_once()
+        
+        db.delete("users", {"id": 3})
+        self.assertEqual(conn.commit.call_count, 2)
+    
+    @patch('feishu_db_sync.db.database.PooledDB')
+    def test_after_commit_runs_only_on_commit(self, mock_pool):
+        """测试提交后才执行 after_commit 回调，回滚时丢弃"""
+        conn = mock_pool.return_value.connection.return_value
+        db = Database(DatabaseConfig(host="localhost", database="test"))
+        calls = []
+        
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.after_commit(lambda: calls.append("rolled back"))
+                raise RuntimeError("deadlock")
+        conn.rollback.assert_called_once()
+        
+        with db.transaction():
+            db.after_commit(lambda: calls.append("committed"))
+            self.assertEqual(calls, [])
+        
+        db.after_commit(lambda: calls.append("no transaction"))
+        self.assertEqual(calls, ["committed", "no transaction"])
+    
+    @patch('feishu_db_sync.db.database.PooledDB')
+    def test_batch_insert_multi_row(self, mock_pool):
+        """测试批量插入合并为一条多行 INSERT"""
+        cursor = mock_pool.return_value.connection.return_value.cursor.return_value
+        db = Database(DatabaseConfig(host="localhost", database="test"))
+        
+        db.batch_insert("users", [{"name": "A", "age": 1}, {"name": "B", "age": 2}])
+        
+        cursor.execute.assert_called_once_with(
+            "INSERT INTO users (name, age) VALUES (%s, %s), (%s, %s)", ["A", 1, "B", 2]
+        )
+        cursor.executemany.assert_not_called()
+        
+        with patch('feishu_db_sync.db.database.MAX_INSERT_PAYLOAD', 2):
+            db.batch_insert("users", [{"name": "A"}, {"name": "B"}, {"name": "C"}])
+        
+        self.assertEqual(cursor.execute.call_args_list[-2][0],
+                         ("INSERT INTO users (name) VALUES (%s), (%s)", ["A", "B"]))
+        self.assertEqual(cursor.execute.call_args_list[-1][0],
+                         ("INSERT INTO users (name) VALUES (%s)", ["C"]))
+    
+    @patch('feishu_db_sync.db.database.PooledDB')
+    def test_batch_upsert_chunks_rows(self, mock_pool):
+        """测试批量插入或更新与批量插入一样按行数切分语句"""
+        cursor = mock_pool.return_value.connection.return_value.cursor.return_value
+        cursor.execute.return_value = 1
+        db = Database(DatabaseConfig(host="localhost", database="test"))
+        
+        with patch('feishu_db_sync.db.database.MAX_ROWS_PER_INSERT', 2):
+            db.batch_upsert("users", [{"feishu_id": f"rec{i}", "name": str(i)} for i in range(3)],
+                            ['feishu_id'])
+        
+        self.assertEqual(cursor.execute.call_count, 2)
+        sql, values = cursor.execute.call_args_list[0][0]
+        self.assertTrue(sql.startswith(
+            "INSERT INTO users (feishu_id, name) VALUES (%s, %s), (%s, %s) ON DUPLICATE KEY UPDATE"
+        ))
+        self.assertEqual(values, ["rec0", "0", "rec1", "1"])
+        self.assertEqual(cursor.execute.call_args_list[1][0][1], ["rec2", "2"])
+    
+    @patch('feishu_db_sync.db.database.PooledDB')
+    def test_batch_update_groups_by_columns(self, mock_pool):
+        """测试批量更新按字段组合分组，每组一次 executemany 的 UPDATE"""
+        cursor = mock_pool.return_value.connection.return_value.cursor.return_value
+        cursor.executemany.return_value = 1
+        db = Database(DatabaseConfig(host="localhost", database="test"))
+        
+        db.batch_update("users", [
+            {"name": "A", "id": 1},
+            {"name": "B", "age": 2, "id": 2},
+            {"name": "C", "id": 3},
+        ], 'id')
         
-        self.assertEqual(len(changes), 1)
-        self.assertEqual(changes[0].action, 'delete')
-        self.assertEqual(changes[0].record_id, 'rec2')
+        cursor.executemany.assert_any_call(
+            "UPDATE users SET name = %s WHERE id = %s", [("A", 1), ("C", 3)]
+        )
+        cursor.executemany.assert_any_call(
+            "UPDATE users SET name = %s, age = %s WHERE id = %s", [("B", 2, 2)]
+        )
+        cursor.execute.assert_not_called()
+    
+    @patch('feishu_db_sync.db.database.PooledDB')
+    def test_query_fast(self, mock_pool):
+        """测试元组游标查询，可包装为 namedtuple"""
+        from collections import namedtuple
+        from pymysql.cursors import Cursor
+        
+        conn = mock_pool.return_value.connection.return_value
+        conn.cursor.return_value.fetchall.return_value = (("rec1", "1"),)
+        db = Database(DatabaseConfig(host="localhost", database="test"))
+        
+        self.assertEqual(db.query_fast("SELECT feishu_id, db_id FROM id_mapping"), [("rec1", "1")])
+        conn.cursor.assert_called_with(Cursor)
+        
+        Mapping = namedtuple('Mapping', 'feishu_id db_id')
+        rows = db.query_fast("SELECT feishu_id, db_id FROM id_mapping", row_cls=Mapping)
+        self.assertEqual(rows[0].db_id, "1")
 
 
 class TestQueueProcessor(unittest.TestCase):
@@ -128,6 +472,7 @@ class TestQueueProcessor(unittest.TestCase):
     
     def setUp(self):
         self.db = Mock(spec=Database)
+        self.db.after_commit.side_effect = lambda callback: callback()
         self.processor = QueueProcessor(self.db)
     
     def test_add_to_queue(self):
@@ -144,6 +489,74 @@ class TestQueueProcessor(unittest.TestCase):
         self.assertEqual(queue_id, 1)
         self.db.insert.assert_called_once()
     
+    def test_add_many_to_queue(self):
+        """测试批量入队只执行一次插入"""
+        self.db.batch_insert.return_value = 2
+        
+        count = self.processor.add_many_to_queue([
+            {'table_name': "users", 'record_id': "1", 'action': "INSERT", 'new_data': {"name": "A"}},
+            {'table_name': "users", 'record_id': "2", 'action': "DELETE"}
+        ])
+        
+        self.assertEqual(count, 2)
+        table, rows = self.db.batch_insert.call_args[0]
+        self.assertEqual(table, 'sync_queue')
+        self.assertEqual(rows[0]['new_data'], '{"name":"A"}')
+        self.assertIsNone(rows[1]['new_data'])
+        self.assertEqual(list(rows[0]), list(rows[1]))
+        self.assertEqual(self.processor.add_many_to_queue([]), 0)
+    
+    def test_add_to_queue_serialized_data(self):
+        """测试已序列化的队列数据原样写入，不再重复序列化"""
+        self.processor.add_to_queue("users", "1", "UPDATE",
+                                    old_data=b'{"name":"A"}', new_data='{"name":"B"}')
+        
+        data = self.db.insert.call_args[0][1]
+        self.assertEqual(data['old_data'], '{"name":"A"}')
+        self.assertEqual(data['new_data'], '{"name":"B"}')
+    
+    def test_mark_failed_single_statement(self):
+        """测试标记失败在一条 UPDATE 中累加重试次数，不先查询"""
+        self.processor.mark_failed(7, "boom")
+        
+        self.db.query_one.assert_not_called()
+        self.db.query.assert_not_called()
+        sql, params = self.db.execute.call_args[0]
+        # MySQL 按顺序赋值，status 必须在 retry_count 之前才能读到旧的重试次数
+        self.assertLess(sql.index("status = IF(retry_count + 1 >= 3"), sql.index("retry_count = retry_count + 1"))
+        self.assertEqual(params, ('failed', 'pending', "boom", 7))
+    
+    def test_mark_failed_batch(self):
+        """测试批量标记失败只执行一条 UPDATE"""
+        self.processor.mark_failed_batch([1, 2, 3], "boom")
+        
+        sql, params = self.db.execute.call_args[0]
+        self.assertIn("WHERE id IN (%s, %s, %s)", sql)
+        self.assertEqual(params, ('failed', 'pending', "boom", 1, 2, 3))
+        
+        self.processor.mark_failed_batch([], "boom")
+        self.db.execute.assert_called_once()
+    
+    def test_claim_pending_items(self):
+        """测试领取队列项：加锁查询和标记处理中在同一事务中"""
+        self.db.transaction.return_value = MagicMock()
+        self.db.query_fast.side_effect = lambda sql, params, row_cls: [
+            row_cls._make(row) for row in [
+                (1, 'users', '1', 'INSERT', None, '{"name":"A"}', 'h1', 'database', datetime.now(), None, 'pending', 0),
+                (2, 'users', '2', 'INSERT', None, None, 'h2', 'database', datetime.now(), None, 'pending', 1)
+            ]
+        ]
+        
+        items = self.processor.claim_pending_items(limit=10)
+        
+        self.db.transaction.assert_called_once()
+        self.assertIn("FOR UPDATE SKIP LOCKED", self.db.query_fast.call_args[0][0])
+        self.assertNotIn("old_data", self.db.query_fast.call_args[0][0])
+        self.assertEqual(self.db.execute.call_args[0][1], ('processing', 1, 2))
+        self.assertEqual([item.status for item in items], ['processing', 'processing'])
+        self.assertEqual(items[0].new_data, {"name": "A"})
+        self.assertEqual((items[1].sync_hash, items[1].retry_count), ('h2', 1))
+    
     def test_check_sync_loop(self):
         """测试循环同步检测"""
         # 模拟存在相同哈希的同步记录
@@ -156,11 +569,78 @@ class TestQueueProcessor(unittest.TestCase):
         
         self.assertTrue(is_loop)
     
+    def test_check_sync_loop_with_redis(self):
+        """测试有Redis时按反方向的已同步哈希检测循环"""
+        redis_client = Mock()
+        processor = QueueProcessor(self.db, redis_client)
+        
+        processor.log_sync("users", "1", "db_to_feishu", "h1", "completed")
+        
+        pipe = redis_client.pipeline.return_value
+        pipe.set.assert_called_once_with("sync_seen:db_to_feishu:h1", 1, ex=10)
+        
+        # 其他进程通过Redis看到该哈希
+        other = QueueProcessor(self.db, redis_client)
+        redis_client.exists.return_value = 1
+        self.assertTrue(other.check_sync_loop("h1", "feishu_to_db"))
+        redis_client.exists.assert_called_once_with("sync_seen:db_to_feishu:h1")
+        
+        redis_client.mget.return_value = ["1", None]
+        self.assertEqual(other.check_sync_loops(["h1", "h2"], "feishu_to_db"), {"h1"})
+        self.db.query_one.assert_not_called()
+        self.db.query.assert_not_called()
+    
+    def test_check_sync_loop_local_cache(self):
+        """测试本进程刚同步过的哈希不查同步日志"""
+        self.processor.log_sync_batch([
+            {'table_name': "users", 'record_id': "1", 'direction': "db_to_feishu",
+             'sync_hash': "h1", 'status': "completed"},
+            {'table_name': "users", 'record_id': "2", 'direction': "db_to_feishu",
+             'sync_hash': "h2", 'status': "failed"}
+        ])
+        
+        self.assertTrue(self.processor.check_sync_loop("h1", "feishu_to_db"))
+        self.db.query_one.assert_not_called()
+        
+        # 同方向不算循环；未命中的哈希仍查同步日志
+        self.db.query.return_value = [{'sync_hash': "h3"}]
+        self.assertEqual(self.processor.check_sync_loops(["h1", "h2", "h3"], "feishu_to_db"), {"h1", "h3"})
+        self.assertEqual(self.db.query.call_args[0][1][:2], ("h2", "h3"))
+        
+        self.db.query_one.return_value = {'count': 0}
+        self.assertFalse(self.processor.check_sync_loop("h1", "db_to_feishu"))
+    
+    def test_cleanup_old_records_in_batches(self):
+        """测试清理旧记录分批删除直到不足一批"""
+        from feishu_db_sync.db import queue_processor as queue_processor_module
+        
+        self.db.execute.side_effect = [2, 1, 0]
+        
+        with patch.object(queue_processor_module, 'CLEANUP_BATCH_SIZE', 2):
+            self.processor.cleanup_old_records(days=7)
+        
+        self.assertEqual(self.db.execute.call_count, 3)
+        self.assertTrue(all(call[0][1][-1] == 2 for call in self.db.execute.call_args_list))
+    
+    def test_cleanup_old_records_max_rows(self):
+        """测试清理旧记录达到 max_rows 后停止，最后一批按剩余行数限制"""
+        from feishu_db_sync.db import queue_processor as queue_processor_module
+        
+        self.db.execute.side_effect = [2, 1, 0]
+        
+        with patch.object(queue_processor_module, 'CLEANUP_BATCH_SIZE', 2), \
+                patch.object(queue_processor_module, 'CLEANUP_BATCH_PAUSE', 0):
+            self.processor.cleanup_old_records(days=7, max_rows=3)
+        
+        limits = [call[0][1][-1] for call in self.db.execute.call_args_list]
+        self.assertEqual(limits, [2, 1, 2])
+    
     def test_get_queue_stats(self):
         """测试获取队列统计"""
-        self.db.query.return_value = [
-            {'status': 'pending', 'count': 10, 'oldest': datetime.now(), 'newest': datetime.now()},
-            {'status': 'completed', 'count': 50, 'oldest': datetime.now(), 'newest': datetime.now()}
+        oldest = datetime.now()
+        self.db.query_fast.return_value = [
+            ('completed', 50, datetime.now()),
+            ('pending', 10, oldest)
         ]
         
         stats = self.processor.get_queue_stats()
@@ -168,6 +648,57 @@ class TestQueueProcessor(unittest.TestCase):
         self.assertEqual(stats['total'], 60)
         self.assertEqual(stats['by_status']['pending'], 10)
         self.assertEqual(stats['by_status']['completed'], 50)
+        self.assertEqual(stats['oldest_pending'], oldest)
+    
+    def test_id_mapping_cache(self):
+        """测试ID映射缓存：保存后双向命中，删除后失效"""
+        self.processor.save_id_mapping("users", "1", "rec1")
+        
+        self.assertEqual(self.processor.get_db_id("users", "rec1"), "1")
+        self.assertEqual(self.processor.get_feishu_id("users", "1"), "rec1")
+        self.assertEqual(self.processor.get_db_ids("users", ["rec1"]), {"rec1": "1"})
+        self.db.query_fast.assert_not_called()
+        
+        self.processor.evict_id_mapping("users", "1", "rec1")
+        self.db.query_fast.return_value = []
+        
+        self.assertIsNone(self.processor.get_db_id("users", "rec1"))
+        self.db.query_fast.assert_called_once()
+        
+        self.db.query_fast.return_value = [("rec2", "2")]
+        self.assertEqual(self.processor.get_db_ids("users", ["rec2"]), {"rec2": "2"})
+        self.assertEqual(self.processor.get_feishu_id("users", "2"), "rec2")
+    
+    def test_get_feishu_ids_batch(self):
+        """测试批量获取飞书ID只查询未缓存的记录，结果供逐条查询命中"""
+        self.processor.save_id_mapping("users", "1", "rec1")
+        self.db.query_fast.return_value = [("2", "rec2")]
+        
+        self.assertEqual(self.processor.get_feishu_ids("users", ["1", "2", "3"]),
+                         {"1": "rec1", "2": "rec2"})
+        self.assertEqual(self.db.query_fast.call_args[0][1], ("users", "2", "3"))
+        
+        self.assertEqual(self.processor.get_feishu_id("users", "2"), "rec2")
+        self.assertEqual(self.processor.get_db_id("users", "rec2"), "2")
+        self.db.query_fast.assert_called_once()
+    
+    def test_queue_notify(self):
+        """测试入队时通知同步循环"""
+        redis_client = Mock()
+        redis_client.brpop.return_value = ("sync_queue_notify", "1")
+        processor = QueueProcessor(self.db, redis_client)
+        self.db.insert.return_value = 1
+        
+        processor.add_to_queue(table_name="users", record_id="123", action="INSERT")
+        
+        redis_client.lpush.assert_called_once_with("sync_queue_notify", 1)
+        self.assertTrue(processor.wait_for_items(1))
+        # 唤醒后清空剩余通知，避免列表增长和空的领取
+        redis_client.delete.assert_called_once_with("sync_queue_notify")
+        
+        redis_client.brpop.return_value = None
+        self.assertFalse(processor.wait_for_items(1))
+        redis_client.delete.assert_called_once()
 
 
 class TestSyncWorker(unittest.TestCase):
@@ -176,6 +707,7 @@ class TestSyncWorker(unittest.TestCase):
     def setUp(self):
         self.feishu_client = Mock(spec=FeishuClient)
         self.database = Mock(spec=Database)
+        self.database.transaction.return_value = MagicMock()
         self.queue_processor = Mock(spec=QueueProcessor)
         self.field_mapper = Mock(spec=FieldMapper)
         
@@ -244,17 +776,387 @@ class TestSyncWorker(unittest.TestCase):
         self.assertTrue(result)
         self.feishu_client.update_record.assert_called_once()
         self.queue_processor.mark_completed.assert_called_once_with(1)
+    
+    def test_sync_inserts_to_feishu_batch(self):
+        """测试数据库新增记录批量同步到飞书"""
+        from feishu_db_sync.db.models import SyncQueue, SyncAction
+        
+        queue_items = [
+            SyncQueue(
+                id=i,
+                table_name="users",
+                record_id=str(100 + i),
+                action=SyncAction.INSERT.value,
+                new_data={"name": f"user{i}"},
+                sync_hash=f"hash{i}"
+            )
+            for i in (1, 2)
+        ]
+        
+        self.queue_processor.check_sync_loop.return_value = False
+        self.field_mapper.db_to_feishu_batch.side_effect = lambda table, rows: [
+            {"姓名": data["name"]} for data in rows
+        ]
+        self.feishu_client.batch_create_records.return_value = ["rec1", None]
+        
+        results = self.worker.sync_inserts_to_feishu(queue_items, "TestDB", "users")
+        
+        self.assertEqual(results, {1: True, 2: False})
+        self.feishu_client.batch_create_records.assert_called_once_with("TestDB", "users", [
+            {"姓名": "user1", "db_id": "101"},
+            {"姓名": "user2", "db_id": "102"},
+        ])
+        self.queue_processor.save_id_mappings.assert_called_once_with("users", [("101", "rec1")])
+        self.queue_processor.mark_completed_batch.assert_called_once_with([1])
+        self.queue_processor.mark_failed_batch.assert_called_once_with([2], "Failed to create record in Feishu")
+        self.assertEqual(len(self.queue_processor.log_sync_batch.call_args[0][0]), 2)
+    
+    def test_sync_feishu_to_db_batch(self):
+        """测试飞书变更按动作批量写入数据库"""
+        changes = [
+            ChangeRecord("rec1", 'insert', new_data={"name": "A"}),
+            ChangeRecord("rec2", 'update', new_data={"name": "B"}),
+            ChangeRecord("rec3", 'update', new_data={"name": "C"}),
+            ChangeRecord("rec4", 'delete', old_data={"name": "D"}),
+        ]
+        for change in changes:
+            change.hash = f"hash_{change.record_id}"
+        
+        self.queue_processor.check_sync_loops.return_value = set()
+        self.field_mapper.feishu_to_db_batch.side_effect = lambda table, rows: [
+            dict(data) for data in rows
+        ]
+        # rec2 已有映射，rec3 在数据库中不存在，rec4 已有映射
+        self.queue_processor.get_db_ids.side_effect = lambda table, ids: {
+            feishu_id: db_id for feishu_id, db_id in {"rec2": "2", "rec4": "4"}.items()
+            if feishu_id in ids
+        }
+        self.database.query_fast.return_value = []
+        
+        results = self.worker.sync_feishu_to_db_batch("TestDB:users", "users", changes)
+        
+        self.assertEqual(results, {"rec1": True, "rec2": True, "rec3": True, "rec4": True})
+        self.database.delete_in.assert_any_call("users", "id", ["4"])
+        self.database.batch_update.assert_called_once_with("users", [{"name": "B", "id": "2"}], 'id')
+        self.database.batch_upsert.assert_any_call("users", [
+            {"name": "C", "feishu_id": "rec3"}
+        ], ['feishu_id'])
+        self.database.batch_upsert.assert_any_call("users", [
+            {"name": "A", "feishu_id": "rec1"}
+        ], ['feishu_id'])
+        self.queue_processor.get_db_ids.assert_called_once()
+        self.database.transaction.assert_called_once()
+        self.queue_processor.log_sync_batch.assert_called_once()
+        self.assertEqual(len(self.queue_processor.log_sync_batch.call_args[0][0]), 4)
+        self.database.insert.assert_not_called()
+        self.queue_processor.log_sync.assert_not_called()
+    
+    def test_sync_feishu_to_db_batch_rolls_back(self):
+        """测试任一动作写入失败时整批回滚，所有变更记为失败"""
+        changes = [
+            ChangeRecord("rec1", 'insert', new_data={"name": "A"}),
+            ChangeRecord("rec2", 'delete', old_data={"name": "B"}),
+        ]
+        
+        self.queue_processor.check_sync_loops.return_value = set()
+        self.queue_processor.get_db_ids.return_value = {"rec2": "2"}
+        self.field_mapper.feishu_to_db_batch.side_effect = lambda table, rows: [
+            dict(data) for data in rows
+        ]
+        self.database.batch_upsert.side_effect = Exception("Deadlock found")
+        transaction = self.database.transaction.return_value
+        
+        results = self.worker.sync_feishu_to_db_batch("TestDB:users", "users", changes)
+        
+        self.assertEqual(results, {"rec1": False, "rec2": False})
+        # 异常传出事务块，由事务回滚
+        self.assertIsNotNone(transaction.__exit__.call_args[0][0])
+        logs = self.queue_processor.log_sync_batch.call_args[0][0]
+        self.assertEqual([log['status'] for log in logs], ['failed', 'failed'])
+
+
+class TestSyncWorkerInMemory(unittest.TestCase):
+    """使用内存数据库验证飞书到数据库的完整数据路径，记录数可放大做压力测试"""
+    
+    RECORDS = 500
+    
+    def setUp(self):
+        from feishu_db_sync.tests.fakes import InMemoryDatabase, InMemoryQueueProcessor
+        
+        self.database = InMemoryDatabase()
+        self.queue_processor = InMemoryQueueProcessor()
+        self.worker = SyncWorker(
+            Mock(spec=FeishuClient),
+            self.database,
+            self.queue_processor,
+            FieldMapper({"users": {"姓名": "name"}})
+        )
+    
+    def _changes(self, action: str, ids, name: str):
+        return [
+            ChangeRecord(f"rec{i}", action,
+                         new_data=None if action == 'delete' else {"姓名": f"{name}{i}"},
+                         record_hash=f"{action}-{i}")
+            for i in ids
+        ]
+    
+    def _rounds(self):
+        """插入全部记录，修改其中一半，删除其中四分之一"""
+        n = self.RECORDS
+        return (self._changes('insert', range(n), "a"),
+                self._changes('update', range(0, n, 2), "b"),
+                self._changes('delete', range(0, n, 4), ""))
+    
+    def _names(self):
+        return {row['feishu_id']: row['name'] for row in self.database.tables['users'].values()}
+    
+    def test_sync_feishu_to_db_in_memory(self):
+        """测试逐条同步插入、修改、删除后数据库与ID映射一致"""
+        n = self.RECORDS
+        for changes in self._rounds():
+            for change in changes:
+                self.assertTrue(self.worker.sync_feishu_to_db("TestDB:users", "users", change))
+        
+        names = self._names()
+        self.assertEqual(len(names), n - len(range(0, n, 4)))
+        self.assertEqual(names["rec2"], "b2")
+        self.assertEqual(names["rec1"], "a1")
+        self.assertNotIn("rec4", names)
+        self.assertEqual(len(self.queue_processor.id_mappings), len(names))
+        self.assertEqual(len(self.queue_processor.sync_logs),
+                         n + len(range(0, n, 2)) + len(range(0, n, 4)))
+    
+    def test_sync_feishu_to_db_batch_matches_single(self):
+        """测试批量同步与逐条同步得到相同的数据库内容"""
+        for changes in self._rounds():
+            results = self.worker.sync_feishu_to_db_batch("TestDB:users", "users", changes)
+            self.assertTrue(all(results.values()))
+        batch_names = self._names()
+        
+        self.setUp()
+        for changes in self._rounds():
+            for change in changes:
+                self.worker.sync_feishu_to_db("TestDB:users", "users", change)
+        self.assertEqual(batch_names, self._names())
+        self.assertEqual(len(batch_names), self.RECORDS - len(range(0, self.RECORDS, 4)))
+    
+    def test_sync_loop_skipped_in_memory(self):
+        """测试另一方向刚同步过的哈希不再写入数据库"""
+        self.queue_processor.log_sync("users", "1", "db_to_feishu", "insert-0", "completed")
+        
+        change = self._changes('insert', [0], "a")[0]
+        self.assertTrue(self.worker.sync_feishu_to_db("TestDB:users", "users", change))
+        self.assertEqual(self.database.tables, {})
+
+
+class TestConfig(unittest.TestCase):
+    """配置管理测试"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = Config(os.path.join(self.tmpdir.name, "config.json"))
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_get_cached_and_invalidated_by_set(self):
+        """测试 get 结果缓存，set 后失效"""
+        self.assertEqual(self.config.get("sync.batch_size"), 100)
+        self.assertEqual(self.config.get("redis.host", "localhost"), "localhost")
+        
+        self.config.set("sync.batch_size", 200)
+        self.config.set("redis.host", "cache")
+        
+        self.assertEqual(self.config.get("sync.batch_size"), 200)
+        self.assertEqual(self.config.get("redis.host", "localhost"), "cache")
+        self.assertEqual(self.config.sync.batch_size, 200)
+
+
+class TestMetricsCollector(unittest.TestCase):
+    """监控指标收集器测试"""
+    
+    def test_sharded_sync_counters(self):
+        """测试多线程记录的同步计数在读取时合并"""
+        import threading
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor.metrics import MetricsCollector
+        
+        metrics = MetricsCollector(MonitorConfig(), snapshot_ttl=0)
+        
+        def record():
+            for _ in range(100):
+                metrics.record_sync("db_to_feishu", "success")
+            metrics.record_sync_bulk("feishu_to_db", 3, 1)
+        
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        result = metrics.get_metrics()
+        self.assertEqual(result['sync_counters']['db_to_feishu'], {'success': 400, 'total': 400})
+        self.assertEqual(result['sync_counters']['feishu_to_db'],
+                         {'success': 12, 'failed': 4, 'total': 16})
+        self.assertEqual(result['success_rates'], {'db_to_feishu': 100.0, 'feishu_to_db': 75.0})
+        
+        # 不常用的方向/状态走加锁路径，与线程计数合并
+        metrics.record_sync("db_to_feishu", "skipped")
+        metrics.record_sync("manual", "success")
+        counters = metrics.get_metrics()['sync_counters']
+        self.assertEqual(counters['db_to_feishu'], {'success': 400, 'skipped': 1, 'total': 401})
+        self.assertEqual(counters['manual'], {'success': 1, 'total': 1})
+    
+    def test_sync_duration_ring_buffer(self):
+        """测试同步耗时环形缓冲区只用最近的样本计算平均值"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor import metrics as metrics_module
+        
+        metrics = metrics_module.MetricsCollector(MonitorConfig(), snapshot_ttl=0)
+        self.assertEqual(metrics.get_metrics()['average_sync_duration'], {})
+        
+        # 写满并绕回缓冲区开头，旧样本不再参与平均
+        for _ in range(metrics_module.DURATION_SAMPLES - 10):
+            metrics.record_sync_duration("db_to_feishu", 9.0)
+        for i in range(metrics_module.DURATION_AVERAGE_WINDOW):
+            metrics.record_sync_duration("feishu_to_db" if i % 2 else "db_to_feishu", 1.0 + i % 2)
+        metrics.record_sync_duration("other", 100.0)
+        
+        self.assertEqual(metrics.get_metrics()['average_sync_duration'],
+                         {'feishu_to_db': 2.0, 'db_to_feishu': 1.0})
+    
+    def test_recent_errors_formatted_on_read(self):
+        """测试错误时间戳按秒数记录，读取指标时格式化为 ISO 字符串"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor.metrics import MetricsCollector
+        
+        metrics = MetricsCollector(MonitorConfig())
+        metrics.record_error("sync", "boom")
+        self.assertIsInstance(metrics.errors[0].timestamp, float)
+        
+        error = metrics.get_metrics()['recent_errors'][0]
+        self.assertEqual(error['message'], "boom")
+        self.assertAlmostEqual(datetime.fromisoformat(error['timestamp']).timestamp(),
+                               metrics.errors[0].timestamp, places=3)
+        self.assertIn('"boom"', metrics.export_metrics())
+        self.assertEqual(json.loads(metrics.export_metrics())['recent_errors'][0]['type'], "sync")
+    
+    def test_recent_errors_tail(self):
+        """测试指标只返回最近 10 条错误且保持时间顺序，健康检查最多统计 100 条"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor.metrics import MetricsCollector
+        
+        metrics = MetricsCollector(MonitorConfig())
+        for i in range(150):
+            metrics.record_error("sync", str(i))
+        
+        messages = [error['message'] for error in metrics.get_metrics()['recent_errors']]
+        self.assertEqual(messages, [str(i) for i in range(140, 150)])
+        self.assertEqual(metrics.get_health_status()['metrics_summary']['recent_errors'], 100)
+    
+    def test_metrics_snapshot_cached(self):
+        """测试有效期内重复获取指标返回同一份快照，过期后重新汇总"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor.metrics import MetricsCollector
+        
+        metrics = MetricsCollector(MonitorConfig(), snapshot_ttl=60)
+        first = metrics.get_metrics()
+        metrics.record_sync("db_to_feishu", "success")
+        self.assertIs(metrics.get_metrics(), first)
+        
+        # 健康检查只用原始指标，不经过快照缓存
+        self.assertEqual(metrics.get_health_status()['metrics_summary']['success_rates'],
+                         {'db_to_feishu': 100.0})
+        self.assertNotIn('success_rates', metrics.get_metrics_raw())
+        
+        metrics.snapshot_ttl = 0
+        self.assertEqual(metrics.get_metrics()['success_rates'], {'db_to_feishu': 100.0})
+    
+    def test_export_prometheus(self):
+        """测试 Prometheus 导出：每个指标的 HELP/TYPE 行在数值行之前"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor.metrics import MetricsCollector
+        
+        metrics = MetricsCollector(MonitorConfig())
+        metrics.record_sync_bulk("db_to_feishu", 3, 1)
+        metrics.update_queue_stats({'total': 5})
+        
+        lines = metrics.export_metrics('prometheus').split('\n')
+        self.assertIn('sync_total{direction="db_to_feishu",status="failed"} 1', lines)
+        self.assertIn('sync_success_rate{direction="db_to_feishu"} 75.0', lines)
+        self.assertEqual(lines[-3:], ['# HELP queue_size_total Sync queue size',
+                                      '# TYPE queue_size_total gauge',
+                                      'queue_size_total 5'])
+        self.assertLess(lines.index('# TYPE sync_total counter'),
+                        lines.index('sync_total{direction="db_to_feishu",status="success"} 3'))
+    
+    def test_send_alert_reuses_session(self):
+        """测试告警由后台线程复用会话连接发送，重复的告警不被丢弃"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor.metrics import MetricsCollector
+        
+        metrics = MetricsCollector(MonitorConfig(alert_webhook="https://example.com/hook"))
+        metrics._http = Mock()
+        metrics._http.post.return_value = Mock(status_code=200)
+        
+        metrics.send_alert('WARNING', 'degraded')
+        metrics.send_alert('WARNING', 'degraded')
+        metrics.send_alert('CRITICAL', 'unhealthy')
+        
+        # 关闭时先发送完已排队的告警
+        metrics.close()
+        self.assertEqual(metrics._http.post.call_count, 3)
+        self.assertEqual(metrics._http.post.call_args[1]['json']['type'], 'CRITICAL')
+        metrics._http.close.assert_called_once()
+    
+    def test_send_alert_drops_when_queue_full(self):
+        """测试告警队列满时丢弃并计数，不阻塞调用方"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor import metrics as metrics_module
+        
+        metrics = metrics_module.MetricsCollector(MonitorConfig(alert_webhook="https://example.com/hook"),
+                                                  snapshot_ttl=0)
+        metrics._alert_thread = Mock()  # 不启动发送线程，队列不会被取走
+        
+        for i in range(metrics_module.ALERT_QUEUE_SIZE + 2):
+            metrics.send_alert(f'TYPE{i}', 'message')
+        
+        self.assertEqual(metrics.alerts_dropped, 2)
+        self.assertEqual(metrics.get_metrics()['alerts_dropped'], 2)
+    
+    def test_alert_payload_by_webhook(self):
+        """测试按 webhook 地址选择告警格式"""
+        from feishu_db_sync.config.config import MonitorConfig
+        from feishu_db_sync.monitor.metrics import MetricsCollector
+        
+        feishu = MetricsCollector(MonitorConfig(alert_webhook="https://open.feishu.cn/open-apis/bot/v2/hook/x"))
+        payload = feishu._build_alert_payload('WARNING', 'degraded', {'a': 1}, time.time())
+        self.assertEqual(payload['msg_type'], 'text')
+        self.assertTrue(payload['content']['text'].startswith('【WARNING】degraded\n'))
+        
+        generic = MetricsCollector(MonitorConfig(alert_webhook="https://example.com/hook"))
+        payload = generic._build_alert_payload('WARNING', 'degraded', None, time.time())
+        self.assertEqual((payload['type'], payload['details'], payload['service']),
+                         ('WARNING', {}, 'feishu_db_sync'))
 
 
 class TestIntegration(unittest.TestCase):
     """集成测试"""
     
+    def setUp(self):
+        # 配置文件放在临时目录，不在工作目录生成 config.json，多进程并行运行时互不干扰
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmpdir.name, "config.json")
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
     @patch('feishu_db_sync.core.sync_service.Database')
     @patch('feishu_db_sync.core.sync_service.FeishuClient')
     def test_sync_service_initialization(self, mock_feishu, mock_db):
         """测试同步服务初始化"""
         # 创建配置
-        config = Config()
+        config = Config(self.config_path)
         config.database = DatabaseConfig(host="localhost", database="test")
         config.feishu = FeishuConfig(app_id="test_id", app_secret="test_secret")
         config.sync = SyncConfig(table_mapping={"TestDB:users": "users"})
@@ -273,6 +1175,141 @@ class TestIntegration(unittest.TestCase):
         self.assertIsNotNone(service.database)
         self.assertIsNotNone(service.change_detector)
         self.assertIsNotNone(service.queue_processor)
+    
+    @patch('feishu_db_sync.core.sync_service.Database')
+    @patch('feishu_db_sync.core.sync_service.FeishuClient')
+    def test_process_queue_items(self, mock_feishu, mock_db):
+        """测试队列项并发同步：开头的 INSERT 合并批量，同一记录的后续队列项随后执行"""
+        from concurrent.futures import ThreadPoolExecutor
+        from feishu_db_sync.core.sync_service import SyncService
+        from feishu_db_sync.db.models import SyncQueue, SyncAction
+        
+        config = Config(self.config_path)
+        config.database = DatabaseConfig(host="localhost", database="test")
+        config.feishu = FeishuConfig(app_id="test_id", app_secret="test_secret")
+        config.sync = SyncConfig(table_mapping={"TestDB:users": "users"})
+        
+        service = SyncService(config)
+        service.queue_processor = Mock(spec=QueueProcessor)
+        service.sync_worker = Mock(spec=SyncWorker)
+        service.sync_worker.sync_inserts_to_feishu.return_value = {1: True, 2: True}
+        service.sync_worker.sync_db_to_feishu.return_value = True
+        
+        items = [
+            SyncQueue(id=1, table_name="users", record_id="1", action=SyncAction.INSERT.value),
+            SyncQueue(id=2, table_name="users", record_id="2", action=SyncAction.INSERT.value),
+            SyncQueue(id=3, table_name="users", record_id="1", action=SyncAction.DELETE.value),
+            SyncQueue(id=4, table_name="orders", record_id="9", action=SyncAction.INSERT.value),
+        ]
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            service._process_queue_items(executor, items)
+        
+        service.queue_processor.mark_failed_batch.assert_called_once_with([4], "No mapping for table orders")
+        service.sync_worker.sync_inserts_to_feishu.assert_called_once_with(
+            items[:2], "TestDB", "users"
+        )
+        service.sync_worker.sync_db_to_feishu.assert_called_once_with(items[2], "TestDB", "users")
+        service.queue_processor.get_feishu_ids.assert_called_once_with("users", ["1"])
+        self.assertEqual(service.stats['db_to_feishu_success'], 3)
+        service.queue_processor.mark_skipped_batch.assert_not_called()
+    
+    def test_coalesce_chain(self):
+        """测试同一记录的连续修改合并，DELETE 前后不合并"""
+        from feishu_db_sync.core.sync_service import SyncService
+        from feishu_db_sync.db.models import SyncQueue, SyncAction
+        
+        def item(queue_id, action, data=None):
+            return (SyncQueue(id=queue_id, table_name="users", record_id="1", action=action,
+                              new_data=data, sync_hash=f"h{queue_id}"), "TestDB:users")
+        
+        chain = [
+            item(1, SyncAction.INSERT.value, {"name": "a", "age": 1}),
+            item(2, SyncAction.UPDATE.value, {"name": "b"}),
+            item(3, SyncAction.UPDATE.value, {"name": "c"}),
+            item(4, SyncAction.DELETE.value),
+            item(5, SyncAction.UPDATE.value, {"name": "d"}),
+        ]
+        skipped = []
+        
+        result = SyncService._coalesce_chain(chain, skipped)
+        
+        self.assertEqual([entry[0].id for entry in result], [3, 4, 5])
+        self.assertEqual(result[0][0].action, SyncAction.INSERT.value)
+        self.assertEqual(result[0][0].new_data, {"name": "c", "age": 1})
+        self.assertEqual(skipped, [1, 2])
+    
+    @patch('feishu_db_sync.core.sync_service.Database')
+    @patch('feishu_db_sync.core.sync_service.FeishuClient')
+    def test_feishu_poll_backoff(self, mock_feishu, mock_db):
+        """测试无变更时轮询间隔翻倍直到上限，有变更时恢复"""
+        from feishu_db_sync.core.sync_service import SyncService
+        
+        config = Config(self.config_path)
+        config.database = DatabaseConfig(host="localhost", database="test")
+        config.feishu = FeishuConfig(app_id="test_id", app_secret="test_secret")
+        config.sync = SyncConfig(table_mapping={"TestDB:users": "users"},
+                                 poll_interval=5, max_poll_interval=15)
+        
+        service = SyncService(config)
+        service.running = True
+        service.change_detector = Mock()
+        service.change_detector.batch_detect_changes.side_effect = [
+            {}, {}, {}, {"TestDB:users": [ChangeRecord("rec1", 'insert', new_data={})]}
+        ]
+        service.sync_worker = Mock(spec=SyncWorker)
+        service.sync_worker.sync_feishu_to_db.return_value = True
+        service._stop_event = Mock()
+        service._stop_event.wait.side_effect = [False, False, False, True]
+        
+        service._feishu_sync_loop()
+        
+        self.assertEqual([c[0][0] for c in service._stop_event.wait.call_args_list], [10, 15, 15, 5])
+    
+    @patch('feishu_db_sync.core.sync_service.Database')
+    @patch('feishu_db_sync.core.sync_service.FeishuClient')
+    def test_stop_wakes_sleeping_loops(self, mock_feishu, mock_db):
+        """测试停止服务时立即唤醒休眠中的清理循环"""
+        import threading
+        from feishu_db_sync.core.sync_service import SyncService
+        
+        config = Config(self.config_path)
+        config.database = DatabaseConfig(host="localhost", database="test")
+        config.feishu = FeishuConfig(app_id="test_id", app_secret="test_secret")
+        config.sync = SyncConfig(table_mapping={"TestDB:users": "users"})
+        
+        service = SyncService(config)
+        service.running = True
+        thread = threading.Thread(target=service._cleanup_loop)
+        thread.start()
+        service._threads.append(thread)
+        
+        service.stop()
+        
+        self.assertFalse(thread.is_alive())
+    
+    @patch('feishu_db_sync.core.sync_service.ProcessPoolExecutor')
+    @patch('feishu_db_sync.core.sync_service.Database')
+    @patch('feishu_db_sync.core.sync_service.FeishuClient')
+    def test_stop_shuts_down_mapping_pool(self, mock_feishu, mock_db, mock_pool):
+        """测试停止服务时关闭字段转换的进程池，重新启动时重建"""
+        from feishu_db_sync.core.sync_service import SyncService
+        
+        config = Config(self.config_path)
+        config.database = DatabaseConfig(host="localhost", database="test")
+        config.feishu = FeishuConfig(app_id="test_id", app_secret="test_secret")
+        config.sync = SyncConfig(table_mapping={"TestDB:users": "users"}, mapping_processes=2)
+        
+        service = SyncService(config)
+        pool = service._mapping_pool
+        
+        service.stop()
+        
+        pool.shutdown.assert_called_once_with(wait=True)
+        self.assertIsNone(service._mapping_pool)
+        
+        self.assertTrue(service._open_mapping_pool())
+        self.assertEqual(mock_pool.call_count, 2)
 
 
 if __name__ == '__main__':
@@ -6,8 +6,8 @@
 import os
 import sys
 import signal
-import time
 import argparse
+import threading
 from pathlib import Path
 from loguru import logger
 
@@ -19,6 +19,10 @@ from feishu_db_sync.core.sync_service import SyncService
 from feishu_db_sync.monitor.logger import setup_logger
 
 
+# 输出状态信息的间隔（秒）
+STATUS_INTERVAL = 60
+
+
 class SyncApplication:
     """同步应用主类"""
     
@@ -27,6 +31,9 @@ class SyncApplication:
         self.sync_service = None
         self.running = False
         
+        # 收到停止信号时置位，主循环的等待立即返回
+        self._stop_event = threading.Event()
+        
         # 注册信号处理
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -34,7 +41,8 @@ class SyncApplication:
     def _signal_handler(self, signum, frame):
         """信号处理器"""
         logger.info(f"Received signal {signum}, shutting down...")
-        self.stop()
+        # 只唤醒主循环，停止服务由 start() 的 finally 完成
+        self._stop_event.set()
     
     def initialize(self):
         """初始化应用"""
@@ -74,15 +82,10 @@ class SyncApplication:
             
             logger.info("Application started, press Ctrl+C to stop")
             
-            # 主循环
-            while self.running:
-                try:
-                    # 定期输出状态
-                    time.sleep(60)
-                    if self.running:
-                        self._print_status()
-                except KeyboardInterrupt:
-                    break
+            # 主循环：定期输出状态，收到停止信号时立即退出；
+            # 等待期间主线程阻塞在锁上不占用 CPU，信号到达时等待被中断并执行信号处理器
+            while not self._stop_event.wait(STATUS_INTERVAL):
+                self._print_status()
                 
         except Exception as e:
             logger.error(f"Application error: {e}")
@@ -92,6 +95,7 @@ class SyncApplication:
     
     def stop(self):
         """停止应用"""
+        self._stop_event.set()
         if not self.running:
             return
         
@@ -31,12 +31,15 @@ setup(
     install_requires=[
         "lark-oapi>=1.2.0",
         "loguru>=0.7.0",
+        "requests>=2.28.0",
+        "typing_extensions>=4.0.0; python_version<'3.8'",
     ],
     extras_require={
         "dev": [
             "pytest>=7.0.0",
             "pytest-asyncio>=0.21.0",
             "pytest-cov>=4.0.0",
+            "pytest-xdist>=3.0.0",
             "black>=23.0.0",
             "isort>=5.12.0",
             "flake8>=6.0.0",
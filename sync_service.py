@@ -7,14 +7,152 @@ import time
 import json
 import hashlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
+import functools
 import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import pymysql
+from dbutils.pooled_db import PooledDB
 from loguru import logger
 
 from feishu_bitable_db.db.db import DBImpl
 from feishu_bitable_db.db.types import SearchCmd
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:  # 未安装 xxhash 时回退到 hashlib.md5
+    xxhash = None
+
+
+# 计算记录哈希时排除的系统字段
+_HASH_EXCLUDE = frozenset({'id', 'created_at', 'updated_at', '_sync_source'})
+
+# 快照按记录ID的哈希分桶，每个桶保存一个根哈希，轮询时只比对根哈希变化的桶
+SNAPSHOT_BUCKETS = 256
+
+# 防循环同步的时间窗口（秒），与查询 sync_log 时的 INTERVAL 一致
+LOOP_WINDOW_SECONDS = 10
+
+# 数据库连接池的最大连接数
+DB_POOL_SIZE = 8
+
+# 每轮从 sync_queue 取出的最大记录数
+SYNC_QUEUE_BATCH = 50
+
+# 并发同步的最大表数
+SYNC_TABLE_WORKERS = 4
+
+# 飞书表格快照过期多少个轮询间隔后不再返回旧值，改为等待刷新完成
+SNAPSHOT_MAX_STALE_POLLS = 3
+
+# IN 列表每条语句的最大参数个数，避免超过 max_allowed_packet
+SQL_IN_CHUNK = 1000
+
+# 清理旧日志的间隔（秒），不必每轮轮询都清理
+CLEANUP_INTERVAL = 600
+
+# 清理旧日志时每条 DELETE 删除的最大行数，避免大事务长时间锁表
+CLEANUP_BATCH_SIZE = 5000
+
+# 飞书→数据库方向的同步日志（ON DUPLICATE KEY 子句不能带参数，否则 executemany 无法合并为多行插入）
+_LOG_INSERT_SQL = """
+    INSERT INTO sync_log 
+    (sync_id, table_name, record_id, direction, sync_hash, status)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE status = VALUES(status)
+"""
+
+
+def _canonical_bytes(data: Dict[str, Any]) -> bytes:
+    """按键排序的紧凑 JSON 字节串，作为数据哈希的规范编码"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(data, sort_keys=True, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def _digest(data: bytes) -> str:
+    """计算规范编码的摘要，只用于判断数据是否变化"""
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.md5(data).hexdigest()
+
+
+@functools.lru_cache(maxsize=256)
+def _upsert_sql(table: str, columns: Tuple[str, ...]) -> str:
+    """生成按 feishu_id 去重的 UPSERT 语句，同一张表的字段组合只生成一次"""
+    update_pairs = [f"{col} = VALUES({col})" for col in columns if col != 'feishu_id']
+    return f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))})
+        ON DUPLICATE KEY UPDATE {', '.join(update_pairs) or 'feishu_id = feishu_id'}
+    """
+
+
+def _bucket_of(record_id: str) -> int:
+    """记录所属的桶：记录ID的 CRC32 的最低字节（只用于分桶，不需要 MD5）"""
+    return zlib.crc32(record_id.encode()) & 0xFF
+
+
+def _bucket_root(bucket: Dict[str, str]) -> str:
+    """桶的根哈希：按记录ID排序的 (记录ID, 记录哈希) 序列的哈希"""
+    return hashlib.md5('\n'.join(
+        f"{record_id}:{record_hash}" for record_id, record_hash in sorted(bucket.items())
+    ).encode()).hexdigest()
+
+
+class AsyncRefreshCache:
+    """
+    后台刷新缓存（stale-while-revalidate）
+    
+    值过期后先返回旧值，同时在线程池中刷新，每个键同一时间只有一个刷新任务；
+    没有旧值或旧值超过 max_stale 时等待刷新完成
+    """
+    
+    def __init__(self, executor: ThreadPoolExecutor, ttl: float, max_stale: float):
+        self._executor = executor
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: Dict[str, Tuple[Any, float]] = {}  # 键 -> (值, 加载时间)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """获取值，loader 在后台线程中加载新值"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                return entry[0]
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._load, key, loader)
+                self._inflight[key] = future
+        
+        if entry is not None and now - entry[1] < self.max_stale:
+            return entry[0]
+        return future.result()
+    
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """加载新值并写入缓存，失败时保留旧值"""
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (value, time.monotonic())
+            return value
+        except Exception as e:
+            logger.error(f"Error refreshing {key}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
 
 class RealtimeSyncService:
     """实时同步服务"""
@@ -26,6 +164,19 @@ class RealtimeSyncService:
         # 数据库配置
         self.db_config = db_config
         
+        # 数据库连接池，首次使用时才建立连接
+        self.pool = PooledDB(
+            creator=pymysql,
+            maxconnections=DB_POOL_SIZE,
+            blocking=True,
+            host=db_config['host'],
+            user=db_config['user'],
+            password=db_config['password'],
+            database=db_config['database'],
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor
+        )
+        
         # 同步映射配置
         # 格式: {"飞书数据库:飞书表": "MySQL表"}
         self.table_mapping = {
@@ -36,121 +187,253 @@ class RealtimeSyncService:
         # 轮询间隔（秒）
         self.poll_interval = 5
         
-        # 内存缓存，存储表格快照
-        self.snapshots = {}
+        # 内存缓存，存储表格快照: {"飞书数据库:飞书表": [{记录ID: 记录哈希}, ...]}，每个桶一个字典
+        self.snapshots: Dict[str, List[Dict[str, str]]] = {}
+        
+        # 每张表各桶的根哈希，与快照的桶一一对应
+        self.bucket_roots: Dict[str, List[str]] = {}
+        
+        # 数据库ID到飞书记录ID的映射: {"飞书数据库:飞书表": {数据库ID: 飞书记录ID}}，
+        # 每张表首次查找时从飞书加载一次，之后随插入和删除维护
+        self.id_map: Dict[str, Dict[str, str]] = {}
+        
+        # 本进程最近写入 db_to_feishu 同步日志的哈希，分新旧两代，每个时间窗口轮换一次，
+        # 不在其中的哈希不需要再查询 sync_log
+        self._reverse_hashes: Set[str] = set()
+        self._reverse_hashes_prev: Set[str] = set()
+        self._reverse_rotated_at = time.monotonic()
+        self._reverse_lock = threading.Lock()
+        
+        # 多张表并发同步的线程池
+        self._executor = ThreadPoolExecutor(max_workers=SYNC_TABLE_WORKERS,
+                                            thread_name_prefix='table-sync')
+        
+        # 飞书表格快照的后台刷新缓存，读取飞书慢时同步循环先处理上一次读到的快照；
+        # 刷新任务使用单独的线程池，避免和同步任务互相等待
+        self._refresh_executor = ThreadPoolExecutor(max_workers=SYNC_TABLE_WORKERS,
+                                                    thread_name_prefix='feishu-refresh')
+        self._feishu_cache = AsyncRefreshCache(
+            self._refresh_executor,
+            ttl=self.poll_interval,
+            max_stale=self.poll_interval * SNAPSHOT_MAX_STALE_POLLS
+        )
         
         # 运行标志
         self.running = False
+        
+        # 数据库有变更时提前唤醒同步循环，不必等满轮询间隔
+        self._wakeup = threading.Event()
+        
+        # 上次清理旧日志的时间，None 表示尚未清理
+        self._last_cleanup: Optional[float] = None
     
     def get_db_connection(self):
-        """获取数据库连接"""
-        return pymysql.connect(
-            host=self.db_config['host'],
-            user=self.db_config['user'],
-            password=self.db_config['password'],
-            database=self.db_config['database'],
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        """从连接池获取数据库连接，退出 with 块时归还连接池"""
+        return self.pool.connection()
     
     def calculate_record_hash(self, record: Dict[str, Any]) -> str:
         """计算记录的哈希值"""
         # 移除系统字段
-        data = {k: v for k, v in record.items() 
-                if k not in ['id', 'created_at', 'updated_at', '_sync_source']}
-        return hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        data = {k: v for k, v in record.items() if k not in _HASH_EXCLUDE}
+        return _digest(_canonical_bytes(data))
     
     def sync_feishu_to_db(self):
         """从飞书同步到数据库"""
         logger.info("Starting Feishu to DB sync...")
         
-        for feishu_table, db_table in self.table_mapping.items():
-            try:
-                feishu_db, feishu_table_name = feishu_table.split(':')
-                
-                # 获取飞书表格所有记录
-                records = self.feishu.read(feishu_db, feishu_table_name, [])
+        tables = list(self.table_mapping.items())
+        if len(tables) <= 1:
+            for feishu_table, db_table in tables:
+                self._sync_single_table(feishu_table, db_table)
+            return
+        
+        # 各表的飞书请求和数据库写入互不依赖，并发执行
+        futures = [
+            self._executor.submit(self._sync_single_table, feishu_table, db_table)
+            for feishu_table, db_table in tables
+        ]
+        for future in as_completed(futures):
+            future.result()
+    
+    def _sync_single_table(self, feishu_table: str, db_table: str):
+        """同步单个飞书表到数据库，失败时只记录日志"""
+        try:
+            feishu_db, feishu_table_name = feishu_table.split(':')
+            snapshot_key = f"{feishu_db}:{feishu_table_name}"
+            
+            # 读取飞书表格的新快照（可能是后台刷新前的旧值，下一轮会读到新值）
+            new_snapshot, records_by_bucket, new_roots = self._feishu_cache.get(
+                snapshot_key, lambda: self._read_feishu_snapshot(feishu_db, feishu_table_name)
+            )
+            
+            # 获取当前快照，只处理根哈希变化的桶
+            old_snapshot = self.snapshots.get(snapshot_key)
+            old_roots = self.bucket_roots.get(snapshot_key)
+            if old_snapshot is None or old_roots is None:
+                old_snapshot = [{} for _ in range(SNAPSHOT_BUCKETS)]
+                old_roots = [None] * SNAPSHOT_BUCKETS
+            changed_buckets = [
+                bucket for bucket in range(SNAPSHOT_BUCKETS)
+                if new_roots[bucket] != old_roots[bucket]
+            ]
+            
+            # 所有桶都未变化时不需要连接数据库
+            if not changed_buckets:
+                return
+            
+            # 收集变化的桶中的记录，整张表一次性写入
+            with self.get_db_connection() as conn:
+                cursor = conn.cursor()
                 
-                # 获取当前快照
-                snapshot_key = f"{feishu_db}:{feishu_table_name}"
-                old_snapshot = self.snapshots.get(snapshot_key, {})
-                new_snapshot = {}
+                changed: List[Tuple[Dict[str, Any], str]] = []
+                deleted_ids: List[str] = []
+                for bucket in changed_buckets:
+                    self._collect_bucket_changes(records_by_bucket[bucket],
+                                                 old_snapshot[bucket], new_snapshot[bucket],
+                                                 changed, deleted_ids)
                 
-                # 处理每条记录
-                with self.get_db_connection() as conn:
-                    cursor = conn.cursor()
-                    
-                    for record in records:
-                        record_id = record['id']
-                        record_hash = self.calculate_record_hash(record)
-                        new_snapshot[record_id] = record_hash
-                        
-                        # 检查是否有变更
-                        if old_snapshot.get(record_id) != record_hash:
-                            # 检查同步日志，避免循环同步
-                            cursor.execute("""
-                                SELECT COUNT(*) as count FROM sync_log 
-                                WHERE sync_hash = %s 
-                                AND direction = 'db_to_feishu'
-                                AND created_at > DATE_SUB(NOW(), INTERVAL 10 SECOND)
-                            """, (record_hash,))
-                            
-                            if cursor.fetchone()['count'] == 0:
-                                # 同步到数据库
-                                self._sync_record_to_db(cursor, db_table, record)
-                                
-                                # 记录同步日志
-                                cursor.execute("""
-                                    INSERT INTO sync_log 
-                                    (sync_id, table_name, record_id, direction, sync_hash, status)
-                                    VALUES (%s, %s, %s, %s, %s, %s)
-                                    ON DUPLICATE KEY UPDATE status = %s
-                                """, (
-                                    f"{db_table}_{record_id}_{record_hash}",
-                                    db_table,
-                                    record_id,
-                                    'feishu_to_db',
-                                    record_hash,
-                                    'completed',
-                                    'completed'
-                                ))
-                    
-                    # 处理删除的记录
-                    for old_id in set(old_snapshot.keys()) - set(new_snapshot.keys()):
-                        cursor.execute(f"""
-                            DELETE FROM {db_table} WHERE feishu_id = %s
-                        """, (old_id,))
-                        logger.info(f"Deleted record {old_id} from {db_table}")
-                    
-                    conn.commit()
+                # 检查同步日志，跳过刚从数据库同步过来的记录，避免循环同步
+                looped = self._recently_synced_to_feishu(
+                    cursor, [record_hash for _, record_hash in changed]
+                )
+                if looped:
+                    changed = [item for item in changed if item[1] not in looped]
                 
-                # 更新快照
-                self.snapshots[snapshot_key] = new_snapshot
-                
-            except Exception as e:
-                logger.error(f"Error syncing {feishu_table} to DB: {e}")
+                self._write_changes_to_db(cursor, db_table, changed, deleted_ids)
+                conn.commit()
+            
+            # 更新快照
+            self.snapshots[snapshot_key] = new_snapshot
+            self.bucket_roots[snapshot_key] = new_roots
+            
+        except Exception as e:
+            logger.error(f"Error syncing {feishu_table} to DB: {e}")
     
-    def _sync_record_to_db(self, cursor, table: str, record: Dict[str, Any]):
-        """同步单条记录到数据库"""
-        # 移除飞书特有字段
-        data = {k: v for k, v in record.items() if k != 'id'}
-        data['feishu_id'] = record['id']
+    def _read_feishu_snapshot(self, feishu_db: str, feishu_table_name: str) -> Tuple[
+            List[Dict[str, str]], List[List[Dict[str, Any]]], List[str]]:
+        """逐页获取飞书表格记录，按桶计算快照，返回 (各桶记录哈希, 各桶记录, 各桶根哈希)"""
+        new_snapshot: List[Dict[str, str]] = [{} for _ in range(SNAPSHOT_BUCKETS)]
+        records_by_bucket: List[List[Dict[str, Any]]] = [[] for _ in range(SNAPSHOT_BUCKETS)]
+        for record in self.feishu.iter_read(feishu_db, feishu_table_name, []):
+            bucket = _bucket_of(record['id'])
+            new_snapshot[bucket][record['id']] = self.calculate_record_hash(record)
+            records_by_bucket[bucket].append(record)
+        return new_snapshot, records_by_bucket, [_bucket_root(bucket) for bucket in new_snapshot]
+    
+    def _collect_bucket_changes(self, records: List[Dict[str, Any]],
+                                old_bucket: Dict[str, str], new_bucket: Dict[str, str],
+                                changed: List[Tuple[Dict[str, Any], str]],
+                                deleted_ids: List[str]):
+        """收集一个桶中哈希变化的 (记录, 记录哈希) 和已不存在的记录ID"""
+        for record in records:
+            record_hash = new_bucket[record['id']]
+            if old_bucket.get(record['id']) != record_hash:
+                changed.append((record, record_hash))
         
-        # 构建 UPSERT 语句
-        columns = list(data.keys())
-        values = list(data.values())
+        deleted_ids.extend(old_bucket.keys() - new_bucket.keys())
+    
+    def _write_changes_to_db(self, cursor, db_table: str,
+                             changed: List[Tuple[Dict[str, Any], str]], deleted_ids: List[str]):
+        """批量写入变更记录和同步日志，并删除已不存在的记录"""
+        if changed:
+            # 字段相同的记录共用一条 UPSERT 语句
+            upserts: Dict[Tuple[str, ...], List[List[Any]]] = {}
+            for record, _ in changed:
+                columns, values = self._build_upsert(record)
+                upserts.setdefault(columns, []).append(values)
+            for columns, rows in upserts.items():
+                cursor.executemany(_upsert_sql(db_table, columns), rows)
+            
+            # 写入时触发器把这些记录加入了 sync_queue，数据库此时已与飞书一致，不必再同步回飞书
+            feishu_ids = [record['id'] for record, _ in changed]
+            for start in range(0, len(feishu_ids), SQL_IN_CHUNK):
+                chunk = feishu_ids[start:start + SQL_IN_CHUNK]
+                cursor.execute(f"""
+                    UPDATE sync_queue q JOIN {db_table} t ON q.record_id = CAST(t.id AS CHAR)
+                    SET q.status = 'suppressed', q.processed_at = NOW()
+                    WHERE q.table_name = %s AND q.status = 'pending'
+                    AND t.feishu_id IN ({', '.join(['%s'] * len(chunk))})
+                """, [db_table, *chunk])
+            
+            # 记录同步日志
+            cursor.executemany(_LOG_INSERT_SQL, [
+                (
+                    f"{db_table}_{record['id']}_{record_hash}",
+                    db_table,
+                    record['id'],
+                    'feishu_to_db',
+                    record_hash,
+                    'completed'
+                )
+                for record, record_hash in changed
+            ])
+            logger.info(f"Synced {len(changed)} records to {db_table}")
         
-        # ON DUPLICATE KEY UPDATE
-        update_pairs = [f"{col} = VALUES({col})" for col in columns if col != 'feishu_id']
+        # 处理删除的记录
+        if deleted_ids:
+            for start in range(0, len(deleted_ids), SQL_IN_CHUNK):
+                chunk = deleted_ids[start:start + SQL_IN_CHUNK]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"SELECT id FROM {db_table} WHERE feishu_id IN ({placeholders})", chunk)
+                db_ids = [str(row['id']) for row in cursor.fetchall()]
+                if not db_ids:
+                    continue
+                
+                cursor.execute(f"DELETE FROM {db_table} WHERE feishu_id IN ({placeholders})", chunk)
+                
+                # 删除触发器加入的队列项同样不必同步回飞书
+                cursor.execute(f"""
+                    UPDATE sync_queue 
+                    SET status = 'suppressed', processed_at = NOW()
+                    WHERE table_name = %s AND status = 'pending'
+                    AND record_id IN ({', '.join(['%s'] * len(db_ids))})
+                """, [db_table, *db_ids])
+            logger.info(f"Deleted {len(deleted_ids)} records from {db_table}")
+    
+    def _rotate_reverse_hashes(self):
+        """每个时间窗口把新一代哈希集合转为旧一代，丢弃更早的哈希（调用方持有 _reverse_lock）"""
+        now = time.monotonic()
+        if now - self._reverse_rotated_at >= LOOP_WINDOW_SECONDS:
+            self._reverse_hashes_prev = self._reverse_hashes
+            self._reverse_hashes = set()
+            self._reverse_rotated_at = now
+    
+    def _remember_reverse_hash(self, sync_hash: str):
+        """记录本进程写入 db_to_feishu 同步日志的哈希"""
+        with self._reverse_lock:
+            self._rotate_reverse_hashes()
+            self._reverse_hashes.add(sync_hash)
+    
+    def _recently_synced_to_feishu(self, cursor, record_hashes: List[str]) -> Set[str]:
+        """
+        返回其中刚从数据库同步到飞书的哈希
         
-        sql = f"""
-            INSERT INTO {table} ({', '.join(columns)})
-            VALUES ({', '.join(['%s'] * len(columns))})
-            ON DUPLICATE KEY UPDATE {', '.join(update_pairs)}
+        只有本进程在最近两个时间窗口内写入过的哈希才需要查询 sync_log 确认，
+        其余哈希不可能命中；需要确认的哈希合并为一次查询
         """
+        with self._reverse_lock:
+            self._rotate_reverse_hashes()
+            candidates = [
+                record_hash for record_hash in set(record_hashes)
+                if record_hash in self._reverse_hashes or record_hash in self._reverse_hashes_prev
+            ]
+        if not candidates:
+            return set()
         
-        cursor.execute(sql, values)
-        logger.info(f"Synced record {record['id']} to {table}")
+        cursor.execute(f"""
+            SELECT DISTINCT sync_hash FROM sync_log 
+            WHERE sync_hash IN ({', '.join(['%s'] * len(candidates))})
+            AND direction = 'db_to_feishu'
+            AND created_at > DATE_SUB(NOW(), INTERVAL 10 SECOND)
+        """, candidates)
+        return {row['sync_hash'] for row in cursor.fetchall()}
+    
+    def _build_upsert(self, record: Dict[str, Any]) -> Tuple[Tuple[str, ...], List[Any]]:
+        """返回单条记录 UPSERT 的字段和参数，飞书记录ID写入 feishu_id 字段"""
+        # 移除飞书特有字段
+        data = {k: v for k, v in record.items() if k not in ('id', 'feishu_id')}
+        data['feishu_id'] = record['id']
+        return tuple(data), list(data.values())
     
     def sync_db_to_feishu(self):
         """从数据库同步到飞书"""
@@ -160,28 +443,47 @@ class RealtimeSyncService:
             cursor = conn.cursor()
             
             # 获取待同步的记录
+            # 飞书同步到数据库时产生的队列项在写入时已标记为 suppressed，这里只需按索引取 pending
             cursor.execute("""
-                SELECT q.*, l.created_at as last_sync
-                FROM sync_queue q
-                LEFT JOIN sync_log l ON q.sync_hash = l.sync_hash 
-                    AND l.direction = 'feishu_to_db'
-                WHERE q.status = 'pending' 
-                AND q.retry_count < 3
-                AND (l.created_at IS NULL OR l.created_at < DATE_SUB(NOW(), INTERVAL 10 SECOND))
-                ORDER BY q.created_at ASC
-                LIMIT 50
-            """)
+                SELECT * FROM sync_queue 
+                WHERE status = 'pending' 
+                AND retry_count < 3
+                ORDER BY created_at ASC
+                LIMIT %s
+            """, (SYNC_QUEUE_BATCH,))
             
             queue_items = cursor.fetchall()
             
+            # 取满一批说明队列中还有积压，处理完后立即开始下一轮
+            if len(queue_items) >= SYNC_QUEUE_BATCH:
+                self.notify_change()
+            
+            # 同一记录的多次变更只同步最新的一次（按 created_at 升序，后出现的覆盖前面的）
+            latest = {}
             for item in queue_items:
+                latest[(item['table_name'], item['record_id'])] = item
+            
+            # 被覆盖的队列项直接标记为已处理
+            superseded_ids = list({item['id'] for item in queue_items} - {
+                item['id'] for item in latest.values()
+            })
+            for start in range(0, len(superseded_ids), SQL_IN_CHUNK):
+                chunk = superseded_ids[start:start + SQL_IN_CHUNK]
+                cursor.execute(f"""
+                    UPDATE sync_queue 
+                    SET status = 'completed', processed_at = NOW()
+                    WHERE id IN ({', '.join(['%s'] * len(chunk))})
+                """, chunk)
+            
+            # MySQL表到飞书表的反向映射
+            reverse_mapping = {}
+            for ft, dt in self.table_mapping.items():
+                reverse_mapping.setdefault(dt, ft)
+            
+            for item in latest.values():
                 try:
                     # 找到对应的飞书表
-                    feishu_table = None
-                    for ft, dt in self.table_mapping.items():
-                        if dt == item['table_name']:
-                            feishu_table = ft
-                            break
+                    feishu_table = reverse_mapping.get(item['table_name'])
                     
                     if not feishu_table:
                         continue
@@ -220,6 +522,7 @@ class RealtimeSyncService:
                         'completed',
                         'completed'
                     ))
+                    self._remember_reverse_hash(item['sync_hash'])
                     
                 except Exception as e:
                     logger.error(f"Error syncing queue item {item['id']}: {e}")
@@ -244,6 +547,8 @@ class RealtimeSyncService:
                       if k not in ['id', 'feishu_id', 'created_at', 'updated_at']}
         
         record_id = self.feishu.create(database, table, feishu_data)
+        if data.get('id') is not None:
+            self._get_id_map(database, table)[str(data['id'])] = record_id
         logger.info(f"Created record {record_id} in Feishu {database}:{table}")
     
     def _update_to_feishu(self, database: str, table: str, record_id: str, data: Dict[str, Any]):
@@ -269,16 +574,41 @@ class RealtimeSyncService:
         feishu_id = self._find_feishu_record_id(database, table, record_id)
         if feishu_id:
             self.feishu.delete(database, table, feishu_id)
+            self._get_id_map(database, table).pop(str(record_id), None)
             logger.info(f"Deleted record {feishu_id} from Feishu {database}:{table}")
     
     def _find_feishu_record_id(self, database: str, table: str, db_record_id: str) -> Optional[str]:
-        """根据数据库记录 ID 查找飞书记录 ID"""
-        # 这里需要维护一个 ID 映射关系
-        # 简化示例：假设有一个字段存储了数据库 ID
+        """根据数据库记录 ID 查找飞书记录 ID，优先查映射，未命中时再查询飞书"""
+        id_map = self._get_id_map(database, table)
+        feishu_id = id_map.get(str(db_record_id))
+        if feishu_id:
+            return feishu_id
+        
+        # 简化示例：假设有一个字段存储了数据库 ID；不使用查询缓存，避免过期的“未找到”
         records = self.feishu.read(database, table, [
             SearchCmd(key="db_id", operator="=", val=db_record_id)
-        ])
-        return records[0]['id'] if records else None
+        ], use_cache=False)
+        if not records:
+            return None
+        id_map[str(db_record_id)] = records[0]['id']
+        return records[0]['id']
+    
+    def _get_id_map(self, database: str, table: str) -> Dict[str, str]:
+        """获取表的ID映射，首次使用时逐页读取飞书表，按 db_id 字段建立映射"""
+        key = f"{database}:{table}"
+        id_map = self.id_map.get(key)
+        if id_map is None:
+            id_map = {
+                str(record['db_id']): record['id']
+                for record in self.feishu.iter_read(database, table, [])
+                if record.get('db_id') is not None
+            }
+            self.id_map[key] = id_map
+        return id_map
+    
+    def notify_change(self):
+        """通知有新的数据库变更，同步循环立即开始下一轮"""
+        self._wakeup.set()
     
     def run_sync_loop(self):
         """运行同步循环"""
@@ -296,22 +626,38 @@ class RealtimeSyncService:
             except Exception as e:
                 logger.error(f"Sync loop error: {e}")
             
-            time.sleep(self.poll_interval)
+            # 等待下一轮，期间有变更通知或停止服务时立即返回
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
     
     def _cleanup_old_logs(self):
-        """清理旧的同步日志"""
+        """清理旧的同步日志，每 CLEANUP_INTERVAL 秒最多执行一次"""
+        now = time.monotonic()
+        if self._last_cleanup is not None and now - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        
         with self.get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
+            self._delete_in_batches(conn, cursor, """
                 DELETE FROM sync_log 
                 WHERE created_at < DATE_SUB(NOW(), INTERVAL 1 DAY)
+                LIMIT %s
             """)
-            cursor.execute("""
+            self._delete_in_batches(conn, cursor, """
                 DELETE FROM sync_queue 
-                WHERE status = 'completed' 
+                WHERE status IN ('completed', 'suppressed') 
                 AND processed_at < DATE_SUB(NOW(), INTERVAL 1 HOUR)
+                LIMIT %s
             """)
+    
+    def _delete_in_batches(self, conn, cursor, sql: str):
+        """分批执行带 LIMIT 的 DELETE，每批单独提交"""
+        while True:
+            deleted = cursor.execute(sql, (CLEANUP_BATCH_SIZE,))
             conn.commit()
+            if deleted < CLEANUP_BATCH_SIZE:
+                break
     
     def start(self):
         """启动同步服务"""
@@ -329,6 +675,9 @@ class RealtimeSyncService:
         """停止同步服务"""
         logger.info("Stopping sync service...")
         self.running = False
+        self._wakeup.set()
+        self._executor.shutdown(wait=False)
+        self._refresh_executor.shutdown(wait=False)
 
 
 # 使用示例
@@ -6,7 +6,7 @@ import hashlib
 import json
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import threading
@@ -18,6 +18,46 @@ import redis
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:  # 未安装 xxhash 时回退到 hashlib.md5
+    xxhash = None
+
+
+# 数据库同步循环等待变更的超时时间（秒），超时后重新等待
+DB_CHANGE_WAIT_TIMEOUT = 1.0
+
+# 数据库变更队列的容量，队列满时丢弃新变更并计数，避免突发写入占满内存；
+# 写入方是 SQL 执行钩子，可能运行在消费队列的事件循环线程上，不能阻塞
+DB_CHANGE_QUEUE_SIZE = 128
+
+
+def _canonical_bytes(data: Dict[str, Any]) -> bytes:
+    """按键排序的紧凑 JSON 字节串，作为数据哈希的规范编码"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(data, sort_keys=True, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def _digest(data: bytes) -> str:
+    """计算规范编码的摘要，只用于判断数据是否变化"""
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.md5(data).hexdigest()
+
+
+def _table_digest(record_hashes: Dict[str, str]) -> str:
+    """整表摘要：按记录ID排序的 (记录ID, 记录哈希) 序列的哈希"""
+    return _digest('\n'.join(
+        f"{record_id}:{record_hash}" for record_id, record_hash in sorted(record_hashes.items())
+    ).encode('utf-8'))
+
 
 class SyncDirection(Enum):
     FEISHU_TO_DB = "feishu_to_db"
@@ -37,8 +77,7 @@ class SyncRecord:
     @staticmethod
     def calculate_hash(data: Dict[str, Any]) -> str:
         """计算数据哈希值"""
-        data_str = json.dumps(data, sort_keys=True)
-        return hashlib.md5(data_str.encode()).hexdigest()
+        return _digest(_canonical_bytes(data))
 
 
 class SyncLock:
@@ -71,42 +110,52 @@ class FeishuChangeDetector:
         self.feishu_db = feishu_db
         self.redis = redis_client
         self.snapshot_prefix = "feishu_snapshot:"
+        self.digest_prefix = "feishu_digest:"
         
     async def detect_changes(self, database: str, table: str) -> List[SyncRecord]:
-        """检测表格变更"""
-        changes = []
-        
-        # 获取当前所有记录
-        current_records = self.feishu_db.read(database, table, [])
+        """检测表格变更，飞书和 Redis 的阻塞调用在线程池中执行，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._detect_changes, database, table)
+    
+    def _detect_changes(self, database: str, table: str) -> List[SyncRecord]:
+        """检测表格变更（阻塞）"""
+        # 逐页获取当前记录，计算数据哈希
+        current_records = {}
+        current_hashes = {}
+        for record in self.feishu_db.iter_read(database, table, []):
+            current_records[record['id']] = record
+            current_hashes[record['id']] = SyncRecord.calculate_hash(record)
         
-        # 获取上次快照
+        # 整表摘要与上次相同时表未变化，跳过快照读取和比对
         snapshot_key = f"{self.snapshot_prefix}{database}:{table}"
-        last_snapshot = self.redis.get(snapshot_key)
-        last_records = json.loads(last_snapshot) if last_snapshot else {}
+        digest_key = f"{self.digest_prefix}{database}:{table}"
+        digest = _table_digest(current_hashes)
+        if digest == self.redis.get(digest_key):
+            return []
+        
+        # 获取上次快照：Redis 哈希表，字段为记录ID，值为记录哈希
+        last_hashes, legacy = self._get_snapshot(snapshot_key)
         
         # 检测变更
-        current_ids = set()
-        for record in current_records:
-            record_id = record['id']
-            current_ids.add(record_id)
-            
-            # 计算数据哈希
-            current_hash = SyncRecord.calculate_hash(record)
-            last_hash = last_records.get(record_id, {}).get('hash')
-            
-            if current_hash != last_hash:
-                # 检测到变更
-                changes.append(SyncRecord(
-                    record_id=record_id,
-                    table_name=table,
-                    data=record,
-                    source='feishu',
-                    timestamp=datetime.now(),
-                    hash=current_hash
-                ))
+        changed_hashes = {
+            record_id: current_hash for record_id, current_hash in current_hashes.items()
+            if current_hash != last_hashes.get(record_id)
+        }
+        changes = [
+            SyncRecord(
+                record_id=record_id,
+                table_name=table,
+                data=current_records[record_id],
+                source='feishu',
+                timestamp=datetime.now(),
+                hash=current_hash
+            )
+            for record_id, current_hash in changed_hashes.items()
+        ]
         
         # 检测删除的记录
-        for record_id in set(last_records.keys()) - current_ids:
+        deleted_ids = last_hashes.keys() - current_hashes.keys()
+        for record_id in deleted_ids:
             changes.append(SyncRecord(
                 record_id=record_id,
                 table_name=table,
@@ -116,17 +165,32 @@ class FeishuChangeDetector:
                 hash=''
             ))
         
-        # 更新快照
-        new_snapshot = {
-            record['id']: {
-                'data': record,
-                'hash': SyncRecord.calculate_hash(record)
-            }
-            for record in current_records
-        }
-        self.redis.set(snapshot_key, json.dumps(new_snapshot))
+        # 更新快照和整表摘要，快照只写入变化的记录
+        pipe = self.redis.pipeline()
+        if legacy:
+            # 旧格式需要整体改写
+            pipe.delete(snapshot_key)
+            changed_hashes = current_hashes
+        elif deleted_ids:
+            pipe.hdel(snapshot_key, *deleted_ids)
+        if changed_hashes:
+            pipe.hset(snapshot_key, mapping=changed_hashes)
+        pipe.set(digest_key, digest)
+        pipe.execute()
         
         return changes
+    
+    def _get_snapshot(self, snapshot_key: str) -> Tuple[Dict[str, str], bool]:
+        """
+        读取快照中各记录的哈希
+        
+        旧版本把整张表存成一个 JSON 字符串，此时第二个返回值为 True，保存时整体改写为哈希表
+        """
+        try:
+            return self.redis.hgetall(snapshot_key), False
+        except redis.ResponseError:
+            snapshot = json.loads(self.redis.get(snapshot_key))
+            return {record_id: entry['hash'] for record_id, entry in snapshot.items()}, True
 
 
 class DatabaseChangeCapture:
@@ -134,6 +198,7 @@ class DatabaseChangeCapture:
     def __init__(self, db_url: str, change_queue: queue.Queue):
         self.engine = create_engine(db_url)
         self.change_queue = change_queue
+        self.dropped_changes = 0  # 队列满时丢弃的变更数
         self._setup_listeners()
     
     def _setup_listeners(self):
@@ -148,15 +213,22 @@ class DatabaseChangeCapture:
     def _process_change(self, statement: str, parameters):
         """处理数据库变更"""
         # 简化示例，实际需要更复杂的 SQL 解析
+        data = dict(parameters)
         change_record = SyncRecord(
-            record_id=str(parameters.get('id', '')),
+            record_id=str(data.get('id', '')),
             table_name=self._extract_table_name(statement),
-            data=dict(parameters),
+            data=data,
             source='database',
             timestamp=datetime.now(),
-            hash=SyncRecord.calculate_hash(dict(parameters))
+            hash=SyncRecord.calculate_hash(data)
         )
-        self.change_queue.put(change_record)
+        try:
+            self.change_queue.put_nowait(change_record)
+        except queue.Full:
+            self.dropped_changes += 1
+            logger.warning(f"Database change queue full, dropped change for "
+                           f"{change_record.table_name}:{change_record.record_id} "
+                           f"(total dropped: {self.dropped_changes})")
     
     def _extract_table_name(self, statement: str) -> str:
         """从 SQL 语句提取表名"""
@@ -207,8 +279,8 @@ class BiDirectionalSyncService:
         self.feishu_detector = FeishuChangeDetector(self.feishu_db, self.redis)
         self.conflict_resolver = ConflictResolver()
         
-        # 数据库变更队列
-        self.db_change_queue = queue.Queue()
+        # 数据库变更队列（有界）
+        self.db_change_queue = queue.Queue(maxsize=DB_CHANGE_QUEUE_SIZE)
         self.db_capture = DatabaseChangeCapture(db_config['url'], self.db_change_queue)
         
         # 同步配置
@@ -232,12 +304,18 @@ class BiDirectionalSyncService:
         """飞书同步循环"""
         while True:
             try:
-                for feishu_db, feishu_table in self.tables_mapping.items():
-                    # 检测飞书表格变更
-                    changes = await self.feishu_detector.detect_changes(
-                        feishu_db.split(':')[0],
-                        feishu_db.split(':')[1]
-                    )
+                # 并发检测各飞书表格的变更
+                tables = [feishu_key.split(':') for feishu_key in self.tables_mapping]
+                results = await asyncio.gather(
+                    *(self.feishu_detector.detect_changes(database, table)
+                      for database, table in tables),
+                    return_exceptions=True
+                )
+                
+                for (database, table), changes in zip(tables, results):
+                    if isinstance(changes, Exception):
+                        logger.error(f"Feishu sync error for {database}:{table}: {changes}")
+                        continue
                     
                     for change in changes:
                         await self._sync_to_database(change)
@@ -248,20 +326,21 @@ class BiDirectionalSyncService:
             await asyncio.sleep(self.sync_interval)
     
     async def _database_sync_loop(self):
-        """数据库同步循环"""
+        """数据库同步循环，变更入队后立即处理"""
+        loop = asyncio.get_running_loop()
         while True:
             try:
-                # 从队列获取变更（非阻塞）
+                # 在线程池中阻塞等待变更，不再定时轮询队列
                 try:
-                    change = self.db_change_queue.get_nowait()
-                    await self._sync_to_feishu(change)
+                    change = await loop.run_in_executor(
+                        None, self.db_change_queue.get, True, DB_CHANGE_WAIT_TIMEOUT
+                    )
                 except queue.Empty:
-                    pass
+                    continue
+                await self._sync_to_feishu(change)
                 
             except Exception as e:
                 logger.error(f"Database sync error: {e}")
-            
-            await asyncio.sleep(0.1)  # 短暂休眠避免 CPU 占用过高
     
     async def _sync_to_database(self, change: SyncRecord):
         """同步到数据库"""
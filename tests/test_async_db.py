@@ -0,0 +1,91 @@
+"""异步数据库测试"""
+
+from unittest.mock import MagicMock, patch
+import asyncio
+import threading
+
+import pytest
+
+from feishu_bitable_db.db.async_db import AsyncDBImpl, DBPool
+from feishu_bitable_db.db.types import SearchCmd
+
+
+class TestAsyncDBImpl:
+    """异步数据库实现测试类"""
+
+    @pytest.mark.asyncio
+    async def test_calls_run_in_executor(self):
+        """调用转发给同步实例，并在事件循环之外的线程执行"""
+        db = MagicMock()
+        threads = []
+
+        def read(*args):
+            threads.append(threading.get_ident())
+            return [{"id": "rec1"}]
+
+        db.read.side_effect = read
+        adb = AsyncDBImpl(db)
+        cmds = [SearchCmd("age", "=", 12)]
+
+        assert await adb.read("app", "tbl", cmds) == [{"id": "rec1"}]
+        db.read.assert_called_once_with("app", "tbl", cmds, True)
+        assert threads != [threading.get_ident()]
+
+        await adb.delete("app", "tbl", "rec1")
+        db.delete.assert_called_once_with("app", "tbl", "rec1")
+
+
+@patch("feishu_bitable_db.db.async_db.DBImpl", side_effect=lambda *args: MagicMock())
+class TestDBPool:
+    """连接池测试类"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_reuses_connection(self, db_impl: MagicMock):
+        """归还的连接被下一次获取复用"""
+        pool = DBPool("id", "secret", min_size=1, max_size=2)
+        await pool.initialize()
+
+        async with pool.acquire() as first:
+            pass
+        async with pool.acquire() as second:
+            pass
+
+        assert first.db is second.db
+        assert db_impl.call_count == 1
+        pool.close()
+
+    @pytest.mark.asyncio
+    async def test_max_size_caps_concurrency(self, db_impl: MagicMock):
+        """同时使用的连接数不超过 max_size"""
+        pool = DBPool("id", "secret", min_size=0, max_size=2)
+        in_use = 0
+        peak = 0
+
+        async def worker():
+            nonlocal in_use, peak
+            async with pool.acquire():
+                in_use += 1
+                peak = max(peak, in_use)
+                await asyncio.sleep(0.01)
+                in_use -= 1
+
+        await asyncio.gather(*(worker() for _ in range(6)))
+
+        assert peak == 2
+        assert db_impl.call_count == 2
+        pool.close()
+
+    def test_created_outside_event_loop(self, db_impl: MagicMock):
+        """在事件循环之外创建的连接池，在争用时仍可正常使用"""
+        pool = DBPool("id", "secret", min_size=0, max_size=1)
+
+        async def main():
+            async def worker():
+                async with pool.acquire():
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(worker() for _ in range(3)))
+
+        asyncio.run(main())
+        assert db_impl.call_count == 1
+        pool.close()
@@ -0,0 +1,46 @@
+"""缓存测试"""
+
+import time
+
+from feishu_bitable_db.internal.cache import TTLCache
+
+
+class TestTTLCache:
+    """TTL 缓存测试类"""
+
+    def test_get_and_expire(self):
+        """测试读写与过期"""
+        cache = TTLCache(ttl=0.05)
+        cache.set("db", "bascn123")
+        assert cache.get("db") == "bascn123"
+
+        time.sleep(0.06)
+        assert cache.get("db") is None
+        assert len(cache) == 0
+
+    def test_per_entry_ttl(self):
+        """测试单条目过期时间"""
+        cache = TTLCache(ttl=60)
+        cache.set("missing", False, ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("missing", "default") == "default"
+
+    def test_evict_least_recently_used(self):
+        """测试超出容量时淘汰最久未访问的条目"""
+        cache = TTLCache(ttl=60, maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_pop(self):
+        """测试删除条目"""
+        cache = TTLCache(ttl=60)
+        cache.set("a", 1)
+        cache.pop("a")
+        cache.pop("missing")
+        assert cache.get("a") is None
@@ -3,6 +3,7 @@
 import os
 import pytest
 from typing import Dict, Any
+from unittest.mock import patch
 
 from feishu_bitable_db import DB, Table, Field, FieldType, SearchCmd
 from feishu_bitable_db.db.db import DBImpl
@@ -104,6 +105,38 @@ class TestDB:
         # 删除记录
         db.delete(db_name, table_name, record_id)
     
+    def test_batch_crud_record(self, db: DB, test_data: Dict[str, Any]):
+        """测试记录的批量增删改"""
+        db_name = test_data["db_name"]
+        table_name = test_data["table_name"]
+        
+        # 确保表存在
+        table = Table(
+            name=table_name,
+            fields=[
+                Field(name="username", type=FieldType.STRING),
+                Field(name="age", type=FieldType.INT),
+            ]
+        )
+        db.save_table(db_name, table)
+        
+        # 批量创建记录
+        records = [
+            {"username": "zhangsan", "age": 12},
+            {"username": "lisi", "age": 13},
+        ]
+        record_ids = db.batch_create(db_name, table_name, records)
+        assert len(record_ids) == 2
+        
+        # 批量更新记录
+        db.batch_update(db_name, table_name, {
+            record_ids[0]: {"age": 22},
+            record_ids[1]: {"age": 23},
+        })
+        
+        # 批量删除记录
+        db.batch_delete(db_name, table_name, record_ids)
+    
     def test_read_records(self, db: DB, test_data: Dict[str, Any]):
         """测试查询记录"""
         db_name = test_data["db_name"]
@@ -116,4 +149,15 @@ class TestDB:
         results = db.read(db_name, table_name, search_cmds)
         
         print(f"查询结果: {results}")
-        assert isinstance(results, list)
\ No newline at end of file
+        assert isinstance(results, list)
+
+
+@patch.object(DBImpl, "_init_root_meta")
+@patch("feishu_bitable_db.db.db.enable_keep_alive")
+def test_keep_alive_is_opt_in(enable_keep_alive, _init_root_meta):
+    """默认不替换飞书 SDK 的传输层，只有显式启用时才复用连接"""
+    DBImpl("app_id", "app_secret")
+    enable_keep_alive.assert_not_called()
+
+    DBImpl("app_id", "app_secret", keep_alive=True)
+    enable_keep_alive.assert_called_once_with()
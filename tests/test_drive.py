@@ -0,0 +1,51 @@
+"""云文档扩展测试"""
+
+from unittest.mock import MagicMock
+
+from feishu_bitable_db.client.drive import DriveExt
+
+
+def _list_response(names, next_page_token=None):
+    """构造 list 接口的成功响应"""
+    response = MagicMock()
+    response.success.return_value = True
+    response.data.files = []
+    for name in names:
+        # name 是 MagicMock 构造参数，需要单独赋值
+        file = MagicMock(parent_token="root", token=f"tok_{name}", type="bitable", url="")
+        file.name = name
+        response.data.files.append(file)
+    response.data.has_more = next_page_token is not None
+    response.data.next_page_token = next_page_token
+    return response
+
+
+class TestDriveExt:
+    """云文档扩展测试类"""
+
+    def test_get_drive_files_paginates_and_caches(self):
+        """测试拉取全部分页并缓存结果"""
+        client = MagicMock()
+        client.drive.v1.file.list.side_effect = [
+            _list_response(["a", "b"], next_page_token="next"),
+            _list_response(["c"]),
+        ]
+        drive = DriveExt(client)
+
+        files = drive.get_drive_files("root")
+        assert [file["name"] for file in files] == ["a", "b", "c"]
+
+        assert drive.get_drive_files("root") == files
+        assert client.drive.v1.file.list.call_count == 2
+
+    def test_invalidate(self):
+        """测试缓存失效后重新拉取"""
+        client = MagicMock()
+        client.drive.v1.file.list.return_value = _list_response(["a"])
+        drive = DriveExt(client)
+
+        drive.get_drive_files("root")
+        drive.invalidate("root")
+        drive.get_drive_files("root")
+
+        assert client.drive.v1.file.list.call_count == 2
@@ -0,0 +1,90 @@
+"""字段管理测试"""
+
+from unittest.mock import MagicMock
+
+from lark_oapi.api.bitable.v1 import AppTableField
+
+from feishu_bitable_db.db.field import FieldManagerImpl
+from feishu_bitable_db.internal.cache import TTLCache
+
+
+class TestFieldManager:
+    """字段管理器测试类"""
+
+    def test_batch_create_fields(self):
+        """批量创建字段按顺序返回字段 ID"""
+        manager = FieldManagerImpl(MagicMock())
+        created = []
+
+        def create_field(did, tid, field):
+            created.append(field["field_name"])
+            return f"fld_{field['field_name']}"
+
+        manager.create_field = MagicMock(side_effect=create_field)
+
+        fields = [{"field_name": name, "type": 1} for name in "abcde"]
+        field_ids = manager.batch_create_fields("app", "tbl", fields)
+
+        assert field_ids == [f"fld_{name}" for name in "abcde"]
+        # 飞书按创建时间排列字段，必须按声明顺序逐个创建
+        assert created == list("abcde")
+
+    def test_batch_delete_fields_empty(self):
+        """空列表不发起请求"""
+        client = MagicMock()
+        manager = FieldManagerImpl(client)
+
+        manager.batch_delete_fields("app", "tbl", [])
+
+        client.bitable.v1.app_table_field.delete.assert_not_called()
+
+    def test_list_fields_cached(self):
+        """字段列表被缓存，修改字段后失效"""
+        client = MagicMock()
+        field = MagicMock(field_id="fld1", field_name="name", type=1)
+        client.bitable.v1.app_table_field.list.return_value.data.items = [field]
+        manager = FieldManagerImpl(client)
+
+        manager.list_fields("app", "tbl")
+        manager.list_fields("app", "tbl")
+        assert client.bitable.v1.app_table_field.list.call_count == 1
+
+        manager.delete_field("app", "tbl", "fld1")
+        manager.list_fields("app", "tbl")
+        assert client.bitable.v1.app_table_field.list.call_count == 2
+
+    def test_field_name_id_map(self):
+        """字段名映射与字段列表共用缓存"""
+        client = MagicMock()
+        client.bitable.v1.app_table_field.list.return_value.data.items = [
+            MagicMock(field_id="fld1", field_name="id", type=1),
+            MagicMock(field_id="fld2", field_name="name", type=1),
+        ]
+        manager = FieldManagerImpl(client)
+
+        assert manager.field_name_id_map("app", "tbl") == {"id": "fld1", "name": "fld2"}
+        assert manager.has_field("app", "tbl", "id")
+        assert not manager.has_field("app", "tbl", "age")
+        assert client.bitable.v1.app_table_field.list.call_count == 1
+
+    def test_shared_cache(self):
+        """共享缓存命中时不再请求字段列表，修改字段后共享缓存失效"""
+        shared = TTLCache(ttl=60)
+
+        client = MagicMock()
+        client.bitable.v1.app_table_field.list.return_value.data.items = [
+            AppTableField({"field_id": "fld1", "field_name": "name", "type": 1,
+                           "property": {"formatter": "0.0"}}),
+        ]
+        FieldManagerImpl(client, shared_cache=shared).list_fields("app", "tbl")
+
+        other = MagicMock()
+        manager = FieldManagerImpl(other, shared_cache=shared)
+        fields = manager.list_fields("app", "tbl")
+
+        assert fields[0]["field_name"] == "name"
+        assert fields[0]["property"].formatter == "0.0"
+        other.bitable.v1.app_table_field.list.assert_not_called()
+
+        manager.delete_field("app", "tbl", "fld1")
+        assert shared.get("app:tbl") is None
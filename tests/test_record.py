@@ -0,0 +1,191 @@
+"""记录管理测试"""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+import threading
+import time
+
+import pytest
+
+from feishu_bitable_db.db.record import RecordManager, _compile_filter
+from feishu_bitable_db.db.types import SearchCmd
+
+
+def _list_response(*rows):
+    """构造 list 接口的成功响应"""
+    response = MagicMock()
+    response.success.return_value = True
+    response.data.items = [
+        MagicMock(record_id=record_id, fields=fields) for record_id, fields in rows
+    ]
+    response.data.has_more = False
+    return response
+
+
+class TestRecordManager:
+    """记录管理器测试类"""
+
+    @pytest.fixture
+    def client(self) -> MagicMock:
+        """模拟飞书客户端"""
+        client = MagicMock()
+        client.bitable.v1.app_table_record.list.return_value = _list_response(
+            ("rec1", {"age": 12}),
+        )
+        return client
+
+    @pytest.fixture
+    def manager(self, client: MagicMock) -> RecordManager:
+        """创建记录管理器"""
+        field_manager = MagicMock()
+        field_manager.list_fields.return_value = []
+        field_manager.has_field.return_value = False
+        return RecordManager(client, field_manager)
+
+    def test_read_uses_cache(self, manager: RecordManager, client: MagicMock):
+        """测试相同条件的查询命中缓存"""
+        cmds = [SearchCmd(key="age", operator="=", val=12)]
+
+        first = manager.read("app", "tbl", cmds)
+        second = manager.read("app", "tbl", list(cmds))
+
+        assert first == second == [{"age": 12, "id": "rec1"}]
+        assert client.bitable.v1.app_table_record.list.call_count == 1
+
+        # 返回值是副本，修改不影响缓存
+        second[0]["age"] = 99
+        assert manager.read("app", "tbl", cmds)[0]["age"] == 12
+
+    def test_write_invalidates_cache(self, manager: RecordManager, client: MagicMock):
+        """测试写入后缓存失效"""
+        client.bitable.v1.app_table_record.delete.return_value.success.return_value = True
+
+        manager.read("app", "tbl", [])
+        manager.delete("app", "tbl", "rec1")
+        manager.read("app", "tbl", [])
+
+        assert client.bitable.v1.app_table_record.list.call_count == 2
+
+    def test_read_failure_not_cached(self, manager: RecordManager, client: MagicMock):
+        """测试查询失败时不缓存结果，下次查询重新请求"""
+        failed = MagicMock()
+        failed.success.return_value = False
+        client.bitable.v1.app_table_record.list.side_effect = [
+            failed, _list_response(("rec1", {"age": 12})),
+        ]
+
+        with pytest.raises(Exception):
+            manager.read("app", "tbl", [])
+
+        assert manager.read("app", "tbl", []) == [{"age": 12, "id": "rec1"}]
+        assert client.bitable.v1.app_table_record.list.call_count == 2
+
+    def test_read_bypass_cache(self, manager: RecordManager, client: MagicMock):
+        """测试显式跳过缓存"""
+        manager.read("app", "tbl", [])
+        manager.read("app", "tbl", [], use_cache=False)
+
+        assert client.bitable.v1.app_table_record.list.call_count == 2
+
+    def test_read_cache_key_by_value_type(self, manager: RecordManager, client: MagicMock):
+        """测试条件值类型不同时不共用缓存，混合类型的条件可以排序"""
+        manager.read("app", "tbl", [SearchCmd("x", "=", 1)])
+        manager.read("app", "tbl", [SearchCmd("x", "=", True)])
+        manager.read("app", "tbl", [SearchCmd("x", "=", 1), SearchCmd("x", "=", "b")])
+        manager.read("app", "tbl", [SearchCmd("x", "=", "b"), SearchCmd("x", "=", 1)])
+
+        assert client.bitable.v1.app_table_record.list.call_count == 3
+
+    def test_read_columnar(self, manager: RecordManager, client: MagicMock):
+        """测试按列返回查询结果"""
+        client.bitable.v1.app_table_record.list.return_value = _list_response(
+            ("rec1", {"name": "a", "age": 12}),
+            ("rec2", {"name": "b"}),
+        )
+
+        columns = manager.read_columnar("app", "tbl", [])
+
+        assert columns == {
+            "name": ["a", "b"],
+            "age": [12, None],
+            "id": ["rec1", "rec2"],
+        }
+
+    def test_compile_filter(self):
+        """测试过滤条件编译"""
+        cmds = (SearchCmd("name", "=", "a"), SearchCmd("age", ">", 1))
+        types = tuple(type(cmd.val) for cmd in cmds)
+
+        assert _compile_filter(cmds, types) == 'AND(CurrentValue.[name]="a",CurrentValue.[age]>1)'
+        assert _compile_filter((), ()) == ""
+        escaped = _compile_filter((SearchCmd("name", "=", 'a"b'),), (str,))
+        assert escaped == 'AND(CurrentValue.[name]="a\\"b")'
+        boolean = _compile_filter((SearchCmd("ok", "=", True),), (bool,))
+        assert boolean == "AND(CurrentValue.[ok]=true)"
+
+    def test_iter_read_paginates_lazily(self, manager: RecordManager, client: MagicMock):
+        """测试分页读取，停止迭代后不再请求后续页"""
+        first_page = _list_response(("rec1", {"age": 1}), ("rec2", {"age": 2}))
+        first_page.data.has_more = True
+        first_page.data.page_token = "next"
+        second_page = _list_response(("rec3", {"age": 3}))
+        client.bitable.v1.app_table_record.list.side_effect = [first_page, second_page]
+
+        rows = manager.iter_read("app", "tbl", [])
+        assert next(rows)["id"] == "rec1"
+        assert client.bitable.v1.app_table_record.list.call_count == 1
+
+        assert [row["id"] for row in rows] == ["rec2", "rec3"]
+        assert client.bitable.v1.app_table_record.list.call_count == 2
+
+    def test_iter_read_raises_on_failed_page(self, manager: RecordManager, client: MagicMock):
+        """测试某一页请求失败时抛出异常，而不是返回不完整的结果"""
+        first_page = _list_response(("rec1", {"age": 1}))
+        first_page.data.has_more = True
+        first_page.data.page_token = "next"
+        failed_page = MagicMock()
+        failed_page.success.return_value = False
+        client.bitable.v1.app_table_record.list.side_effect = [first_page, failed_page]
+
+        rows = manager.iter_read("app", "tbl", [])
+        assert next(rows)["id"] == "rec1"
+        with pytest.raises(Exception, match="查询记录失败"):
+            next(rows)
+
+    def test_read_single_flight(self, manager: RecordManager, client: MagicMock):
+        """测试并发的相同查询只发起一次请求"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_list(request):
+            started.set()
+            release.wait(5)
+            return _list_response(("rec1", {"age": 12}))
+
+        client.bitable.v1.app_table_record.list.side_effect = slow_list
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(manager.read, "app", "tbl", [])
+            started.wait(5)
+            second = executor.submit(manager.read, "app", "tbl", [])
+            time.sleep(0.05)
+            release.set()
+
+            assert first.result() == second.result() == [{"age": 12, "id": "rec1"}]
+
+        assert client.bitable.v1.app_table_record.list.call_count == 1
+
+    def test_create_sets_id_field(self, manager: RecordManager, client: MagicMock):
+        """测试存在 ID 字段时创建后只补发一次更新"""
+        manager.field_manager.has_field.return_value = True
+        records = client.bitable.v1.app_table_record
+        records.create.return_value.data.record.record_id = "rec9"
+        records.update.return_value.success.return_value = True
+
+        assert manager.create("app", "tbl", {"age": 1}) == "rec9"
+
+        assert records.update.call_count == 1
+        request = records.update.call_args[0][0]
+        assert request.record_id == "rec9"
+        assert request.request_body.fields == {"id": "rec9"}
+        manager.field_manager.list_fields.assert_not_called()
@@ -0,0 +1,29 @@
+"""类型定义测试"""
+
+from feishu_bitable_db.db.types import Table, Field, FieldType, make_row_class
+
+
+class TestRowClass:
+    """记录类测试类"""
+
+    def test_make_row_class(self):
+        """测试按字段生成记录类"""
+        table = Table(name="用户", fields=[
+            Field(name="用户名", type=FieldType.STRING),
+            Field(name="年龄", type=FieldType.INT),
+        ])
+        row_class = make_row_class(table)
+
+        row = row_class({"id": "rec1", "用户名": "alice", "其他": 1})
+
+        assert row.id == "rec1"
+        assert row.用户名 == "alice"
+        assert row.年龄 is None
+        assert row._asdict() == {"id": "rec1", "用户名": "alice", "年龄": None}
+        assert not hasattr(row, "__dict__")
+
+    def test_make_row_class_invalid_name(self):
+        """测试字段名不能作为属性名时不生成记录类"""
+        table = Table(name="t", fields=[Field(name="first name", type=FieldType.STRING)])
+
+        assert make_row_class(table) is None